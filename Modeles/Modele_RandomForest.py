@@ -8,6 +8,12 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 from joblib import dump, load
 import os
+import sys
+import time
+
+# Moteur d'inférence à plat partagé avec l'API (ml_project/forest_engine.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ml_project'))
+from forest_engine import export_forest, export_mmap_artifact
 
 # -----------------------------
 # 🔧 1. Chargement des données
@@ -84,6 +90,8 @@ print(classification_report(y_test, y_pred_last))
 JOBLIB_FILE = 'random_forest_dpe_final_weighted.joblib'
 PICKLE_FILE = 'random_forest_dpe_final_weighted.pkl'
 COLUMNS_FILE = 'feature_columns_final.pkl'
+FLAT_FILE = 'random_forest_dpe_final_weighted.flat.joblib'
+MMAP_FILE = 'random_forest_dpe_final_weighted.mmap.joblib'
 
 print("\n💾 Sauvegarde des modèles...")
 
@@ -117,12 +125,110 @@ test_pred_pickle = pickle_model.predict(X_test[:1])
 print(f"✅ Joblib chargé - Prédiction test: {test_pred_joblib[0]}")
 print(f"✅ Pickle chargé - Prédiction test: {test_pred_pickle[0]}")
 
+# -----------------------------
+# 6. Export de la forêt en tableaux plats (moteur NumPy de l'API)
+# -----------------------------
+print("\n🌲 Export de la forêt en tableaux plats...")
+flat_forest = export_forest(last_model, FLAT_FILE)
+flat_size = os.path.getsize(FLAT_FILE) / (1024*1024)
+
+# Le moteur à plat doit donner exactement les mêmes classes que sklearn
+y_pred_flat = flat_forest.predict(X_test)
+if not np.array_equal(y_pred_flat, y_pred_last):
+    n_diff = int((y_pred_flat != y_pred_last).sum())
+    raise AssertionError(f"❌ Moteur à plat : {n_diff} prédictions différentes de sklearn sur le test")
+print(f"✅ Tableaux plats: {flat_size:.1f} MB - prédictions identiques sur {len(X_test)} lignes de test")
+
+# Artefact non compressé (forêt à plat + colonnes) que l'API charge en mmap_mode='r'
+# (DPE_ARTIFACT_MODE=mmap) : partagé entre processus via le cache de pages
+export_mmap_artifact(last_model, X.columns.tolist(), MMAP_FILE)
+mmap_size = os.path.getsize(MMAP_FILE) / (1024*1024)
+print(f"✅ Artefact mmap: {mmap_size:.1f} MB (non compressé)")
+
 print("\n🎯 Recommandation :")
 if joblib_size < pickle_size:
     print(f"💡 Utilisez le fichier .joblib ({joblib_size:.1f} MB) - Plus léger")
 else:
     print(f"💡 Utilisez le fichier .pkl ({pickle_size:.1f} MB) - Plus léger")
 
+# -----------------------------
+# 7. Variantes compactes : précision vs latence
+# -----------------------------
+# Chaque variante est sauvegardée sous random_forest_dpe_<nom>.joblib (+ .mmap.joblib)
+# et peut être servie par l'API avec DPE_MODEL_VARIANT=<nom>.
+# Désactivé par défaut : BUILD_VARIANTS=1 python Modele_RandomForest.py pour les entraîner
+BUILD_VARIANTS = os.environ.get('BUILD_VARIANTS', '0') == '1'
+
+MODEL_VARIANTS = {
+    'd20_leaf5_n100': {'n_estimators': 100, 'max_depth': 20, 'min_samples_leaf': 5},
+    'd16_leaf10_n60': {'n_estimators': 60, 'max_depth': 16, 'min_samples_leaf': 10},
+    'd12_leaf20_n40': {'n_estimators': 40, 'max_depth': 12, 'min_samples_leaf': 20},
+    'd10_leaf50_n20': {'n_estimators': 20, 'max_depth': 10, 'min_samples_leaf': 50},
+}
+N_LATENCY_ROWS = 200       # lignes prédites une par une pour la latence unitaire
+BATCH_LATENCY_ROWS = 10000  # taille du lot pour la latence batch
+
+
+def evaluate_variant(name, fitted_model, save=True):
+    """Sauvegarde une variante puis mesure F1, taille, chargement et latences"""
+    variant_file = f'random_forest_dpe_{name}.joblib'
+    if save:
+        dump(fitted_model, variant_file, compress=3)
+        export_mmap_artifact(fitted_model, X.columns.tolist(), f'random_forest_dpe_{name}.mmap.joblib')
+
+    start = time.perf_counter()
+    loaded = load(variant_file)
+    load_s = time.perf_counter() - start
+
+    y_pred_variant = loaded.predict(X_test)
+    cm_variant = confusion_matrix(y_test, y_pred_variant, labels=loaded.classes_)
+    print(f"\nMatrice de confusion ({name}) :")
+    print(pd.DataFrame(cm_variant, index=loaded.classes_, columns=loaded.classes_))
+
+    single_rows = X_test.iloc[:N_LATENCY_ROWS]
+    start = time.perf_counter()
+    for i in range(len(single_rows)):
+        loaded.predict(single_rows.iloc[i:i + 1])
+    single_ms = (time.perf_counter() - start) * 1000 / len(single_rows)
+
+    start = time.perf_counter()
+    loaded.predict(X_test.iloc[:BATCH_LATENCY_ROWS])
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        'variant': name,
+        'n_estimators': len(loaded.estimators_),
+        'max_depth': loaded.max_depth,
+        'min_samples_leaf': loaded.min_samples_leaf,
+        'n_noeuds': sum(e.tree_.node_count for e in loaded.estimators_),
+        'f1_weighted': round(f1_score(y_test, y_pred_variant, average='weighted'), 4),
+        'taille_mb': round(os.path.getsize(variant_file) / (1024*1024), 1),
+        'chargement_s': round(load_s, 2),
+        'latence_1_ligne_ms': round(single_ms, 2),
+        f'latence_{BATCH_LATENCY_ROWS}_lignes_ms': round(batch_ms, 1),
+        'matrice_confusion': cm_variant.tolist(),
+    }
+
+
+if BUILD_VARIANTS:
+    print("\n🌲 Construction des variantes compactes...")
+    # Le modèle de production est déjà sauvegardé (sections 5 et 6)
+    variant_rows = [evaluate_variant('final_weighted', last_model, save=False)]
+
+    for name, variant_params in MODEL_VARIANTS.items():
+        variant_model = RandomForestClassifier(
+            **{**best_params, **variant_params}, random_state=0, n_jobs=-1
+        )
+        variant_model.fit(X_train, y_train)
+        variant_rows.append(evaluate_variant(name, variant_model))
+
+    variants_report = pd.DataFrame(variant_rows)
+    variants_report.to_csv('model_variants_report.csv', index=False)
+
+    print("\n📊 PRÉCISION vs LATENCE DES VARIANTES :")
+    print(variants_report.drop(columns=['matrice_confusion']).to_string(index=False))
+    print("💾 Rapport complet (avec matrices de confusion) : model_variants_report.csv")
+
 # 🔁 Entraînement sur 10 runs...
 
 # Run  1: F1-score = 0.7528
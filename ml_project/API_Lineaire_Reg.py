@@ -1,47 +1,52 @@
 from flask import Flask, request, jsonify
 import joblib
-import pandas as pd
 import numpy as np
+import logging
 import os
+import json
+import time
 import pathlib
+import warnings
 from file_loader import setup_heavy_files
+from prefork_server import serve
+from prediction_cache import PredictionCache
+from micro_batcher import MicroBatcher, MICROBATCH_ENABLED
+from linear_scorer import FusedLinearScorer, validation_matrix
+from feature_encoders import error_message
+from feature_spec import All_Data, Variable_Standardisee, conso_feature_spec, drift_report
+from model_loader import (LoadProgress, ModelReloader, PHASE_DOWNLOADING, PHASE_LOADING,
+                          artifact_version, health_wait_seconds)
+import reload_admin
+import readiness
+import metrics
+import uds_transport
+import api_logging
+import arrow_io
+import ndjson_stream
+from ndjson_stream import NDJSON_MIMETYPES
+
+# Lancee comme serveur (APIManager, docker-compose) : une ligne JSON par evenement sur stdout,
+# relue par APIManager (cf. log_collector). Importee (bulk_score, benchmarks, API DPE), l'API
+# laisse la configuration du journal au programme qui l'importe.
+if __name__ == '__main__':
+    api_logging.setup()
+
+logger = logging.getLogger('api.conso')
+logger.info("Initialisation de l'API Consommation...")
+
+# L'imputer est ajuste sur un DataFrame mais recoit des matrices numpy dans l'ordre All_Data
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# Variables et pre-traitement declares dans feature_spec (partages avec l'API DPE et les traitements de masse)
+conso_encoder = conso_feature_spec().compile()
 
-print("Initialisation de l'API Consommation...")
-
-# Variables numériques à standardiser
-Variable_Standardisee = ['hauteur_sous_plafond', 'surface_habitable_logement']
-
-# Variables OHE/booléennes (celles qui sont 0/1 ou encodées)
-Data_OHE_Boolean = [
-    'qualite_isolation_murs', 'etiquette_dpe', 'periode_construction', 'nombre_appartement_cat', 'type_batiment_immeuble', 
-    'type_batiment_maison', 'type_energie_principale_chauffage_Charbon', 'type_energie_principale_chauffage_Fioul', 
-    'type_energie_principale_chauffage_Gaz (GPL/Propane/Butane)', 'type_energie_principale_chauffage_Gaz naturel', 
-    'type_energie_principale_chauffage_Réseau de chauffage urbain', 'type_energie_principale_chauffage_Électricité', 
-    'type_energie_n1_Charbon', 'type_energie_n1_Fioul', 'type_energie_n1_Gaz (GPL/Propane/Butane)', 
-    'type_energie_n1_Gaz naturel', 'type_energie_n1_Réseau de chauffage urbain', 'type_energie_n1_Électricité', 'logement_neuf'
-]
-
-All_Data = Variable_Standardisee + Data_OHE_Boolean
-
-Qualite_Isolation_Mapping = {
-    'Insuffisante': 0,
-    'Moyenne': 1,
-    'bonne': 2,
-    'très bonne': 3
-}
-
-Periode_Construction_Mapping = {
-    "avant 1948": 0, "1948-1974": 1, "1975-1977": 2, "1978-1982": 3, 
-    "1983-1988": 4, "1989-2000": 5, "2001-2005": 6, "2006-2012": 7, 
-    "2013-2021": 8, "après 2021": 9
-}
-
-Nombre_App_Mapping = {
-    "Maison(Unitaire ou 2 à 3 logements)": 0,
-    "Petit Collectif(4 à 9 logements)": 1, 
-    "Moyen Collectif(10 à 30 logements)": 2, 
-    "Grand Collectif(> 30 logements)": 3
-}
+# Valeurs du formulaire que le modele ne distingue pas (vocabulaire d'entrainement different)
+for field, values in drift_report(conso_encoder.spec).items():
+    logger.warning(f"Vocabulaire consommation : {field} = {values} sans effet sur le modele",
+                   extra={"field": field})
+
+# Nombre maximal de logements acceptes par appel a /predict_conso/batch
+MAX_BATCH_SIZE = 100000
 
 # ----------------------------------------------------
 # 2. INITIALISATION ET CHARGEMENT DES ASSETS
@@ -58,143 +63,366 @@ Scaler_PATH = Current_DIR / 'lr_scaler.pkl'
 lr_model = None
 lr_imputer = None
 lr_scaler = None
+fused_scorer = None
 
-def Verif_Chemin():
-    global lr_model, lr_imputer, lr_scaler
-    try:
-        print("Chargement du modèle de consommation...")
-        
-        # Vérifier si les fichiers existent
-        if not Model_PATH.exists():
-            print(f"Fichier modèle non trouvé: {Model_PATH}")
-            return
-            
-        if not Imput_PATH.exists():
-            print(f"Fichier imputer non trouvé: {Imput_PATH}")
-            return
-            
-        if not Scaler_PATH.exists():
-            print(f"Fichier scaler non trouvé: {Scaler_PATH}")
-            return
-        
-        # Charger les fichiers
-        lr_model = joblib.load(Model_PATH)
-        print("Modèle de consommation chargé")
-        
-        lr_imputer = joblib.load(Imput_PATH)
-        print("Imputer chargé")
-        
-        lr_scaler = joblib.load(Scaler_PATH)
-        print("Scaler chargé")
+# Assets en service, remplaces d'un bloc lors d'un rechargement a chaud
+conso_artifacts = None
+
+# Moteur de prediction : "fused" (imputer + scaler + modele replies, cf. linear_scorer) ou "sklearn"
+CONSO_ENGINE = os.environ.get('CONSO_ENGINE', 'fused')
+
+# Ecart maximal accepte entre le scoreur fusionne et le pipeline sklearn (kWh/an)
+FUSED_TOLERANCE_KWH = 1e-6
+
+# Avancement du chargement en arriere-plan (expose par /health)
+conso_loader = LoadProgress()
+
+# Module importe par l'API DPE pour /predict_full : un echec de chargement n'y concerne que ces
+# routes (503), il n'est pas signale a APIManager comme un echec de l'API DPE
+EMBEDDED = __name__ != '__main__'
+
+# Cache LRU des predictions, vide a chaque chargement des assets
+prediction_cache = PredictionCache(name="conso")
+
+class ConsoArtifacts:
+    """Modele de regression, imputer et scaler charges ensemble"""
+
+    def __init__(self, model, imputer, scaler, version):
+        self.model = model
+        self.imputer = imputer
+        self.scaler = scaler
+        self.version = version
+        # Repli des trois assets en un seul produit scalaire
+        self.fused_scorer = compile_fused_scorer(self) if CONSO_ENGINE == 'fused' else None
+
+    def predict_pipeline(self, X_brut):
+        """Pipeline sklearn d'origine (imputer, scaler, hstack, modele) sur une matrice dans l'ordre All_Data"""
+        n_standard = len(Variable_Standardisee)
+
+        # Imputation puis standardisation des variables numeriques
+        X_imputed = self.imputer.transform(X_brut[:, :n_standard])
+        X_scaled = self.scaler.transform(X_imputed)
+
+        # Reconstruction de la matrice finale
+        X_final_matrix = np.hstack((X_scaled, X_brut[:, n_standard:]))
+        return self.model.predict(X_final_matrix)
+
+    def predict(self, X_brut):
+        """Consommations predites (non bornees) pour une matrice de features brutes dans l'ordre All_Data"""
+        if self.fused_scorer is not None:
+            return self.fused_scorer.predict(X_brut)
+        return self.predict_pipeline(X_brut)
+
+def build_conso(progress):
+    """Charge les assets de consommation depuis le disque, sans toucher a ceux en service"""
+    progress.set_phase(PHASE_DOWNLOADING)
+    setup_heavy_files()
+    progress.set_phase(PHASE_LOADING)
+
+    logger.info("Chargement du modèle de consommation...")
+    
+    # Vérifier si les fichiers existent
+    if not Model_PATH.exists():
+        raise FileNotFoundError(f"Fichier modèle non trouvé: {Model_PATH}")
         
-        print("Modele de Regression Lineaire charge avec succes sur le port 5000.")
+    if not Imput_PATH.exists():
+        raise FileNotFoundError(f"Fichier imputer non trouvé: {Imput_PATH}")
         
+    if not Scaler_PATH.exists():
+        raise FileNotFoundError(f"Fichier scaler non trouvé: {Scaler_PATH}")
+    
+    # Charger les fichiers
+    version = artifact_version([Model_PATH, Imput_PATH, Scaler_PATH])
+    progress.expect(Model_PATH, Imput_PATH, Scaler_PATH)
+    with progress.open(Model_PATH) as f:
+        model = joblib.load(f)
+    logger.info("Modèle de consommation chargé")
+    
+    with progress.open(Imput_PATH) as f:
+        imputer = joblib.load(f)
+    logger.info("Imputer chargé")
+    
+    with progress.open(Scaler_PATH) as f:
+        scaler = joblib.load(f)
+    logger.info("Scaler chargé")
+
+    return ConsoArtifacts(model, imputer, scaler, version)
+
+def smoke_test_conso(artifacts):
+    """Refuse des assets qui ne donnent pas des consommations finies sur quelques lignes de controle"""
+    X_check = validation_matrix(len(Variable_Standardisee), len(All_Data), n_rows=8)
+    prediction = artifacts.predict(X_check)
+    if prediction.shape != (len(X_check),) or not np.isfinite(prediction).all():
+        raise ValueError(f"Prediction de controle invalide : {prediction!r}")
+
+def install_conso(artifacts):
+    """Met les assets en service d'une seule affectation"""
+    global conso_artifacts, lr_model, lr_imputer, lr_scaler, fused_scorer
+    conso_artifacts = artifacts
+    # Alias conserves pour les scripts qui lisent les globales du module
+    lr_model, lr_imputer, lr_scaler = artifacts.model, artifacts.imputer, artifacts.scaler
+    fused_scorer = artifacts.fused_scorer
+    # Les predictions en cache viennent des anciens assets
+    prediction_cache.clear()
+    logger.info(f"Modele de Regression Lineaire version {artifacts.version} en service.",
+                extra={"version": artifacts.version})
+
+conso_reloader = ModelReloader('consommation', build_conso, smoke_test_conso, install_conso,
+                               [Model_PATH, Imput_PATH, Scaler_PATH])
+
+def Verif_Chemin(progress):
+    try:
+        conso_reloader.load(progress)
+        logger.info("Modele de Regression Lineaire charge avec succes.")
     except Exception as e:
-        print(f"ERREUR FATALE: Echec du chargement des assets (port 5000). Erreur: {e}")
-        lr_model = None
-        lr_imputer = None
-        lr_scaler = None
-
-print("Demarrage du chargement des modeles...")
-setup_heavy_files()
-Verif_Chemin()
+        if EMBEDDED:
+            logger.error(f"Assets de consommation indisponibles, /predict_full repondra 503. Erreur: {e}")
+        else:
+            logger.critical(f"ERREUR FATALE: Echec du chargement des assets. Erreur: {e}")
+            readiness.notify(readiness.EVENT_LOAD_FAILED, model='consommation', error=str(e))
+        raise
+    readiness.notify(readiness.EVENT_MODEL_LOADED, model='consommation', version=conso_artifacts.version)
+
+def predict_conso_pipeline(X_brut):
+    """Pipeline sklearn d'origine sur une matrice dans l'ordre All_Data (assets en service)"""
+    return conso_artifacts.predict_pipeline(X_brut)
+
+def compile_fused_scorer(artifacts):
+    """Scoreur fusionne, verifie contre le pipeline sklearn ; None s'il s'en ecarte"""
+    try:
+        scorer = FusedLinearScorer.from_pipeline(artifacts.imputer, artifacts.scaler, artifacts.model,
+                                                 len(Variable_Standardisee))
+        X_check = validation_matrix(len(Variable_Standardisee), len(All_Data))
+        error = scorer.max_abs_error(artifacts.predict_pipeline, X_check)
+    except ValueError as e:
+        logger.warning(f"Scoreur fusionne indisponible ({e}), pipeline sklearn conserve")
+        return None
+
+    if not error <= FUSED_TOLERANCE_KWH:
+        logger.warning(f"Scoreur fusionne ecarte : ecart max {error:.2e} kWh, pipeline sklearn conserve",
+                       extra={"max_error_kwh": error})
+        return None
+    logger.info(f"Scoreur lineaire fusionne pret (ecart max {error:.2e} kWh sur {len(X_check)} lignes)",
+                extra={"max_error_kwh": error})
+    return scorer
+
+@metrics.timed('inference')
+def predict_conso_matrix(X_brut):
+    """Consommations predites (non bornees) pour une matrice de features brutes dans l'ordre All_Data"""
+    return conso_artifacts.predict(X_brut)
+
+# Micro-batching optionnel (MICROBATCH_ENABLED=1) des predictions unitaires concurrentes
+conso_batcher = MicroBatcher(predict_conso_matrix, name="conso") if MICROBATCH_ENABLED else None
+
+logger.info("Demarrage du chargement des modeles...")
+# Le port est ouvert tout de suite : les assets se chargent en arriere-plan
+conso_loader.start(Verif_Chemin)
 
 # ----------------------------------------------------
 # 3. ROUTE DE PRÉDICTION (/predict_conso)
 # ----------------------------------------------------
 
+@metrics.timed('encode')
+def encode_conso(data_brute):
+    """Matrice brute (1 ligne, ordre All_Data) d'un logement ; KeyError si un champ attendu manque"""
+    return conso_encoder.encode(data_brute).copy()
+
+def predict_conso_value(data_brute):
+    """Consommation predite (kWh/an, arrondie) d'un logement, via le cache ; KeyError si un champ manque"""
+
+    # Profil deja predit : reponse directe depuis le cache
+    cache_key = prediction_cache.make_key(data_brute)
+    cache_generation = prediction_cache.generation
+    cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    artifacts = conso_artifacts
+    X_brut = encode_conso(data_brute)
+
+    # --- ÉTAPE 3 : PRÉDICTION (regroupée avec les requêtes concurrentes si le micro-batching est actif) ---
+    if conso_batcher is not None:
+        # Attente du lot (batch_wait) et appel au modele (inference) comptes par le batcher
+        prediction_brute = conso_batcher.submit(X_brut[0], artifacts.predict)
+    else:
+        with metrics.stage('inference'):
+            prediction_brute = artifacts.predict(X_brut)[0]
+    prediction_finale = max(0, prediction_brute)
+
+    conso_predite = float(f"{prediction_finale:.2f}")
+    prediction_cache.put(cache_key, conso_predite, cache_generation)
+    return conso_predite
+
 @app.route('/predict_conso', methods=['POST'])
 def predict_conso():
     
-    if lr_model is None:
+    if not conso_loader.ready:
         return jsonify({"error": "Modele de Consommation non charge ou indisponible."}), 503
 
     try:
-        data_brute = request.get_json(force=True)
-        print("Donnees recues pour prediction de consommation")
+        with metrics.stage('parse'):
+            data_brute = request.get_json(force=True)
     except:
         return jsonify({"error": "Format JSON invalide ou manquant dans la requete."}), 400
 
-    # --- ÉTAPE 1 : PRÉPARATION ET CONVERSION  ---
-    
-    # Créer un dictionnaire 
-    data_dico = {} 
-
-    # Assurez-vous que toutes les features attendues sont dans le JSON, sinon on met 0 par défaut
-    for feature in All_Data:
-        data_dico[feature] = 0 
-
-    # 1. Mise à jour des valeurs numériques/brutes
-    data_dico['hauteur_sous_plafond'] = data_brute.get('hauteur_sous_plafond', 0)
-    data_dico['surface_habitable_logement'] = data_brute.get('surface_habitable_logement', 0)
-
-    # 2. Conversion des chaînes en indices numériques 
     try:
-        data_dico['qualite_isolation_murs'] = Qualite_Isolation_Mapping[data_brute['qualite_isolation_murs']]
-        data_dico['periode_construction'] = Periode_Construction_Mapping[data_brute['periode_construction']]
-        data_dico['nombre_appartement_cat'] = Nombre_App_Mapping[data_brute['nombre_appartement_cat']]
-        
-        # 3. Ajout de l'étiquette DPE PRÉDITE (reçue de l'API 5001)
-        data_dico['etiquette_dpe'] = data_brute['etiquette_dpe'] 
-        print(f"Etiquette DPE recue: {data_brute['etiquette_dpe']}")
+        conso_predite = predict_conso_value(data_brute)
+
+        with metrics.stage('serialize'):
+            response = jsonify({
+                "conso_predite_kwh": conso_predite
+            })
+        return response, 200
 
     except KeyError as e:
-        print(f"Erreur de cle: {e}")
+        logger.warning(f"Cle manquante dans les donnees: {e}", extra={"route": request.path})
         return jsonify({"error": f"Cle manquante dans les donnees: {e}"}), 500
-    
-    # 4. Conversion des OHE/Booléennes (logement, type_batiment, énergie)
-    
-    # Logement (Neuf/Ancien)
-    if data_brute.get('logement') == 'Neuf':
-        data_dico['logement_neuf'] = 1
-        print("Batiment marque comme neuf")
 
-    # Énergie (Même logique pour l'API de Régression que pour la DPE)
-    energie_chauffage = data_brute.get('type_energie_principale_chauffage', '').strip()
-    energie_n1 = data_brute.get('type_energie_n1', '').strip()
-
-    if energie_chauffage:
-        key = f'type_energie_principale_chauffage_{energie_chauffage}'.replace(' ', '_')
-        if key in data_dico:
-             data_dico[key] = 1
-             print(f"Energie chauffage activee: {key}")
-
-    if energie_n1:
-        key = f'type_energie_n1_{energie_n1}'.replace(' ', '_')
-        if key in data_dico:
-             data_dico[key] = 1
-             print(f"Energie N1 activee: {key}")
-
-    # --- ÉTAPE 2 : PRÉ-TRAITEMENT SCALARISATION (Manuel) ---
+    except Exception as e:
+        logger.exception(f"Erreur scikit-learn/prediction : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur interne lors de la prediction : {str(e)}"}), 500
 
-    df_input = pd.DataFrame([data_dico])
+# ----------------------------------------------------
+# 3 bis. ROUTE DE PRÉDICTION PAR LOT (/predict_conso/batch)
+# ----------------------------------------------------
 
+@metrics.timed('encode')
+def encode_conso_batch(records):
+    """Encode tous les logements en une matrice dans l'ordre All_Data.
+
+    Renvoie la matrice et les erreurs par ligne {indice: message} ; une ligne en
+    erreur n'interrompt pas le lot.
+    """
+    X, errors = conso_encoder.encode_batch(records)
+    return X, {i: error_message(error) for i, error in errors.items()}
+
+@metrics.timed('encode')
+def encode_conso_columns(columns, n):
+    """Comme encode_conso_batch pour un lot en colonnes (requete Arrow)"""
+    X, errors = conso_encoder.encode_columns(columns, n)
+    return X, {i: error_message(error) for i, error in errors.items()}
+
+@metrics.timed('inference')
+def predict_conso_rows(artifacts, X, errors):
+    """Consommations arrondies (kWh) des lignes sans erreur et masque de ces lignes"""
+    valid = np.ones(len(X), dtype=bool)
+    valid[list(errors)] = False
+    consos = np.zeros(len(X), dtype=np.float64)
+    if valid.any():
+        consos[valid] = np.round(np.maximum(artifacts.predict(X[valid]), 0), 2)
+    return consos, valid
+
+def parse_batch_payload():
+    """Lit le corps d'une requete batch : tableau JSON ou NDJSON"""
+    if request.mimetype not in NDJSON_MIMETYPES:
+        data = request.get_json(force=True, silent=True)
+        if isinstance(data, list):
+            return data
+        if data is not None:
+            raise ValueError("Le corps doit etre un tableau JSON de logements.")
+
+    records = []
+    for line in request.get_data(as_text=True).splitlines():
+        if line.strip():
+            records.append(json.loads(line))
+    return records
+
+@app.route('/predict_conso/batch', methods=['POST'])
+def predict_conso_batch():
+    if not conso_loader.ready:
+        return jsonify({"error": "Modele de Consommation non charge ou indisponible."}), 503
+    if arrow_io.is_arrow_request(request):
+        return predict_conso_batch_arrow()
+    if ndjson_stream.wants_stream(request):
+        # Tout le flux est predit avec le modele en service a son debut
+        artifacts = conso_artifacts
+        return ndjson_stream.stream_response(request, lambda records: score_conso_records(artifacts, records))
+
+    t_start = time.perf_counter()
     try:
-        X_standard_input = df_input[Variable_Standardisee]
-        X_passthrough_input = df_input[Data_OHE_Boolean]
-
-        # Imputation 
-        X_imputed = lr_imputer.transform(X_standard_input)
-
-        # Standardisation 
-        X_scaled = lr_scaler.transform(X_imputed)
+        records = parse_batch_payload()
+    except ValueError as e:
+        return jsonify({"error": f"Format JSON/NDJSON invalide : {e}"}), 400
+
+    if not records:
+        return jsonify({"error": "Aucun logement a predire."}), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Lot trop volumineux (maximum {MAX_BATCH_SIZE} logements)."}), 413
+    t_parse = time.perf_counter()
+    metrics.add_stage('parse', t_parse - t_start)
+
+    artifacts = conso_artifacts
+    try:
+        X_brut, errors = encode_conso_batch(records)
+        t_encode = time.perf_counter()
 
-        # Reconstruction de la matrice finale 
-        X_final_matrix = np.hstack((X_scaled, X_passthrough_input.values))
+        # Meme bornage et meme arrondi que les modes streaming et Arrow
+        consos, valid = predict_conso_rows(artifacts, X_brut, errors)
+        predictions = [conso if ok else None for conso, ok in zip(consos.tolist(), valid.tolist())]
+        t_predict = time.perf_counter()
 
-        # --- ÉTAPE 3 : PRÉDICTION ---
-        prediction_brute = lr_model.predict(X_final_matrix)[0]
-        prediction_finale = max(0, prediction_brute)
-        
-        print(f"Prediction consommation: {prediction_finale:.2f} kWh/an")
+    except Exception as e:
+        logger.exception(f"Erreur interne lors de la prediction batch : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur interne lors de la prediction batch : {str(e)}"}), 500
+
+    logger.debug("Prediction batch consommation", extra={"n_logements": int(valid.sum()), "n_erreurs": len(errors)})
+
+    with metrics.stage('serialize'):
+        response = jsonify({
+            "predictions_conso_kwh": predictions,
+            "n_logements": len(records),
+            "n_erreurs": len(errors),
+            "erreurs": [{"index": i, "error": message} for i, message in sorted(errors.items())],
+            "timings_ms": {
+                "parse": round((t_parse - t_start) * 1000, 3),
+                "encode": round((t_encode - t_parse) * 1000, 3),
+                "predict": round((t_predict - t_encode) * 1000, 3),
+                "total": round((t_predict - t_start) * 1000, 3)
+            }
+        })
+    return response, 200
+
+def score_conso_records(artifacts, records):
+    """Consommations d'un bloc de logements du mode streaming"""
+    X_brut, errors = encode_conso_batch(records)
+    consos, valid = predict_conso_rows(artifacts, X_brut, errors)
+    return {"conso_predite_kwh": (consos, valid)}, errors
+
+def predict_conso_batch_arrow():
+    """/predict_conso/batch en Arrow IPC : colonnes encodees directement, reponse Arrow"""
+    t_start = time.perf_counter()
+    try:
+        columns, n = arrow_io.read_request(request)
+    except ValueError as e:
+        return jsonify({"error": f"Flux Arrow IPC invalide : {e}"}), 400
+
+    if n == 0:
+        return jsonify({"error": "Aucun logement a predire."}), 400
+    if n > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Lot trop volumineux (maximum {MAX_BATCH_SIZE} logements)."}), 413
+    t_parse = time.perf_counter()
+    metrics.add_stage('parse', t_parse - t_start)
+
+    artifacts = conso_artifacts
+    try:
+        X_brut, errors = encode_conso_columns(columns, n)
+        t_encode = time.perf_counter()
+        consos, valid = predict_conso_rows(artifacts, X_brut, errors)
+        t_predict = time.perf_counter()
+    except Exception as e:
+        logger.exception(f"Erreur interne lors de la prediction batch : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur interne lors de la prediction batch : {str(e)}"}), 500
 
-        return jsonify({
-            "conso_predite_kwh": float(f"{prediction_finale:.2f}")
-        }), 200
+    logger.debug("Prediction batch consommation (Arrow)",
+                 extra={"n_logements": int(valid.sum()), "n_erreurs": len(errors)})
 
-    except Exception as e:
-        print(f"Erreur scikit-learn/prediction : {str(e)}")
-        return jsonify({"error": f"Erreur interne lors de la prediction : {str(e)}"}), 500
+    with metrics.stage('serialize'):
+        return arrow_io.arrow_response({"predictions_conso_kwh": (consos, valid)}, errors, n, {
+            "parse": round((t_parse - t_start) * 1000, 3),
+            "encode": round((t_encode - t_parse) * 1000, 3),
+            "predict": round((t_predict - t_encode) * 1000, 3),
+            "total": round((t_predict - t_start) * 1000, 3)
+        }, request.mimetype)
 
 # ----------------------------------------------------
 # 4. ROUTE DE SANTÉ
@@ -202,21 +430,41 @@ def predict_conso():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Route pour vérifier que l'API est prête"""
-    if lr_model is None or lr_imputer is None or lr_scaler is None:
+    """Route pour vérifier que l'API est prête (?wait=N : attend au plus N s la fin du chargement)"""
+    wait = health_wait_seconds(request.args)
+    if wait and not conso_loader.done:
+        conso_loader.wait(wait)
+
+    loading = conso_loader.snapshot()
+    if not conso_loader.ready:
         return jsonify({
-            "status": "not ready", 
+            "status": loading["phase"], 
             "model_loaded": lr_model is not None,
             "imputer_loaded": lr_imputer is not None,
-            "scaler_loaded": lr_scaler is not None
+            "scaler_loaded": lr_scaler is not None,
+            "loading": loading
         }), 503
         
-    return jsonify({
+    status = {
         "status": "ready", 
         "model_loaded": True,
         "imputer_loaded": True,
-        "scaler_loaded": True
-    }), 200
+        "scaler_loaded": True,
+        "model_version": conso_artifacts.version,
+        "loading": loading,
+        "reload": conso_reloader.status(),
+        "cache": prediction_cache.stats()
+    }
+    if conso_batcher is not None:
+        status["micro_batching"] = conso_batcher.stats()
+    return jsonify(status), 200
+
+# Rechargement a chaud : POST /admin/reload, surveillance des fichiers et SIGHUP
+reloaders = [conso_reloader]
+reload_admin.register(app, reloaders)
+
+# Compteurs, latences par etape et chargements exposes sur GET /metrics (Prometheus)
+metrics.register(app)
 
 @app.route('/', methods=['GET'])
 def home():
@@ -232,6 +480,14 @@ def home():
 # ----------------------------------------------------
 
 if __name__ == '__main__':
-    print("Lancement de l'API Consommation sur le port 5000...")
-    print("API prete a recevoir des requetes")
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    # Port, nombre de workers, backlog et socket Unix fournis par APIManager (ou docker-compose)
+    port = int(os.environ.get('PORT', 5000))
+    workers = int(os.environ.get('API_WORKERS', 1))
+    backlog = int(os.environ.get('API_BACKLOG', 128))
+
+    logger.info(f"Lancement de l'API Consommation sur le port {port}...", extra={"port": port, "workers": workers})
+    # En pre-fork, les workers sont crees une fois les assets charges par le maitre
+    serve(app, host='0.0.0.0', port=port, workers=workers, backlog=backlog, preload=conso_loader.wait,
+          on_start=lambda: reload_admin.start_watchers(reloaders),
+          on_reload=lambda trigger: reload_admin.reload_all(reloaders, trigger),
+          unix_socket=os.environ.get(uds_transport.SOCKET_ENV))
\ No newline at end of file
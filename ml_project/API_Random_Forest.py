@@ -1,15 +1,42 @@
 from flask import Flask, request, jsonify
 import pickle
-import pandas as pd
+import json
+import time
+import logging
 import numpy as np 
 from joblib import load
 import os 
 import pathlib 
+import warnings
 from file_loader import setup_heavy_files
+from feature_encoders import Numbers, error_message
+from feature_spec import ORDINAL_CATEGORIES, dpe_feature_spec, drift_report
+from forest_engine import FlatForest, export_mmap_artifact
+from prefork_server import serve
+from prediction_cache import PredictionCache
+from micro_batcher import MicroBatcher, MICROBATCH_ENABLED
+from model_loader import (LoadProgress, ModelReloader, PHASE_DOWNLOADING, PHASE_LOADING,
+                          artifact_version, health_wait_seconds)
+import reload_admin
+import readiness
+import metrics
+import uds_transport
+import api_logging
+import arrow_io
+import ndjson_stream
+from ndjson_stream import NDJSON_MIMETYPES
 
-print("Initialisation de l'API DPE...")
+# Lancee comme serveur (APIManager, docker-compose) : une ligne JSON par evenement sur stdout,
+# relue par APIManager (cf. log_collector). Importee (bulk_score, benchmarks), l'API laisse
+# la configuration du journal au programme qui l'importe.
+if __name__ == '__main__':
+    api_logging.setup()
+
+logger = logging.getLogger('api.dpe')
+logger.info("Initialisation de l'API DPE...")
 
-setup_heavy_files()
+# Assets de consommation charges dans ce processus pour /predict_full (DPE -> consommation sans second appel HTTP)
+import API_Lineaire_Reg as conso_api
 
 app_dpe = Flask(__name__)
 
@@ -19,95 +46,578 @@ CURRENT_DIR = pathlib.Path(__file__).parent
 # 2. DÉFINIR LE RÉPERTOIRE CONTENANT LES MODÈLES
 MODELS_DIR = CURRENT_DIR 
 
+# Variante de foret servie (cf. section 7 de Modeles/Modele_RandomForest.py) :
+# "final_weighted" (production) ou une variante compacte, ex. "d16_leaf10_n60"
+DPE_MODEL_VARIANT = os.environ.get('DPE_MODEL_VARIANT', 'final_weighted')
+
 # Les chemins absolus des fichiers de modèles
-MODEL_FILE = MODELS_DIR / 'random_forest_dpe_final_weighted.joblib'
+MODEL_FILE = MODELS_DIR / f'random_forest_dpe_{DPE_MODEL_VARIANT}.joblib'
 COLUMNS_FILE = MODELS_DIR / 'feature_columns_final.pkl'
+# Foret a plat + colonnes, non compresses, pour un chargement en mmap_mode='r'
+MMAP_MODEL_FILE = MODELS_DIR / f'random_forest_dpe_{DPE_MODEL_VARIANT}.mmap.joblib'
 
 model = None
 FEATURE_COLUMNS = []
+dpe_encoder = None
+flat_forest = None
 
-# --- DÉFINITION DU PRÉ-TRAITEMENT (CRITIQUE) ---
+# Artefacts en service, remplaces d'un bloc lors d'un rechargement a chaud : chaque requete
+# en prend une reference au debut et termine avec, meme si un nouveau modele est installe entre-temps
+dpe_artifacts = None
 
-ORDINAL_CATEGORIES = {
-    'qualite_isolation_murs': ['Insuffisante', 'Moyenne', 'bonne', 'tres bonne'], 
-    'nombre_appartement_cat': [
-        'Maison(Unitaire ou 2 à 3 logements)',
-        'Petit Collectif(4 à 9 logements)',
-        'Moyen Collectif(10 à 30 logements)',
-        'Grand Collectif(> 30 logements)'
-    ]
-}
+# Avancement du chargement en arriere-plan (expose par /health)
+dpe_loader = LoadProgress()
 
-def load_dpe():
-    global model, FEATURE_COLUMNS
-    try:
-        print("Chargement du modele DPE...")
+# Cache LRU des predictions unitaires, vide a chaque chargement du modele
+prediction_cache = PredictionCache(name="dpe")
+
+# Moteur d'inference : "flat" (tableaux NumPy, cf. forest_engine) ou "sklearn" (model.predict)
+DPE_ENGINE = os.environ.get('DPE_ENGINE', 'flat')
+
+# Artefacts : "compressed" (joblib compress=3, copie privee par processus)
+# ou "mmap" (non compresse, projete en memoire et partage via le cache de pages)
+DPE_ARTIFACT_MODE = os.environ.get('DPE_ARTIFACT_MODE', 'compressed')
+
+# Au-dela de ce nombre de lignes, model.predict (Cython multi-thread) redevient plus rapide
+FLAT_ENGINE_MAX_ROWS = int(os.environ.get('DPE_FLAT_MAX_ROWS', 256))
+
+# Le modele est entraine sur un DataFrame mais recoit des matrices numpy deja alignees
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# --- DÉFINITION DU PRÉ-TRAITEMENT (CRITIQUE) : cf. feature_spec.dpe_feature_spec ---
+
+# Nombre maximal de logements acceptes par appel a /predict_dpe/batch
+MAX_BATCH_SIZE = 100000
+
+class DPEArtifacts:
+    """Modele DPE charge avec ses colonnes, son encodeur et sa foret a plat"""
+
+    def __init__(self, model, feature_columns, flat_forest, version):
+        self.model = model
+        self.feature_columns = feature_columns
+        self.flat_forest = flat_forest
+        self.encoder = dpe_feature_spec(feature_columns).compile()
+        self.version = version
+
+    def predict(self, X):
+        """Classes DPE predites pour une matrice alignee sur feature_columns"""
+        if self.flat_forest is not None and len(X) <= FLAT_ENGINE_MAX_ROWS:
+            return self.flat_forest.predict(X)
+        return self.model.predict(X)
+
+def build_dpe(progress):
+    """Charge les artefacts DPE depuis le disque, sans toucher au modele en service"""
+    progress.set_phase(PHASE_DOWNLOADING)
+    setup_heavy_files()
+    progress.set_phase(PHASE_LOADING)
+
+    logger.info(f"Chargement du modele DPE (variante {DPE_MODEL_VARIANT})...")
+    version = artifact_version([MODEL_FILE, COLUMNS_FILE])
+    flat = None
+    if DPE_ARTIFACT_MODE == 'mmap':
+        # 1. Projeter la foret a plat et les colonnes en memoire, sans copie privee
+        # (le modele sklearn n'est pas charge : ses arbres seraient recopies dans le tas)
+        # L'artefact est (re)exporte s'il est absent ou plus ancien que le modele source
+        if not MMAP_MODEL_FILE.exists() or MMAP_MODEL_FILE.stat().st_mtime_ns < MODEL_FILE.stat().st_mtime_ns:
+            logger.warning(f"Artefact mmap absent ou perime, export depuis {MODEL_FILE.name}...")
+            with progress.open(MODEL_FILE) as f_model, progress.open(COLUMNS_FILE) as f:
+                export_mmap_artifact(load(f_model), pickle.load(f), MMAP_MODEL_FILE)
+
+        # Projection sans lecture : la taille de l'artefact compte comme chargee
+        progress.expect(MMAP_MODEL_FILE)
+        arrays = load(MMAP_MODEL_FILE, mmap_mode='r')
+        progress.add_bytes(MMAP_MODEL_FILE.stat().st_size)
+        flat = FlatForest.from_arrays(arrays)
+        columns = arrays['feature_columns'].tolist()
+        loaded_model = flat
+        logger.info("Modele DPE et features columns projetes en memoire (mmap)")
+    else:
         # 1. Charger le modèle et la liste des colonnes
-        model = load(MODEL_FILE)
-        print("Modele DPE charge")
-        
-        with open(COLUMNS_FILE, 'rb') as f:
-            FEATURE_COLUMNS = pickle.load(f)
-        print("Features columns chargees")
-        
-        print("Modele DPE (Classification) charge avec succes.")
+        progress.expect(MODEL_FILE, COLUMNS_FILE)
+        with progress.open(MODEL_FILE) as f:
+            loaded_model = load(f)
+        logger.info("Modele DPE charge")
+
+        with progress.open(COLUMNS_FILE) as f:
+            columns = pickle.load(f)
+        logger.info("Features columns chargees")
+
+        # Exporter la foret en tableaux plats pour l'inference NumPy
+        if DPE_ENGINE == 'flat':
+            flat = FlatForest.from_sklearn(loaded_model)
+            logger.info(f"Moteur DPE a plat pret ({len(flat.feature)} noeuds)")
+
+        # En pre-fork, chaque worker sert ses requetes sur un coeur : pas de threads joblib concurrents
+        if int(os.environ.get('API_WORKERS', 1)) > 1:
+            loaded_model.set_params(n_jobs=1)
+
+    # 2. Compiler l'encodeur des requetes sur ces colonnes
+    artifacts = DPEArtifacts(loaded_model, columns, flat, version)
+    logger.info("Encodeur DPE compile")
+    # Valeurs du formulaire que le modele ne distingue pas (vocabulaire d'entrainement different)
+    for field, values in drift_report(artifacts.encoder.spec).items():
+        logger.warning(f"Vocabulaire DPE : {field} = {values} sans effet sur le modele", extra={"field": field})
+    return artifacts
+
+# Logement de controle predit avant toute mise en service d'un modele
+SMOKE_PAYLOAD = {
+    'periode_construction': '1975-1977',
+    'nombre_appartement_cat': 'Maison(Unitaire ou 2 à 3 logements)',
+    'type_energie_n1': 'Gaz naturel',
+    'type_energie_principale_chauffage': 'Gaz naturel',
+    'qualite_isolation_murs': 'Moyenne',
+    'logement': 'Ancien',
+    'surface_habitable_logement': 100,
+    'hauteur_sous_plafond': 2.5
+}
+
+def smoke_test_dpe(artifacts):
+    """Refuse un modele incapable de predire une classe connue pour le logement de controle"""
+    prediction = artifacts.predict(artifacts.encoder.encode(SMOKE_PAYLOAD))
+    if len(prediction) != 1 or prediction[0] not in artifacts.model.classes_:
+        raise ValueError(f"Prediction de controle invalide : {prediction!r}")
+
+def install_dpe(artifacts):
+    """Met les artefacts en service d'une seule affectation"""
+    global dpe_artifacts, model, FEATURE_COLUMNS, dpe_encoder, flat_forest
+    dpe_artifacts = artifacts
+    # Alias conserves pour les scripts (benchmarks) qui lisent les globales du module
+    model, FEATURE_COLUMNS = artifacts.model, artifacts.feature_columns
+    dpe_encoder, flat_forest = artifacts.encoder, artifacts.flat_forest
+    # Les predictions en cache viennent de l'ancien modele
+    prediction_cache.clear()
+    logger.info(f"Modele DPE (Classification) version {artifacts.version} en service.",
+                extra={"version": artifacts.version})
+
+dpe_reloader = ModelReloader('DPE', build_dpe, smoke_test_dpe, install_dpe, [MODEL_FILE, COLUMNS_FILE])
 
+def load_dpe(progress):
+    try:
+        dpe_reloader.load(progress)
     except FileNotFoundError as e:
-        print(f"ERREUR FATALE: Fichier non trouve lors du chargement: {e}")
-        model = None
+        logger.critical(f"ERREUR FATALE: Fichier non trouve lors du chargement: {e}")
+        readiness.notify(readiness.EVENT_LOAD_FAILED, model='DPE', error=str(e))
+        raise
     except Exception as e:
-        print(f"ERREUR FATALE DPE : {e}")
-        model = None
+        logger.critical(f"ERREUR FATALE DPE : {e}")
+        readiness.notify(readiness.EVENT_LOAD_FAILED, model='DPE', error=str(e))
+        raise
+    readiness.notify(readiness.EVENT_MODEL_LOADED, model='DPE', version=dpe_artifacts.version)
+
+def predict_classes(X):
+    """Classes DPE predites pour une matrice alignee sur FEATURE_COLUMNS (modele en service)"""
+    return dpe_artifacts.predict(X)
+
+# Micro-batching optionnel (MICROBATCH_ENABLED=1) des predictions unitaires concurrentes
+dpe_batcher = MicroBatcher(predict_classes, name="dpe") if MICROBATCH_ENABLED else None
+
+# Le port est ouvert tout de suite : le modele se charge en arriere-plan
+logger.info("Demarrage du chargement du modele DPE en arriere-plan...")
+dpe_loader.start(load_dpe)
+
+def predict_dpe_index(data):
+    """Classe DPE predite (indice) d'un logement, via le cache"""
+    artifacts = dpe_artifacts
+
+    # 1. Profil deja predit : reponse directe depuis le cache
+    cache_key = prediction_cache.make_key(data)
+    cache_generation = prediction_cache.generation
+    cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # 2. PRÉ-TRAITEMENT : écriture directe dans le buffer aligné sur FEATURE_COLUMNS
+    with metrics.stage('encode'):
+        X_final = artifacts.encoder.encode(data)
 
-print("Demarrage du chargement du modele DPE...")
-load_dpe() 
+    # 3. Prédiction (regroupée avec les requêtes concurrentes si le micro-batching est actif)
+    if dpe_batcher is not None:
+        # Attente du lot (batch_wait) et appel au modele (inference) comptes par le batcher
+        prediction_numpy = dpe_batcher.submit(X_final[0].copy(), artifacts.predict)
+    else:
+        with metrics.stage('inference'):
+            prediction_numpy = artifacts.predict(X_final)[0]
+    prediction_DPE = int(prediction_numpy) 
+    prediction_cache.put(cache_key, prediction_DPE, cache_generation)
+    return prediction_DPE
 
 @app_dpe.route('/predict_dpe', methods=['POST'])
 def predict_dpe():
-    if model is None:
+    if not dpe_loader.ready:
         return jsonify({"error": "Modele DPE non charge ou non disponible."}), 503
     
     try:
-        data = request.get_json(force=True)
+        with metrics.stage('parse'):
+            data = request.get_json(force=True)
+    except Exception:
+        return jsonify({"error": "Format JSON invalide ou manquant."}), 400
+
+    try:
+        prediction_DPE = predict_dpe_index(data)
+
+        with metrics.stage('serialize'):
+            response = jsonify({
+                "prediction_DPE_index": prediction_DPE 
+            })
+        return response, 200
+
+    except Exception as e:
+        logger.exception(f"Erreur interne lors du pre-traitement : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur lors de la prediction : {str(e)}"}), 500
+
+@app_dpe.route('/predict_full', methods=['POST'])
+def predict_full():
+    """Classe DPE puis consommation du meme logement, en une seule requete"""
+    if not dpe_loader.ready:
+        return jsonify({"error": "Modele DPE non charge ou non disponible."}), 503
+    if not conso_api.conso_loader.ready:
+        return jsonify({"error": "Modele de Consommation non charge ou indisponible."}), 503
+
+    try:
+        with metrics.stage('parse'):
+            data = request.get_json(force=True)
     except Exception:
         return jsonify({"error": "Format JSON invalide ou manquant."}), 400
+    if not isinstance(data, dict):
+        return jsonify({"error": "Le logement doit etre un objet JSON."}), 400
 
     try:
-        input_df = pd.DataFrame([data])
-        df_processed = input_df.copy()
-        
-        # 2. PRÉ-TRAITEMENT MANUEL
-        for col, categories in ORDINAL_CATEGORIES.items():
-            mapping = {category: i for i, category in enumerate(categories)}
-            df_processed[col] = df_processed[col].map(mapping).fillna(-1) 
-        
-        df_processed = pd.get_dummies(df_processed, drop_first=False) 
-        
-        # 3. Création de la matrice finale pour le modèle
-        X_final = pd.DataFrame(0, index=[0], columns=FEATURE_COLUMNS)
-
-        for col in df_processed.columns:
-            if col in X_final.columns:
-                X_final.loc[0, col] = df_processed.loc[0, col]
-        
-        # 4. Prédiction
-        prediction_numpy = model.predict(X_final)[0]
-        prediction_DPE = int(prediction_numpy) 
-
-        return jsonify({
-            "prediction_DPE_index": prediction_DPE 
-        }), 200
+        prediction_DPE = predict_dpe_index(data)
+    except Exception as e:
+        logger.exception(f"Erreur interne lors du pre-traitement : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur lors de la prediction : {str(e)}"}), 500
 
+    # L'etiquette predite alimente directement le modele de consommation
+    try:
+        conso_predite = conso_api.predict_conso_value(dict(data, etiquette_dpe=prediction_DPE))
+    except KeyError as e:
+        return jsonify({"error": f"Cle manquante dans les donnees: {e}"}), 500
     except Exception as e:
-        print(f"Erreur interne lors du pre-traitement : {str(e)}")
-        return jsonify({f"Erreur lors de la prediction : {str(e)}"}), 500
+        logger.exception(f"Erreur scikit-learn/prediction : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur interne lors de la prediction : {str(e)}"}), 500
+
+    with metrics.stage('serialize'):
+        response = jsonify({
+            "prediction_DPE_index": prediction_DPE,
+            "conso_predite_kwh": conso_predite
+        })
+    return response, 200
+
+def parse_batch_payload():
+    """Lit le corps d'une requete batch : tableau JSON ou NDJSON"""
+    if request.mimetype not in NDJSON_MIMETYPES:
+        data = request.get_json(force=True, silent=True)
+        if isinstance(data, list):
+            return data
+        if data is not None:
+            raise ValueError("Le corps doit etre un tableau JSON de logements.")
+
+    records = []
+    for line in request.get_data(as_text=True).splitlines():
+        if line.strip():
+            records.append(json.loads(line))
+    return records
+
+@metrics.timed('encode')
+def encode_dpe_batch(records, artifacts=None):
+    """Encode tous les logements en une seule matrice alignee sur les colonnes du modele.
+
+    Memes regles qu'une requete unitaire ; renvoie la matrice et les erreurs par ligne {indice: message}.
+    """
+    encoder = (artifacts or dpe_artifacts).encoder
+    X, errors = encoder.encode_batch(records)
+    return X, {i: error_message(error) for i, error in errors.items()}
+
+@metrics.timed('encode')
+def encode_dpe_columns(columns, n, artifacts=None):
+    """Comme encode_dpe_batch pour un lot en colonnes (requete Arrow)"""
+    encoder = (artifacts or dpe_artifacts).encoder
+    X, errors = encoder.encode_columns(columns, n)
+    return X, {i: error_message(error) for i, error in errors.items()}
+
+@metrics.timed('inference')
+def predict_valid_labels(artifacts, X, errors):
+    """Classes predites (tableau d'entiers) et masque des lignes sans erreur"""
+    valid = np.ones(len(X), dtype=bool)
+    valid[list(errors)] = False
+    labels = np.zeros(len(X), dtype=np.int64)
+    if valid.any():
+        labels[valid] = artifacts.predict(X[valid]).astype(int)
+    return labels, valid
+
+def predict_valid_rows(artifacts, X, errors):
+    """Classes predites des lignes sans erreur (None pour les autres)"""
+    labels, valid = predict_valid_labels(artifacts, X, errors)
+    return [label if ok else None for label, ok in zip(labels.tolist(), valid.tolist())]
+
+@app_dpe.route('/predict_dpe/batch', methods=['POST'])
+def predict_dpe_batch():
+    if not dpe_loader.ready:
+        return jsonify({"error": "Modele DPE non charge ou non disponible."}), 503
+    if arrow_io.is_arrow_request(request):
+        return predict_dpe_batch_arrow()
+    if ndjson_stream.wants_stream(request):
+        artifacts = dpe_artifacts
+        return ndjson_stream.stream_response(request, lambda records: score_dpe_records(artifacts, records))
+
+    t_start = time.perf_counter()
+    try:
+        records = parse_batch_payload()
+    except ValueError as e:
+        return jsonify({"error": f"Format JSON/NDJSON invalide : {e}"}), 400
+
+    if not records:
+        return jsonify({"error": "Aucun logement a predire."}), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Lot trop volumineux (maximum {MAX_BATCH_SIZE} logements)."}), 413
+    t_parse = time.perf_counter()
+    metrics.add_stage('parse', t_parse - t_start)
+
+    artifacts = dpe_artifacts
+    try:
+        X_final, errors = encode_dpe_batch(records, artifacts)
+        t_encode = time.perf_counter()
+
+        predictions = predict_valid_rows(artifacts, X_final, errors)
+        t_predict = time.perf_counter()
+
+    except Exception as e:
+        logger.exception(f"Erreur interne lors de la prediction batch : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur lors de la prediction batch : {str(e)}"}), 500
+
+    with metrics.stage('serialize'):
+        response = jsonify({
+            "predictions_DPE_index": predictions,
+            "n_logements": len(predictions),
+            "n_erreurs": len(errors),
+            "erreurs": [{"index": i, "error": message} for i, message in sorted(errors.items())],
+            "timings_ms": {
+                "parse": round((t_parse - t_start) * 1000, 3),
+                "encode": round((t_encode - t_parse) * 1000, 3),
+                "predict": round((t_predict - t_encode) * 1000, 3),
+                "total": round((t_predict - t_start) * 1000, 3)
+            }
+        })
+    return response, 200
+
+@app_dpe.route('/predict_full/batch', methods=['POST'])
+def predict_full_batch():
+    if not dpe_loader.ready:
+        return jsonify({"error": "Modele DPE non charge ou non disponible."}), 503
+    if not conso_api.conso_loader.ready:
+        return jsonify({"error": "Modele de Consommation non charge ou indisponible."}), 503
+    if arrow_io.is_arrow_request(request):
+        return predict_full_batch_arrow()
+    if ndjson_stream.wants_stream(request):
+        artifacts, conso_artifacts = dpe_artifacts, conso_api.conso_artifacts
+        return ndjson_stream.stream_response(
+            request, lambda records: score_full_records(artifacts, conso_artifacts, records))
+
+    t_start = time.perf_counter()
+    try:
+        records = parse_batch_payload()
+    except ValueError as e:
+        return jsonify({"error": f"Format JSON/NDJSON invalide : {e}"}), 400
+
+    if not records:
+        return jsonify({"error": "Aucun logement a predire."}), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Lot trop volumineux (maximum {MAX_BATCH_SIZE} logements)."}), 413
+    t_parse = time.perf_counter()
+    metrics.add_stage('parse', t_parse - t_start)
+
+    artifacts, conso_artifacts = dpe_artifacts, conso_api.conso_artifacts
+    try:
+        X_dpe, errors = encode_dpe_batch(records, artifacts)
+        t_encode_dpe = time.perf_counter()
+
+        predictions_dpe = predict_valid_rows(artifacts, X_dpe, errors)
+        t_predict_dpe = time.perf_counter()
+
+        # Chaque logement recoit son etiquette predite ; les lignes invalides sont signalees une a une
+        labelled = [dict(record, etiquette_dpe=label) if label is not None and isinstance(record, dict) else record
+                    for record, label in zip(records, predictions_dpe)]
+        X_conso, conso_errors = conso_api.encode_conso_batch(labelled)
+        for i, message in conso_errors.items():
+            errors.setdefault(i, message)
+        t_encode_conso = time.perf_counter()
+
+        consos, valid = conso_api.predict_conso_rows(conso_artifacts, X_conso, errors)
+        predictions_conso = [conso if ok else None for conso, ok in zip(consos.tolist(), valid.tolist())]
+        t_predict_conso = time.perf_counter()
+
+    except Exception as e:
+        logger.exception(f"Erreur interne lors de la prediction batch : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur lors de la prediction batch : {str(e)}"}), 500
+
+    with metrics.stage('serialize'):
+        response = jsonify({
+            "predictions_DPE_index": predictions_dpe,
+            "predictions_conso_kwh": predictions_conso,
+            "n_logements": len(records),
+            "n_erreurs": len(errors),
+            "erreurs": [{"index": i, "error": message} for i, message in sorted(errors.items())],
+            "timings_ms": {
+                "parse": round((t_parse - t_start) * 1000, 3),
+                "encode_dpe": round((t_encode_dpe - t_parse) * 1000, 3),
+                "predict_dpe": round((t_predict_dpe - t_encode_dpe) * 1000, 3),
+                "encode_conso": round((t_encode_conso - t_predict_dpe) * 1000, 3),
+                "predict_conso": round((t_predict_conso - t_encode_conso) * 1000, 3),
+                "total": round((t_predict_conso - t_start) * 1000, 3)
+            }
+        })
+    return response, 200
+
+def score_dpe_records(artifacts, records):
+    """Classes DPE d'un bloc de logements du mode streaming"""
+    X_final, errors = encode_dpe_batch(records, artifacts)
+    labels, valid = predict_valid_labels(artifacts, X_final, errors)
+    return {"prediction_DPE_index": (labels, valid)}, errors
+
+def score_full_records(artifacts, conso_artifacts, records):
+    """DPE puis consommation d'un bloc de logements du mode streaming (cf. /predict_full/batch)"""
+    X_dpe, errors = encode_dpe_batch(records, artifacts)
+    labels, valid_dpe = predict_valid_labels(artifacts, X_dpe, errors)
+    labelled = [dict(record, etiquette_dpe=label) if ok and isinstance(record, dict) else record
+                for record, label, ok in zip(records, labels.tolist(), valid_dpe.tolist())]
+    X_conso, conso_errors = conso_api.encode_conso_batch(labelled)
+    for i, message in conso_errors.items():
+        errors.setdefault(i, message)
+    consos, valid = conso_api.predict_conso_rows(conso_artifacts, X_conso, errors)
+    return {"prediction_DPE_index": (labels, valid), "conso_predite_kwh": (consos, valid)}, errors
+
+def read_arrow_batch():
+    """Colonnes d'une requete Arrow, ou la reponse d'erreur a renvoyer"""
+    try:
+        columns, n = arrow_io.read_request(request)
+    except ValueError as e:
+        return None, 0, (jsonify({"error": f"Flux Arrow IPC invalide : {e}"}), 400)
+    if n == 0:
+        return None, 0, (jsonify({"error": "Aucun logement a predire."}), 400)
+    if n > MAX_BATCH_SIZE:
+        return None, 0, (jsonify({"error": f"Lot trop volumineux (maximum {MAX_BATCH_SIZE} logements)."}), 413)
+    return columns, n, None
+
+def predict_dpe_batch_arrow():
+    """/predict_dpe/batch en Arrow IPC : colonnes encodees directement, reponse Arrow"""
+    t_start = time.perf_counter()
+    columns, n, failure = read_arrow_batch()
+    if failure:
+        return failure
+    t_parse = time.perf_counter()
+    metrics.add_stage('parse', t_parse - t_start)
+
+    artifacts = dpe_artifacts
+    try:
+        X_final, errors = encode_dpe_columns(columns, n, artifacts)
+        t_encode = time.perf_counter()
+        labels, valid = predict_valid_labels(artifacts, X_final, errors)
+        t_predict = time.perf_counter()
+    except Exception as e:
+        logger.exception(f"Erreur interne lors de la prediction batch : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur lors de la prediction batch : {str(e)}"}), 500
+
+    with metrics.stage('serialize'):
+        return arrow_io.arrow_response({"predictions_DPE_index": (labels, valid)}, errors, n, {
+            "parse": round((t_parse - t_start) * 1000, 3),
+            "encode": round((t_encode - t_parse) * 1000, 3),
+            "predict": round((t_predict - t_encode) * 1000, 3),
+            "total": round((t_predict - t_start) * 1000, 3)
+        }, request.mimetype)
+
+def predict_full_columns(columns, n, artifacts, conso_artifacts, timings=None):
+    """DPE puis consommation sur un lot en colonnes : l'etiquette predite devient une colonne de l'encodage conso.
+
+    Renvoie les classes, les consommations, leurs masques de lignes valides et les erreurs ;
+    `timings` (dict) recoit la duree de chaque etape en secondes. Partage par la route Arrow
+    et le scoring de masse (bulk_score.py).
+    """
+    t_start = time.perf_counter()
+    X_dpe, errors = encode_dpe_columns(columns, n, artifacts)
+    t_encode_dpe = time.perf_counter()
+
+    labels, valid_dpe = predict_valid_labels(artifacts, X_dpe, errors)
+    t_predict_dpe = time.perf_counter()
+
+    # Lignes sans etiquette (erreur DPE) : null, donc en erreur cote conso comme en JSON
+    etiquettes = np.where(valid_dpe, labels, np.nan)
+    columns = dict(columns, etiquette_dpe=Numbers(etiquettes, ~valid_dpe,
+                                                  lambda: [None if np.isnan(v) else int(v) for v in etiquettes]))
+    X_conso, conso_errors = conso_api.encode_conso_columns(columns, n)
+    for i, message in conso_errors.items():
+        errors.setdefault(i, message)
+    t_encode_conso = time.perf_counter()
+
+    consos, valid = conso_api.predict_conso_rows(conso_artifacts, X_conso, errors)
+    t_predict_conso = time.perf_counter()
+
+    if timings is not None:
+        timings["encode_dpe"] = t_encode_dpe - t_start
+        timings["predict_dpe"] = t_predict_dpe - t_encode_dpe
+        timings["encode_conso"] = t_encode_conso - t_predict_dpe
+        timings["predict_conso"] = t_predict_conso - t_encode_conso
+    return labels, valid_dpe, consos, valid, errors
+
+def predict_full_batch_arrow():
+    """/predict_full/batch en Arrow IPC : colonnes encodees directement, reponse Arrow"""
+    t_start = time.perf_counter()
+    columns, n, failure = read_arrow_batch()
+    if failure:
+        return failure
+    t_parse = time.perf_counter()
+    metrics.add_stage('parse', t_parse - t_start)
+
+    stages = {}
+    try:
+        labels, valid_dpe, consos, valid, errors = predict_full_columns(
+            columns, n, dpe_artifacts, conso_api.conso_artifacts, stages)
+    except Exception as e:
+        logger.exception(f"Erreur interne lors de la prediction batch : {str(e)}", extra={"route": request.path})
+        return jsonify({"error": f"Erreur lors de la prediction batch : {str(e)}"}), 500
+
+    timings_ms = {"parse": round((t_parse - t_start) * 1000, 3)}
+    timings_ms.update({stage: round(duration * 1000, 3) for stage, duration in stages.items()})
+    timings_ms["total"] = round((time.perf_counter() - t_start) * 1000, 3)
+    with metrics.stage('serialize'):
+        return arrow_io.arrow_response({
+            "predictions_DPE_index": (labels, valid_dpe),
+            "predictions_conso_kwh": (consos, valid)
+        }, errors, n, timings_ms, request.mimetype)
 
 # Ajouter une route de santé pour vérifier que l'API est prête
 @app_dpe.route('/health', methods=['GET'])
 def health_check():
-    if model is None:
-        return jsonify({"status": "not ready", "model_loaded": False}), 503
-    return jsonify({"status": "ready", "model_loaded": True}), 200
+    # /health?wait=N : reponse des la fin du chargement (au plus N secondes d'attente)
+    wait = health_wait_seconds(request.args)
+    if wait and not dpe_loader.done:
+        dpe_loader.wait(wait)
+
+    loading = dpe_loader.snapshot()
+    if not dpe_loader.ready:
+        return jsonify({"status": loading["phase"], "model_loaded": False, "loading": loading}), 503
+    status = {
+        "status": "ready",
+        "model_loaded": True,
+        "model_variant": DPE_MODEL_VARIANT,
+        "model_version": dpe_artifacts.version,
+        "loading": loading,
+        "reload": dpe_reloader.status(),
+        # /predict_full a aussi besoin des assets de consommation charges dans ce processus
+        "full_chain_ready": conso_api.conso_loader.ready,
+        "conso_model_version": conso_api.conso_artifacts.version if conso_api.conso_loader.ready else None,
+        "conso_reload": conso_api.conso_reloader.status(),
+        "cache": prediction_cache.stats()
+    }
+    if dpe_batcher is not None:
+        status["micro_batching"] = dpe_batcher.stats()
+    return jsonify(status), 200
+
+# Rechargement a chaud des deux modeles servis par ce processus (DPE et consommation pour /predict_full)
+reloaders = [dpe_reloader, conso_api.conso_reloader]
+reload_admin.register(app_dpe, reloaders)
+
+# Compteurs, latences par etape et chargements exposes sur GET /metrics (Prometheus)
+metrics.register(app_dpe)
 
 @app_dpe.route('/', methods=['GET'])
 def home():
@@ -118,5 +628,18 @@ def home():
     }), 200
 
 if __name__ == '__main__':
-    print("Lancement de l'API DPE sur le port 5001...")
-    app_dpe.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
+    # Port, nombre de workers, backlog et socket Unix fournis par APIManager (ou docker-compose)
+    port = int(os.environ.get('PORT', 5001))
+    workers = int(os.environ.get('API_WORKERS', 1))
+    backlog = int(os.environ.get('API_BACKLOG', 128))
+
+    def preload():
+        # En pre-fork, les workers sont crees une fois les modeles charges par le maitre
+        dpe_loader.wait()
+        conso_api.conso_loader.wait()
+
+    logger.info(f"Lancement de l'API DPE sur le port {port}...")
+    serve(app_dpe, host='0.0.0.0', port=port, workers=workers, backlog=backlog, preload=preload,
+          on_start=lambda: reload_admin.start_watchers(reloaders),
+          on_reload=lambda trigger: reload_admin.reload_all(reloaders, trigger),
+          unix_socket=os.environ.get(uds_transport.SOCKET_ENV))
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""Journal des APIs : une ligne JSON par événement sur stdout.
+
+{"t": 1760000000.123, "level": "info", "logger": "api.conso", "message": "...", "pid": 1234, ...}
+Les champs passés en `extra` (ex. logger.info("...", extra={"version": v})) sont ajoutés
+à la ligne. APIManager relit ces lignes (cf. log_collector) ; lancées à la main, les
+APIs écrivent le même format. Niveau minimal : API_LOG_LEVEL (INFO par défaut).
+
+setup() n'est appelé que par les APIs lancées comme serveur (bloc __main__, avant les
+forks des workers, qui héritent du journal) : bulk_score et les benchmarks, qui importent
+les APIs pour leurs encodeurs, gardent leur propre sortie.
+
+Le journal d'accès de werkzeug (une ligne par requête) est coupé par défaut, les
+requêtes étant comptées par /metrics ; API_ACCESS_LOG=1 le rétablit, au même format.
+"""
+import json
+import logging
+import os
+import sys
+
+LOG_LEVEL = os.environ.get('API_LOG_LEVEL', 'INFO').upper()
+ACCESS_LOG = os.environ.get('API_ACCESS_LOG', '0') == '1'
+
+# Attributs standard d'un LogRecord : tout autre attribut vient de `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "t": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup():
+    """Installe la sortie JSON sur le journal racine (une seule fois par processus)"""
+    root = logging.getLogger()
+    if any(isinstance(handler.formatter, JsonFormatter) for handler in root.handlers):
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    logging.getLogger('werkzeug').setLevel(logging.INFO if ACCESS_LOG else logging.WARNING)
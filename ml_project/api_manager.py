@@ -2,13 +2,23 @@ import subprocess
 import time
 import os
 import sys
+import json
+import selectors
 import socket
 import threading
-import requests
 import signal
 import logging
+from collections import deque
 from typing import List, Optional
 
+import psutil
+
+import metrics
+import readiness
+from log_collector import LogCollector
+import uds_transport
+from prediction_client import PredictionClient, PredictionError, Service
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,22 +32,64 @@ logger = logging.getLogger(__name__)
 class APIManager:
     """Gestionnaire d'APIs optimisé pour le cloud"""
     
-    def __init__(self, startup_timeout: int = 180, health_check_interval: int = 5):
+    def __init__(self, startup_timeout: int = 180, health_check_interval: int = 5, supervise: bool = True,
+                 sample_interval: float = 5, restart_backoff: float = 1, max_restart_backoff: float = 60,
+                 crash_loop_restarts: int = 5, crash_loop_window: float = 300, stable_after: float = 60):
         self.startup_timeout = startup_timeout
         self.health_check_interval = health_check_interval
         self.processes = []
+        # Supervision : relance des APIs arrêtées et surveillance de leur mémoire (cf. _supervise)
+        self.supervise = supervise
+        self.sample_interval = sample_interval
+        # Délai avant relance, doublé à chaque arrêt consécutif jusqu'à max_restart_backoff ;
+        # remis à zéro quand l'API a tourné stable_after secondes
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        # Boucle de plantages : plus de relance après crash_loop_restarts arrêts en crash_loop_window secondes
+        self.crash_loop_restarts = crash_loop_restarts
+        self.crash_loop_window = crash_loop_window
+        self.stable_after = stable_after
+        # Délai laissé à un processus recyclé pour s'arrêter sur SIGTERM avant SIGKILL
+        self.recycle_grace = 10
+        self.supervised = {}
+        self._supervisor = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        # Sondes de santé et métriques : socket Unix de l'API s'il existe, TCP sinon ; pas de
+        # nouvelle tentative, le gestionnaire sonde lui-même à intervalle régulier
+        self.client = PredictionClient(retries=0)
+        # Sorties des APIs : un seul thread pour tous les pipes, derniers enregistrements par API
+        self.logs = LogCollector(logger)
+        # Chronologie du dernier démarrage de chaque API (cf. _on_startup_event)
+        self.startup_timelines = {}
+        # Barrière de démarrage : levée à la fin de start_apis, APIs prêtes ou non (cf. wait_until_ready)
+        self.startup_done = threading.Event()
+        self.all_ready = False
         self.api_configs = [
             {
                 "file": "API_Lineaire_Reg.py", 
                 "port": 5000, 
                 "health_endpoint": "/health",
-                "name": "API Consommation"
+                "name": "API Consommation",
+                # Socket Unix servi en plus du port (clients locaux : tableau de bord, sondes)
+                "unix_socket": uds_transport.CONSO_SOCKET,
+                "workers": 1,
+                "backlog": 128,
+                # Plafond de RSS par processus servant (Mo) : au-delà, le processus est recyclé
+                "max_rss_mb": 1024
             },
             {
                 "file": "API_Random_Forest.py", 
                 "port": 5001, 
                 "health_endpoint": "/health",
-                "name": "API DPE"
+                "name": "API DPE",
+                "unix_socket": uds_transport.DPE_SOCKET,
+                "workers": 1,
+                "backlog": 128,
+                # RSS compté pages partagées incluses (modèles chargés avant le fork)
+                "max_rss_mb": 2048,
+                # Variables d'environnement propres à l'API (ex. variante compacte de la forêt)
+                "env": {"DPE_MODEL_VARIANT": "final_weighted"}
             }
         ]
         
@@ -47,8 +99,10 @@ class APIManager:
 
     def _signal_handler(self, signum, frame):
         """Gestion propre des signaux d'arrêt"""
-        logger.info(f"Signal {signum} reçu, arrêt des APIs...")
-        self.stop_apis()
+        # Le thread interrompu peut détenir self._lock (démarrage, relance) : l'arrêt des processus
+        # se fait hors du gestionnaire de signal, qui ne fait que le demander
+        self._stopping.set()
+        threading.Thread(target=self.stop_apis, name="api-stop", daemon=True).start()
 
     def is_port_in_use(self, port: int) -> bool:
         """Vérifie si un port est déjà utilisé"""
@@ -60,19 +114,54 @@ class APIManager:
             logger.warning(f"Erreur vérification port {port}: {e}")
             return False
 
-    def is_api_ready(self, port: int, endpoint: str = "/health") -> bool:
+    def _service(self, port: int, unix_socket: Optional[str] = None) -> Service:
+        name = next((config["name"] for config in self.api_configs if config["port"] == port), f"port {port}")
+        return Service(name, port, unix_socket, host="localhost")
+
+    def is_api_ready(self, port: int, endpoint: str = "/health", unix_socket: Optional[str] = None) -> bool:
         """Vérifie si l'API est prête"""
         try:
-            response = requests.get(
-                f"http://localhost:{port}{endpoint}", 
-                timeout=10
-            )
+            response = self.client.request("GET", self._service(port, unix_socket), endpoint, timeout=10)
             return response.status_code == 200
-        except:
+        except PredictionError:
             return False
 
+    def get_health(self, port: int, endpoint: str = "/health", wait: float = 0,
+                   unix_socket: Optional[str] = None) -> Optional[dict]:
+        """Rapport de santé de l'API (y compris en cours de chargement), None si elle ne répond pas.
+
+        Avec `wait`, l'API ne répond qu'à la fin du chargement ou après `wait` secondes.
+        """
+        try:
+            response = self.client.request("GET", self._service(port, unix_socket), endpoint,
+                                           params={"wait": wait} if wait else None, timeout=wait + 10)
+            health = response.json()
+            health["http_status"] = response.status_code
+            return health
+        except Exception:
+            return None
+
+    def get_metrics(self, port: int, unix_socket: Optional[str] = None) -> Optional[dict]:
+        """Résumé des métriques Prometheus de l'API (GET /metrics), None si elle ne répond pas"""
+        try:
+            return metrics.summarize(self.client.api_metrics(self._service(port, unix_socket)))
+        except Exception:
+            return None
+
     def start_single_api(self, api_config: dict) -> Optional[subprocess.Popen]:
-        """Démarre une API spécifique"""
+        """Démarre une API spécifique et attend qu'elle soit prête"""
+        launch = self._spawn_api(api_config)
+        if launch is None:
+            return None
+        self._wait_for_startups([launch])
+        return launch["process"] if launch["state"] == "ready" else None
+
+    def _spawn_api(self, api_config: dict) -> Optional[dict]:
+        """Lance le processus d'une API sans attendre son chargement.
+
+        L'API signale les étapes de son démarrage sur un pipe (cf. readiness) ; renvoie le
+        suivi du lancement (processus, pipe, chronologie) ou None si le lancement échoue.
+        """
         try:
             api_file = api_config["file"]
             port = api_config["port"]
@@ -83,76 +172,191 @@ class APIManager:
                 logger.error(f"Fichier API introuvable: {api_file}")
                 return None
 
-            logger.info(f"Démarrage de {api_name} ({api_file}) sur le port {port}...")
+            logger.info(f"Démarrage de {api_name} ({api_file}) sur le port {port} "
+                        f"avec {api_config.get('workers', 1)} worker(s)...")
             
             # Démarrer le processus
             env = os.environ.copy()
             env['PYTHONUNBUFFERED'] = '1'
+
+            # Mode de service pre-fork : modèles chargés une fois puis N workers
+            env['PORT'] = str(port)
+            env['API_WORKERS'] = str(api_config.get("workers", 1))
+            env['API_BACKLOG'] = str(api_config.get("backlog", 128))
+            env.update({key: str(value) for key, value in api_config.get("env", {}).items()})
+            env.pop(uds_transport.SOCKET_ENV, None)
+            if api_config.get("unix_socket"):
+                env[uds_transport.SOCKET_ENV] = api_config["unix_socket"]
+
+            # Pipe de démarrage : l'API y écrit bind, model_loaded, ready (indisponible sous Windows)
+            ready_read, ready_write = os.pipe() if os.name == 'posix' else (None, None)
+            if ready_write is not None:
+                env[readiness.READY_FD_ENV] = str(ready_write)
             
-            process = subprocess.Popen([
-                sys.executable, 
-                '-u',
-                api_file
-            ], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                env=env,
-                text=True
-            )
+            spawned_at = time.time()
+            try:
+                process = subprocess.Popen([
+                    sys.executable, 
+                    '-u',
+                    api_file
+                ], 
+                    stdout=subprocess.PIPE, 
+                    stderr=subprocess.PIPE,
+                    env=env,
+                    pass_fds=(ready_write,) if ready_write is not None else ()
+                )
+            except Exception:
+                if ready_read is not None:
+                    os.close(ready_read)
+                raise
+            finally:
+                if ready_write is not None:
+                    os.close(ready_write)
             
             # Lire les sorties en temps réel
-            self._start_output_reader(process, api_name)
-            
-            # Attendre le démarrage
-            if self._wait_for_api_ready(port, api_config["health_endpoint"], api_name):
-                logger.info(f"✅ {api_name} démarré avec succès sur le port {port}")
-                return process
-            else:
-                logger.error(f"❌ {api_name} n'a pas démarré correctement")
-                self._terminate_process(process)
-                return None
+            self.logs.add(api_name, process)
+
+            timeline = {"spawn": 0.0}
+            self.startup_timelines[api_name] = timeline
+            return {"config": api_config, "process": process, "ready_fd": ready_read, "buffer": b"",
+                    "spawned_at": spawned_at, "timeline": timeline, "state": "starting"}
                 
         except Exception as e:
             logger.error(f"❌ Erreur démarrage {api_config['name']}: {e}")
             return None
 
-    def _start_output_reader(self, process: subprocess.Popen, api_name: str):
-        """Lit les sorties stdout/stderr en temps réel"""
-        def read_output(stream, stream_name):
+    def _on_startup_event(self, launch: dict, event: dict):
+        """Enregistre une étape signalée par l'API dans sa chronologie de démarrage"""
+        api_name = launch["config"]["name"]
+        elapsed = round(event.get("t", time.time()) - launch["spawned_at"], 3)
+        kind = event.get("event")
+        if kind == readiness.EVENT_BIND:
+            launch["timeline"]["bind"] = elapsed
+            logger.info(f"🔌 {api_name} : port {event.get('port')} ouvert (+{elapsed:.2f}s)")
+        elif kind == readiness.EVENT_MODEL_LOADED:
+            # Chronologie : chaque modèle, puis le dernier chargé
+            launch["timeline"][f"model_loaded:{event.get('model')}"] = elapsed
+            launch["timeline"]["model_loaded"] = elapsed
+            logger.info(f"📦 {api_name} : modèle {event.get('model')} chargé (+{elapsed:.2f}s)")
+        elif kind == readiness.EVENT_LOAD_FAILED:
+            launch["state"] = "failed"
+            logger.error(f"❌ Échec du chargement de {api_name} ({event.get('model')}): {event.get('error')}")
+        elif kind == readiness.EVENT_READY and launch["state"] != "failed":
+            launch["timeline"]["ready"] = elapsed
+            launch["state"] = "ready"
+            logger.info(f"✅ {api_name} démarré avec succès sur le port {launch['config']['port']} "
+                        f"(+{elapsed:.2f}s)")
+
+    def _read_startup_pipe(self, launch: dict) -> bool:
+        """Lit les étapes disponibles sur le pipe de démarrage, False une fois le pipe fermé"""
+        data = os.read(launch["ready_fd"], 4096)
+        if not data:
+            return False
+        lines = (launch["buffer"] + data).split(b"\n")
+        launch["buffer"] = lines.pop()
+        for line in lines:
             try:
-                for line in iter(stream.readline, ''):
-                    if line.strip():
-                        logger.info(f"{api_name} [{stream_name}]: {line.strip()}")
-            except Exception as e:
-                logger.debug(f"Fin lecture {stream_name} pour {api_name}")
-        
-        threading.Thread(
-            target=read_output, 
-            args=(process.stdout, "stdout"),
-            daemon=True
-        ).start()
-        
-        threading.Thread(
-            target=read_output, 
-            args=(process.stderr, "stderr"), 
-            daemon=True
-        ).start()
-
-    def _wait_for_api_ready(self, port: int, endpoint: str, api_name: str) -> bool:
-        """Attend que l'API soit prête"""
+                self._on_startup_event(launch, json.loads(line))
+            except ValueError:
+                logger.debug(f"Ligne de démarrage illisible : {line!r}")
+        return True
+
+    def _wait_for_startups(self, launches: List[dict]):
+        """Attend en parallèle que chaque API lancée soit prête, a échoué ou dépasse startup_timeout"""
+        deadline = time.time() + self.startup_timeout
+        last_log = time.time()
+        selector = selectors.DefaultSelector()
+        for launch in launches:
+            if launch["ready_fd"] is not None:
+                selector.register(launch["ready_fd"], selectors.EVENT_READ, launch)
+            logger.info(f"⏳ Attente du démarrage de {launch['config']['name']}...")
+
+        try:
+            pending = [launch for launch in launches if launch["ready_fd"] is not None]
+            while pending and time.time() < deadline:
+                for key, _ in selector.select(timeout=min(0.5, max(deadline - time.time(), 0))):
+                    if not self._read_startup_pipe(key.data):
+                        selector.unregister(key.fd)
+
+                for launch in list(pending):
+                    api_name = launch["config"]["name"]
+                    if launch["state"] != "starting":
+                        pending.remove(launch)
+                    elif launch["process"].poll() is not None:
+                        logger.error(f"❌ {api_name} s'est arrêté pendant le démarrage "
+                                     f"(code {launch['process'].returncode})")
+                        launch["state"] = "failed"
+                        pending.remove(launch)
+
+                if pending and time.time() - last_log >= 15:  # Log toutes les 15 secondes
+                    last_log = time.time()
+                    for launch in pending:
+                        steps = ", ".join(launch["timeline"])
+                        logger.info(f"⏳ En attente de {launch['config']['name']}... étapes : {steps}, "
+                                    f"{int(time.time() - launch['spawned_at'])}s/{self.startup_timeout}s")
+
+            for launch in pending:
+                logger.error(f"⏰ Timeout {launch['config']['name']} après {self.startup_timeout}s")
+                launch["state"] = "failed"
+        finally:
+            selector.close()
+            for launch in launches:
+                if launch["ready_fd"] is not None:
+                    os.close(launch["ready_fd"])
+                    launch["ready_fd"] = None
+
+        # Sans pipe de démarrage (Windows) : suivi du chargement par /health
+        for launch in launches:
+            if launch["state"] == "starting":
+                config = launch["config"]
+                ready = self._wait_for_api_ready(launch["process"], config["port"], config["health_endpoint"],
+                                                 config["name"])
+                launch["state"] = "ready" if ready else "failed"
+                if ready:
+                    launch["timeline"]["ready"] = round(time.time() - launch["spawned_at"], 3)
+
+        for launch in launches:
+            if launch["state"] != "ready":
+                logger.error(f"❌ {launch['config']['name']} n'a pas démarré correctement")
+                self._terminate_process(launch["process"])
+
+    def _wait_for_api_ready(self, process: subprocess.Popen, port: int, endpoint: str, api_name: str) -> bool:
+        """Attend que l'API soit prête en suivant l'avancement de son chargement"""
         start_time = time.time()
+        last_log = start_time
         
         logger.info(f"⏳ Attente du démarrage de {api_name}...")
         
-        while time.time() - start_time < self.startup_timeout:
-            if self.is_port_in_use(port) and self.is_api_ready(port, endpoint):
+        while True:
+            remaining = self.startup_timeout - (time.time() - start_time)
+            if remaining <= 0:
+                break
+
+            if process.poll() is not None:
+                logger.error(f"❌ {api_name} s'est arrêté pendant le démarrage (code {process.returncode})")
+                return False
+
+            # Long-poll : l'API répond dès que le chargement se termine
+            health = self.get_health(port, endpoint, wait=min(self.health_check_interval, remaining))
+            if health is None:
+                # Port pas encore ouvert : nouvel essai rapide
+                time.sleep(0.1)
+                continue
+
+            loading = health.get("loading") or {}
+            if health["http_status"] == 200:
+                logger.info(f"📦 {api_name} : modèles chargés en {loading.get('elapsed_s', '?')}s")
                 return True
-                
-            elapsed = int(time.time() - start_time)
-            if elapsed % 15 == 0:  # Log toutes les 15 secondes
-                logger.info(f"⏳ En attente de {api_name}... {elapsed}s/{self.startup_timeout}s")
-                
-            time.sleep(self.health_check_interval)
+
+            if loading.get("phase") == "failed":
+                logger.error(f"❌ Échec du chargement de {api_name}: {loading.get('error')}")
+                return False
+
+            if time.time() - last_log >= 15:  # Log toutes les 15 secondes
+                last_log = time.time()
+                logger.info(f"⏳ En attente de {api_name}... phase {loading.get('phase', '?')}, "
+                            f"{loading.get('bytes_loaded', 0) / 1e6:.1f}/{loading.get('bytes_total', 0) / 1e6:.1f} Mo, "
+                            f"{int(time.time() - start_time)}s/{self.startup_timeout}s")
         
         logger.error(f"⏰ Timeout {api_name} après {self.startup_timeout}s")
         return False
@@ -171,50 +375,263 @@ class APIManager:
             logger.warning(f"Erreur arrêt processus: {e}")
 
     def start_apis(self) -> List[subprocess.Popen]:
-        """Démarre toutes les APIs"""
+        """Démarre toutes les APIs en parallèle et attend qu'elles soient prêtes"""
+        self.startup_done.clear()
+        self.all_ready = False
+        self._stopping.clear()
+        try:
+            return self._start_apis()
+        finally:
+            # Levée même si le démarrage échoue : wait_until_ready ne bloque jamais indéfiniment
+            self.startup_done.set()
+
+    def _start_apis(self) -> List[subprocess.Popen]:
         logger.info("🚀 Démarrage des APIs de prédiction...")
+        started_at = time.time()
         
         self.processes = []
+        launches = []
         
         for config in self.api_configs:
-            if not self.is_api_ready(config["port"], config["health_endpoint"]):
-                process = self.start_single_api(config)
-                if process:
-                    self.processes.append(process)
+            if not self.is_api_ready(config["port"], config["health_endpoint"], config.get("unix_socket")):
+                launch = self._spawn_api(config)
+                if launch:
+                    launches.append(launch)
             else:
                 logger.info(f"✅ {config['name']} est déjà en cours d'exécution")
+
+        # Chargements simultanés : le démarrage à froid dure autant que l'API la plus lente
+        self._wait_for_startups(launches)
+        with self._lock:
+            if self._stopping.is_set():
+                # stop_apis appelé pendant le démarrage : les APIs lancées ne lui étaient pas encore connues
+                for launch in launches:
+                    self._terminate_process(launch["process"])
+                return []
+            self.processes = [launch["process"] for launch in launches if launch["state"] == "ready"]
+            if self.supervise:
+                for launch in launches:
+                    if launch["state"] == "ready":
+                        self._supervise_process(launch["config"], launch["process"])
+                self._start_supervisor()
+
+        for launch in launches:
+            steps = " → ".join(f"{step} {elapsed:.2f}s" for step, elapsed in launch["timeline"].items()
+                               if not step.startswith("model_loaded:"))
+            logger.info(f"⏱️ {launch['config']['name']} : {steps}")
         
         # Vérification finale
         ready_apis = sum(1 for config in self.api_configs 
-                        if self.is_api_ready(config["port"], config["health_endpoint"]))
+                        if self.is_api_ready(config["port"], config["health_endpoint"], config.get("unix_socket")))
+        self.all_ready = ready_apis == len(self.api_configs)
         
-        logger.info(f"🎯 Démarrage terminé: {ready_apis}/{len(self.api_configs)} APIs prêtes")
+        logger.info(f"🎯 Démarrage terminé: {ready_apis}/{len(self.api_configs)} APIs prêtes "
+                    f"en {time.time() - started_at:.2f}s")
         return self.processes
 
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin de start_apis (au plus timeout secondes) ; True si toutes les APIs sont prêtes"""
+        return self.startup_done.wait(timeout) and self.all_ready
+
+    def _supervise_process(self, config: dict, process: subprocess.Popen):
+        """Place (ou replace après relance) le processus d'une API sous supervision"""
+        entry = self.supervised.setdefault(config["name"], {
+            "config": config, "restarts": 0, "recycles": 0, "consecutive_failures": 0,
+            "crash_times": deque(), "last_exit_code": None,
+            "samples": deque(maxlen=12), "psutil": {}
+        })
+        entry.update(process=process, state="running", started_at=time.time(), recycling=False,
+                     kill_at=None, next_restart_at=None)
+        return entry
+
+    def _start_supervisor(self):
+        if self._supervisor is None or not self._supervisor.is_alive():
+            self._supervisor = threading.Thread(target=self._supervise, name="api-supervisor", daemon=True)
+            self._supervisor.start()
+
+    def _supervise(self):
+        """Boucle de supervision : arrêts, relances planifiées et relevés de ressources"""
+        last_sample = 0.0
+        while not self._stopping.wait(1):
+            sample = time.time() - last_sample >= self.sample_interval
+            if sample:
+                last_sample = time.time()
+            for entry in list(self.supervised.values()):
+                if self._stopping.is_set():
+                    break
+                try:
+                    if entry["state"] == "running":
+                        if entry["process"].poll() is not None:
+                            self._on_process_exit(entry)
+                        elif entry["recycling"]:
+                            # Recyclage en cours : SIGKILL si SIGTERM est resté sans effet
+                            if time.time() >= entry["kill_at"]:
+                                logger.warning(f"⚠️ {entry['config']['name']} ne s'arrête pas, SIGKILL")
+                                entry["process"].kill()
+                        elif sample:
+                            self._sample_resources(entry)
+                    elif entry["state"] == "backoff" and time.time() >= entry["next_restart_at"]:
+                        entry["state"] = "restarting"
+                        threading.Thread(target=self._restart_api, args=(entry,), daemon=True,
+                                         name=f"restart-{entry['config']['file']}").start()
+                except Exception as e:
+                    logger.warning(f"Erreur supervision {entry['config']['name']}: {e}")
+
+    def _on_process_exit(self, entry: dict):
+        """Planifie la relance d'une API arrêtée (délai exponentiel) ou la déclare en boucle de plantages"""
+        api_name = entry["config"]["name"]
+        now = time.time()
+        entry["last_exit_code"] = entry["process"].returncode
+        entry["psutil"].clear()
+        if entry["recycling"]:
+            # Arrêt demandé par le plafond mémoire : relance immédiate, ce n'est pas un plantage
+            logger.info(f"♻️ {api_name} recyclé, relance...")
+            entry.update(state="backoff", next_restart_at=now)
+            return
+
+        if now - entry["started_at"] >= self.stable_after:
+            entry["consecutive_failures"] = 0
+        crash_times = entry["crash_times"]
+        crash_times.append(now)
+        while crash_times and now - crash_times[0] > self.crash_loop_window:
+            crash_times.popleft()
+        if len(crash_times) >= self.crash_loop_restarts:
+            entry["state"] = "crash_loop"
+            logger.error(f"💥 {api_name} : {len(crash_times)} arrêts en {self.crash_loop_window:.0f}s, "
+                         f"boucle de plantages, relances suspendues")
+            return
+
+        delay = min(self.restart_backoff * 2 ** entry["consecutive_failures"], self.max_restart_backoff)
+        entry["consecutive_failures"] += 1
+        entry.update(state="backoff", next_restart_at=now + delay)
+        logger.error(f"💥 {api_name} s'est arrêté (code {entry['last_exit_code']}), relance dans {delay:.0f}s")
+
+    def _restart_api(self, entry: dict):
+        """Relance une API et attend qu'elle soit prête (thread dédié, la supervision continue)"""
+        config = entry["config"]
+        recycled = entry["recycling"]
+        launch = self._spawn_api(config)
+        if launch is not None:
+            self._wait_for_startups([launch])
+        with self._lock:
+            if self._stopping.is_set():
+                if launch is not None:
+                    self._terminate_process(launch["process"])
+                return
+            if launch is None or launch["state"] != "ready":
+                # Échec de la relance : compté comme un nouvel arrêt (sans remise à zéro du délai)
+                entry.update(state="running", recycling=False, started_at=time.time(),
+                             process=launch["process"] if launch else entry["process"])
+                self._on_process_exit(entry)
+                return
+            self.processes = [p for p in self.processes if p is not entry["process"]] + [launch["process"]]
+            self._supervise_process(config, launch["process"])
+            if recycled:
+                entry["recycles"] += 1
+            else:
+                entry["restarts"] += 1
+        logger.info(f"🔁 {config['name']} relancé (redémarrages : {entry['restarts']}, "
+                    f"recyclages : {entry['recycles']})")
+
+    def _sample_resources(self, entry: dict):
+        """Relève RSS et CPU du processus de l'API et de ses workers ; recycle au-delà de max_rss_mb"""
+        processes = entry["psutil"]
+        root = processes.get(entry["process"].pid) or psutil.Process(entry["process"].pid)
+        current = {root.pid: root}
+        for child in root.children(recursive=True):
+            current[child.pid] = processes.get(child.pid, child)
+        processes.clear()
+        processes.update(current)
+
+        workers = []
+        for pid, process in current.items():
+            try:
+                with process.oneshot():
+                    workers.append({"pid": pid, "rss_mb": round(process.memory_info().rss / 1e6, 1),
+                                    "cpu_percent": process.cpu_percent(None)})
+            except psutil.NoSuchProcess:
+                processes.pop(pid, None)
+        entry["samples"].append({
+            "t": round(time.time(), 3),
+            "rss_mb": round(sum(worker["rss_mb"] for worker in workers), 1),
+            "cpu_percent": round(sum(worker["cpu_percent"] for worker in workers), 1),
+            "processes": workers
+        })
+
+        max_rss_mb = entry["config"].get("max_rss_mb")
+        # En pre-fork, les workers servent et le maître les relance : seul un worker est recyclé
+        serving = [worker for worker in workers if worker["pid"] != root.pid] or workers
+        largest = max(serving, key=lambda worker: worker["rss_mb"], default=None)
+        if max_rss_mb and largest and largest["rss_mb"] > max_rss_mb:
+            api_name = entry["config"]["name"]
+            logger.warning(f"🧠 {api_name} : processus {largest['pid']} à {largest['rss_mb']:.0f} Mo "
+                           f"(plafond {max_rss_mb} Mo), recyclage")
+            if largest["pid"] == root.pid:
+                # Pas d'attente ici : l'arrêt est constaté au prochain passage de la supervision,
+                # qui continue de surveiller les autres APIs
+                entry.update(recycling=True, kill_at=time.time() + self.recycle_grace)
+                entry["process"].terminate()
+            else:
+                os.kill(largest["pid"], signal.SIGTERM)
+                entry["recycles"] += 1
+
     def stop_apis(self):
         """Arrête tous les processus API"""
         logger.info("🛑 Arrêt de toutes les APIs...")
+        with self._lock:
+            # Plus de relance : les arrêts qui suivent sont voulus
+            self._stopping.set()
+            for entry in self.supervised.values():
+                entry["state"] = "stopped"
+            # Un second appel (signal puis fin de main) ne retrouve plus les processus déjà arrêtés
+            processes, self.processes = self.processes, []
         
-        for process in self.processes:
+        for process in processes:
             try:
                 self._terminate_process(process)
             except Exception as e:
                 logger.warning(f"Erreur arrêt processus: {e}")
         
-        self.processes = []
         logger.info("✅ Toutes les APIs ont été arrêtées")
 
-    def get_status(self):
-        """Retourne le statut des APIs"""
+    def get_status(self, log_lines: int = 20):
+        """Retourne le statut des APIs (avec leurs `log_lines` dernières lignes de sortie)"""
         status = {}
+        client_latency = self.client.latency_summary()
         for config in self.api_configs:
             status[config["name"]] = {
                 "port": config["port"],
-                "ready": self.is_api_ready(config["port"], config["health_endpoint"]),
-                "file": config["file"]
+                "ready": self.is_api_ready(config["port"], config["health_endpoint"], config.get("unix_socket")),
+                "file": config["file"],
+                # Secondes écoulées depuis le lancement à chaque étape (spawn, bind, model_loaded, ready)
+                "startup": self.startup_timelines.get(config["name"]),
+                "supervisor": self._supervisor_status(config["name"]),
+                # Requêtes par route, latence des étapes (parse, encode, inference, serialize), chargements
+                "metrics": self.get_metrics(config["port"], config.get("unix_socket")),
+                # Latence des sondes vue du gestionnaire, par route
+                "client": client_latency.get(config["name"]),
+                "logs": dict(self.logs.stats(config["name"]), recent=self.logs.recent(config["name"], log_lines))
             }
         return status
 
+    def _supervisor_status(self, api_name: str) -> Optional[dict]:
+        """État de supervision d'une API : relances, dernier code de sortie, derniers relevés"""
+        entry = self.supervised.get(api_name)
+        if entry is None:
+            return None
+        return {
+            "state": entry["state"],
+            "pid": entry["process"].pid,
+            "uptime_s": round(time.time() - entry["started_at"], 1) if entry["state"] == "running" else None,
+            "restarts": entry["restarts"],
+            "recycles": entry["recycles"],
+            "recent_crashes": len(entry["crash_times"]),
+            "last_exit_code": entry["last_exit_code"],
+            "next_restart_in_s": (round(max(entry["next_restart_at"] - time.time(), 0), 1)
+                                  if entry["state"] == "backoff" else None),
+            "samples": list(entry["samples"])
+        }
+
 # Instance globale pour import facile
 api_manager = APIManager()
 
@@ -233,8 +650,9 @@ def main():
         # Attendre indéfiniment
         logger.info("✅ Toutes les APIs sont démarrées. Appuyez sur Ctrl+C pour arrêter.")
         try:
-            while True:
-                time.sleep(1)
+            # Jusqu'à Ctrl+C ou SIGTERM (cf. _signal_handler)
+            while not manager._stopping.wait(1):
+                pass
         except KeyboardInterrupt:
             logger.info("👋 Arrêt demandé par l'utilisateur")
     
@@ -0,0 +1,100 @@
+"""Échanges par lots au format Apache Arrow IPC pour les routes /batch des APIs.
+
+Un corps de type application/vnd.apache.arrow.stream (ou .file) est lu comme une
+table dont chaque colonne est un champ du formulaire. Les colonnes passent
+directement aux encodeurs (FeatureEncoder.encode_columns) : les textes restent
+codés par dictionnaire et les nombres en tableaux numpy, sans dict par logement.
+La réponse est une table Arrow du même format : une colonne par prédiction (null
+pour les lignes en erreur) et une colonne `erreur` ; n_logements, n_erreurs et
+timings_ms sont dans les métadonnées du schéma.
+"""
+import json
+import math
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from flask import Response
+
+from feature_encoders import Categories, Numbers
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+ARROW_FILE_MIMETYPE = 'application/vnd.apache.arrow.file'
+ARROW_MIMETYPES = (ARROW_STREAM_MIMETYPE, ARROW_FILE_MIMETYPE)
+
+
+def is_arrow_request(request) -> bool:
+    return request.mimetype in ARROW_MIMETYPES
+
+
+def read_table(data: bytes, mimetype=ARROW_STREAM_MIMETYPE) -> pa.Table:
+    """Lit un corps Arrow IPC (flux ou fichier), ValueError s'il est invalide"""
+    try:
+        if mimetype == ARROW_FILE_MIMETYPE:
+            return pa.ipc.open_file(pa.BufferReader(data)).read_all()
+        return pa.ipc.open_stream(pa.BufferReader(data)).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(str(e)) from None
+
+
+def table_columns(table: pa.Table) -> dict:
+    """Colonnes d'une table au format attendu par FeatureEncoder.encode_columns"""
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        array = column.combine_chunks()
+        if pa.types.is_dictionary(array.type):
+            array = array.cast(array.type.value_type)
+        kind = array.type
+        if pa.types.is_string(kind) or pa.types.is_large_string(kind):
+            # null reste une modalité (None), comme un champ JSON à null
+            encoded = pc.dictionary_encode(array, null_encoding='encode')
+            columns[name] = Categories(encoded.dictionary.to_pylist(),
+                                       encoded.indices.to_numpy(zero_copy_only=False))
+        elif pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_boolean(kind):
+            values = array.cast(pa.float64()).fill_null(math.nan).to_numpy(zero_copy_only=False)
+            columns[name] = Numbers(values, array.is_null().to_numpy(zero_copy_only=False), array.to_pylist)
+        elif pa.types.is_null(kind):
+            columns[name] = Categories([None], np.zeros(len(array), dtype=np.intp))
+        else:
+            columns[name] = array.to_pylist()
+    return columns
+
+
+def read_request(request):
+    """Colonnes et nombre de logements d'une requête Arrow"""
+    table = read_table(request.get_data(), request.mimetype)
+    return table_columns(table), table.num_rows
+
+
+def error_column(errors, n) -> pa.Array:
+    """Colonne `erreur` codée par dictionnaire (un message distinct par type d'erreur)"""
+    messages = sorted(set(errors.values()))
+    codes = np.zeros(n, dtype=np.int32)
+    mask = np.ones(n, dtype=bool)
+    if errors:
+        message_codes = {message: code for code, message in enumerate(messages)}
+        rows = np.fromiter(errors.keys(), dtype=np.intp, count=len(errors))
+        codes[rows] = [message_codes[message] for message in errors.values()]
+        mask[rows] = False
+    return pa.DictionaryArray.from_arrays(pa.array(codes, mask=mask), pa.array(messages, type=pa.string()))
+
+
+def build_response(predictions, errors, n, timings_ms, mimetype=ARROW_STREAM_MIMETYPE):
+    """Sérialise les prédictions {nom: (valeurs, masque des lignes valides)} en Arrow IPC"""
+    arrays = {name: pa.array(values, mask=~valid) for name, (values, valid) in predictions.items()}
+    arrays['erreur'] = error_column(errors, n)
+    batch = pa.RecordBatch.from_pydict(arrays).replace_schema_metadata({
+        'n_logements': str(n),
+        'n_erreurs': str(len(errors)),
+        'timings_ms': json.dumps(timings_ms)
+    })
+    sink = pa.BufferOutputStream()
+    new_writer = pa.ipc.new_file if mimetype == ARROW_FILE_MIMETYPE else pa.ipc.new_stream
+    with new_writer(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_response(predictions, errors, n, timings_ms, mimetype=ARROW_STREAM_MIMETYPE):
+    """Réponse Flask au même format Arrow que la requête"""
+    return Response(build_response(predictions, errors, n, timings_ms, mimetype), mimetype=mimetype)
@@ -0,0 +1,159 @@
+"""Lots Arrow IPC face aux lots JSON sur les routes /batch, de bout en bout
+
+1. Équivalence en processus : encode_columns (colonnes lues d'une table Arrow)
+   contre encode_batch (mêmes logements en JSON), matrices et messages d'erreur,
+   pour les deux encodeurs, y compris valeurs hors domaine, nulls, NaN et colonne absente.
+2. HTTP : démarre les deux APIs puis envoie N logements (100 000 par défaut) en JSON
+   puis en Arrow à /predict_conso/batch, /predict_dpe/batch et /predict_full/batch.
+   Le temps mesuré va de la sérialisation côté client au décodage de la réponse ;
+   les prédictions des deux formats doivent être identiques.
+
+Usage : python benchmarks/bench_arrow.py [--n 100000]
+"""
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+import pyarrow as pa
+import requests
+
+import bench_utils
+from bench_predict_full import start_api, stop_api
+from bench_prefork import free_port, wait_ready
+
+bench_utils.use_project_dir()
+
+import arrow_io  # noqa: E402
+from feature_spec import conso_feature_spec, dpe_feature_spec  # noqa: E402
+from feature_encoders import error_message  # noqa: E402
+import joblib  # noqa: E402
+
+ARROW_HEADERS = {"Content-Type": arrow_io.ARROW_STREAM_MIMETYPE}
+
+
+def edge_payloads(payloads):
+    """Variantes représentables en Arrow (une colonne = un type) : hors domaine, nulls, NaN, infini"""
+    edge = []
+    for i, payload in enumerate(payloads[:60]):
+        variant = dict(payload)
+        field = ["qualite_isolation_murs", "periode_construction", "nombre_appartement_cat", "logement",
+                 "type_energie_n1", "type_energie_principale_chauffage"][i % 6]
+        variant[field] = ["très bonne", "inconnue", None, "Fioul", " Gaz naturel "][i % 5]
+        if i % 4 == 0:
+            variant["surface_habitable_logement"] = [None, math.nan, math.inf][i % 3]
+        if i % 7 == 0:
+            variant["etiquette_dpe"] = None
+        edge.append(variant)
+    return edge
+
+
+def check_encoder(encoder, records, name):
+    table = pa.Table.from_pylist(records)
+    # En Arrow une clé absente devient null : la référence JSON reçoit None explicitement
+    aligned = [{field: record.get(field) for field in table.column_names} for record in records]
+    X_arrow, errors_arrow = encoder.encode_columns(arrow_io.table_columns(table), table.num_rows)
+    X_json, errors_json = encoder.encode_batch(aligned)
+    # Les lignes en erreur ne sont jamais prédites : seules les lignes valides sont comparées
+    valid = np.ones(len(records), dtype=bool)
+    valid[list(errors_json)] = False
+    if not np.array_equal(X_arrow[valid], X_json[valid], equal_nan=True):
+        raise AssertionError(f"{name} : matrices différentes entre Arrow et JSON")
+    messages_arrow = {i: error_message(e) for i, e in errors_arrow.items()}
+    messages_json = {i: error_message(e) for i, e in errors_json.items()}
+    if messages_arrow != messages_json:
+        raise AssertionError(f"{name} : erreurs différentes entre Arrow et JSON")
+
+    # Colonne absente du lot = champ absent de chaque logement
+    dropped = table.drop_columns(["surface_habitable_logement"])
+    X_arrow, _ = encoder.encode_columns(arrow_io.table_columns(dropped), dropped.num_rows)
+    X_json, _ = encoder.encode_batch([{k: v for k, v in r.items() if k != "surface_habitable_logement"}
+                                      for r in aligned])
+    if not np.array_equal(X_arrow, X_json, equal_nan=True):
+        raise AssertionError(f"{name} : colonne absente encodée différemment")
+    print(f"{name} : {len(records)} logements identiques en Arrow et en JSON ({len(errors_json)} en erreur)")
+
+
+def check_equivalence():
+    payloads = bench_utils.sample_conso_payloads(2000, seed=7)
+    records = payloads + edge_payloads(payloads)
+    dpe_encoder = dpe_feature_spec(joblib.load("feature_columns_final.pkl")).compile()
+    check_encoder(dpe_encoder, records, "DPE")
+    check_encoder(conso_feature_spec().compile(), records, "Consommation")
+
+
+def arrow_body(columns):
+    sink = pa.BufferOutputStream()
+    table = pa.table(columns)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def post_json(session, url, records):
+    start = time.perf_counter()
+    response = session.post(url, data=json.dumps(records), headers={"Content-Type": "application/json"})
+    response.raise_for_status()
+    result = response.json()
+    return result, time.perf_counter() - start, len(response.request.body)
+
+
+def post_arrow(session, url, columns):
+    start = time.perf_counter()
+    body = arrow_body(columns)
+    response = session.post(url, data=body, headers=ARROW_HEADERS)
+    response.raise_for_status()
+    table = pa.ipc.open_stream(response.content).read_all()
+    result = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names
+              if name != "erreur"}
+    result["timings_ms"] = json.loads(table.schema.metadata[b"timings_ms"])
+    return result, time.perf_counter() - start, len(body)
+
+
+def same_predictions(json_values, arrow_values, name):
+    expected = np.array([math.nan if v is None else v for v in json_values], dtype=np.float64)
+    if not np.array_equal(expected, np.asarray(arrow_values, dtype=np.float64), equal_nan=True):
+        raise AssertionError(f"{name} : prédictions différentes entre JSON et Arrow")
+
+
+def run(n):
+    check_equivalence()
+
+    records = bench_utils.sample_conso_payloads(n)
+    columns = {field: [record[field] for record in records] for field in records[0]}
+    port_conso, port_dpe = free_port(), free_port()
+    processes = [start_api("API_Lineaire_Reg.py", port_conso), start_api("API_Random_Forest.py", port_dpe)]
+    try:
+        if not (wait_ready(port_conso) and wait_ready(port_dpe)):
+            raise SystemExit("APIs non prêtes")
+        session = requests.Session()
+        routes = [
+            ("/predict_conso/batch", port_conso, ["predictions_conso_kwh"]),
+            ("/predict_dpe/batch", port_dpe, ["predictions_DPE_index"]),
+            ("/predict_full/batch", port_dpe, ["predictions_DPE_index", "predictions_conso_kwh"]),
+        ]
+        print(f"\n{n} logements par lot (temps client de bout en bout)")
+        print(f"{'route':<22} | {'format':<6} | {'corps (Mo)':>10} | {'total (s)':>9} | timings serveur (ms)")
+        for route, port, keys in routes:
+            url = f"http://127.0.0.1:{port}{route}"
+            # Un passage à blanc par format (imports, caches) avant la mesure
+            post_json(session, url, records[:100])
+            post_arrow(session, url, {k: v[:100] for k, v in columns.items()})
+            json_result, json_s, json_bytes = post_json(session, url, records)
+            arrow_result, arrow_s, arrow_bytes = post_arrow(session, url, columns)
+            for key in keys:
+                same_predictions(json_result[key], arrow_result[key], f"{route} {key}")
+            print(f"{route:<22} | {'JSON':<6} | {json_bytes / 1e6:>10.2f} | {json_s:>9.3f} | {json_result['timings_ms']}")
+            print(f"{route:<22} | {'Arrow':<6} | {arrow_bytes / 1e6:>10.2f} | {arrow_s:>9.3f} | {arrow_result['timings_ms']}")
+            print(f"{'':<22} | x{json_s / arrow_s:.1f} plus rapide en Arrow, prédictions identiques")
+    finally:
+        for process in processes:
+            stop_api(process)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000)
+    args = parser.parse_args()
+    run(args.n)
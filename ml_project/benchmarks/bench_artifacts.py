@@ -0,0 +1,85 @@
+"""Démarrage à froid et mémoire par processus : artefacts compressés vs mmap
+
+Lance --workers processus par mode (DPE_ARTIFACT_MODE=compressed puis mmap) qui
+chargent le modèle DPE en même temps, puis relève pour chacun le temps de
+chargement, le RSS et le PSS (RSS où les pages partagées sont divisées entre
+les processus qui les utilisent). Linux uniquement (/proc).
+
+Usage : python benchmarks/bench_artifacts.py [--workers 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import bench_utils
+
+MODES = ("compressed", "mmap")
+
+
+def memory_kb(pid):
+    """RSS, RSS anonyme (privé) et PSS d'un processus, en kB"""
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                values[key] = int(value.split()[0])
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                values["Pss"] = int(line.split()[1])
+    return values
+
+
+def child():
+    """Processus mesuré : charge l'API DPE puis attend la fin de la mesure"""
+    bench_utils.use_project_dir()
+    start = time.perf_counter()
+    import API_Random_Forest
+    API_Random_Forest.dpe_loader.wait()
+    load_s = time.perf_counter() - start
+    ok = API_Random_Forest.model is not None
+    print(json.dumps({"load_s": load_s, "ok": ok}), file=sys.__stdout__, flush=True)
+    sys.stdin.read()
+
+
+def run(workers):
+    print(f"{'mode':<11} | {'chargement (s)':>14} | {'RSS (MB)':>9} | {'privé (MB)':>10} | {'PSS (MB)':>9}")
+    for mode in MODES:
+        env = dict(os.environ, DPE_ARTIFACT_MODE=mode, PYTHONWARNINGS="ignore")
+        processes = [
+            subprocess.Popen([sys.executable, __file__, "--child"], env=env, text=True,
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            for _ in range(workers)
+        ]
+        results = []
+        for process in processes:
+            # Les sorties de l'API (print) précèdent la ligne JSON du processus mesuré
+            for line in process.stdout:
+                if line.startswith("{"):
+                    results.append(json.loads(line))
+                    break
+        memories = [memory_kb(p.pid) for p in processes]
+        for process in processes:
+            process.communicate("")
+
+        if not all(r["ok"] for r in results):
+            print(f"{mode:<11} | échec du chargement du modèle")
+            continue
+        mean = lambda key: sum(m[key] for m in memories) / len(memories) / 1024  # noqa: E731
+        load_s = sum(r["load_s"] for r in results) / len(results)
+        print(f"{mode:<11} | {load_s:>14.2f} | {mean('VmRSS'):>9.1f} | {mean('RssAnon'):>10.1f} | {mean('Pss'):>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+    else:
+        run(args.workers)
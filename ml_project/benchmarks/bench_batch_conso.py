@@ -0,0 +1,49 @@
+"""Compare N appels unitaires à /predict_conso avec un appel à /predict_conso/batch
+
+Usage : python benchmarks/bench_batch_conso.py [--sizes 100 1000 5000]
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+
+import bench_utils
+
+bench_utils.use_project_dir()
+os.environ["PREDICTION_CACHE_SIZE"] = "0"
+
+import API_Lineaire_Reg  # noqa: E402  (charge les assets de consommation)
+
+# Les assets se chargent en arrière-plan depuis l'import
+API_Lineaire_Reg.conso_loader.wait()
+
+
+def run(sizes):
+    client = API_Lineaire_Reg.app.test_client()
+    print(f"{'N':>7} | {'unitaire (s)':>12} | {'batch (s)':>9} | {'gain':>7} | timings batch (ms)")
+
+    for n in sizes:
+        payloads = bench_utils.sample_conso_payloads(n)
+
+        # Les print de la route unitaire (une ligne par champ) ne sont pas mesurés
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            start = time.perf_counter()
+            single = [client.post('/predict_conso', json=p).get_json()["conso_predite_kwh"] for p in payloads]
+            single_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            response = client.post('/predict_conso/batch', data=json.dumps(payloads), content_type='application/json')
+            batch_s = time.perf_counter() - start
+        result = response.get_json()
+
+        if result["predictions_conso_kwh"] != single:
+            raise AssertionError(f"Prédictions batch différentes des appels unitaires (N={n})")
+
+        print(f"{n:>7} | {single_s:>12.3f} | {batch_s:>9.3f} | x{single_s / batch_s:>6.1f} | {result['timings_ms']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,44 @@
+"""Compare N appels unitaires à /predict_dpe avec un appel à /predict_dpe/batch
+
+Usage : python benchmarks/bench_batch_dpe.py [--sizes 100 1000 5000]
+"""
+import argparse
+import json
+import time
+
+import bench_utils
+
+bench_utils.use_project_dir()
+
+import API_Random_Forest  # noqa: E402  (charge le modèle DPE)
+
+# Le modèle se charge en arrière-plan depuis l'import
+API_Random_Forest.dpe_loader.wait()
+
+
+def run(sizes):
+    client = API_Random_Forest.app_dpe.test_client()
+    print(f"{'N':>7} | {'unitaire (s)':>12} | {'batch (s)':>9} | {'gain':>7} | timings batch (ms)")
+
+    for n in sizes:
+        payloads = bench_utils.sample_payloads(n)
+
+        start = time.perf_counter()
+        single = [client.post('/predict_dpe', json=p).get_json()["prediction_DPE_index"] for p in payloads]
+        single_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post('/predict_dpe/batch', data=json.dumps(payloads), content_type='application/json')
+        batch_s = time.perf_counter() - start
+        result = response.get_json()
+
+        if result["predictions_DPE_index"] != single:
+            raise AssertionError(f"Prédictions batch différentes des appels unitaires (N={n})")
+
+        print(f"{n:>7} | {single_s:>12.3f} | {batch_s:>9.3f} | x{single_s / batch_s:>6.1f} | {result['timings_ms']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,111 @@
+"""bulk_score.py sur un Parquet synthétique : débit, mémoire et résultats
+
+Génère N logements dans les domaines du formulaire (plus un identifiant et
+quelques valeurs invalides), lance le scoring de masse avec 1 worker puis avec
+tous les cœurs, et vérifie que la sortie concorde avec /predict_full/batch en
+JSON (même processus, mêmes modèles). Affiche le débit et le pic de mémoire de
+chaque exécution, mesuré dans un sous-processus.
+
+Usage : python benchmarks/bench_bulk_score.py [--n 1000000] [--batch-size 50000]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import bench_utils
+
+bench_utils.use_project_dir()
+
+
+def write_sample(path, n, seed=42):
+    """Parquet de n logements, écrit par blocs pour ne pas tout garder en mémoire"""
+    rng = np.random.default_rng(seed)
+    writer = None
+    for start in range(0, n, 100000):
+        size = min(100000, n - start)
+        columns = {"id_logement": np.arange(start, start + size)}
+        for field, values in bench_utils.FORM_DOMAINS.items():
+            columns[field] = pa.array(np.asarray(values, dtype=object)[rng.integers(len(values), size=size)])
+        columns["surface_habitable_logement"] = rng.integers(2, 101, size=size) * 5.0
+        columns["hauteur_sous_plafond"] = rng.integers(20, 51, size=size) / 10
+        table = pa.table(columns)
+        # Une ligne sur mille hors domaine (erreur attendue côté consommation)
+        bad = pa.array(rng.random(size) < 0.001)
+        table = table.set_column(table.column_names.index("periode_construction"), "periode_construction",
+                                 pa.compute.if_else(bad, "inconnue", table.column("periode_construction")))
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+
+def run_cli(input_path, output_dir, batch_size, workers):
+    """Lance bulk_score.py dans un sous-processus et relève son pic de mémoire (RSS, Mo)"""
+    code = (
+        "import json, resource, sys, bulk_score\n"
+        f"summary = bulk_score.run({str(input_path)!r}, {str(output_dir)!r}, {batch_size}, {workers}, "
+        "keep=['id_logement'], overwrite=True)\n"
+        "peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,"
+        " resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024\n"
+        "print('RESULT ' + json.dumps(dict(summary, peak_rss_mb=peak)))\n"
+    )
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    output = subprocess.run([sys.executable, "-c", code], cwd=bench_utils.PROJECT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    lines = output.splitlines()
+    for line in lines:
+        if line.startswith("  lot") or line.startswith("🎯"):
+            last_progress = line
+    print(last_progress)
+    return json.loads(next(line for line in lines if line.startswith("RESULT "))[7:])
+
+
+def check_against_api(output_dir, input_path, n_check=3000):
+    """Compare les premières lignes de la sortie à /predict_full/batch (JSON)"""
+    import API_Random_Forest
+    API_Random_Forest.dpe_loader.wait()
+    API_Random_Forest.conso_api.conso_loader.wait()
+    client = API_Random_Forest.app_dpe.test_client()
+
+    scored = pq.read_table(output_dir).sort_by("id_logement").slice(0, n_check)
+    records = pq.read_table(input_path).slice(0, n_check).drop_columns(["id_logement"]).to_pylist()
+    expected = client.post("/predict_full/batch", json=records).get_json()
+    if scored.column("prediction_DPE_index").to_pylist() != expected["predictions_DPE_index"]:
+        raise AssertionError("Classes DPE différentes de /predict_full/batch")
+    if scored.column("conso_predite_kwh").to_pylist() != expected["predictions_conso_kwh"]:
+        raise AssertionError("Consommations différentes de /predict_full/batch")
+    print(f"{n_check} premières lignes identiques à /predict_full/batch ({expected['n_erreurs']} en erreur)")
+
+
+def run(n, batch_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "logements.parquet")
+        write_sample(input_path, n)
+        print(f"Parquet synthétique : {n:,} logements, {os.path.getsize(input_path) / 1e6:.1f} Mo")
+
+        results = {}
+        for workers in sorted({1, os.cpu_count() or 1}):
+            output_dir = os.path.join(tmp, f"sortie_{workers}")
+            results[workers] = run_cli(input_path, output_dir, batch_size, workers)
+            check_against_api(output_dir, input_path)
+
+        print(f"\n{'workers':>7} | {'logements/s':>12} | {'durée (s)':>9} | {'pic RSS (Mo)':>12}")
+        for workers, summary in results.items():
+            print(f"{workers:>7} | {summary['rows_per_s']:>12,.0f} | {summary['elapsed_s']:>9.1f} | "
+                  f"{summary['peak_rss_mb']:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+    run(args.n, args.batch_size)
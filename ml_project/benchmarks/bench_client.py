@@ -0,0 +1,92 @@
+"""Client des APIs (prediction_client) face aux appels requests sans session
+
+Démarre les deux APIs (cache de prédictions désactivé, socket Unix comme sous
+APIManager), puis prédit les mêmes N logements avec /predict_full :
+- requests.post sans session, une connexion par appel (ancienne page Streamlit) ;
+- PredictionClient, appels séquentiels sur connexions persistantes ;
+- AsyncPredictionClient, --concurrency appels en vol ;
+- predict_full_batch découpé en lots de --batch-size, synchrone puis asynchrone.
+Affiche ensuite la latence vue du client (latency_summary).
+
+Usage : python benchmarks/bench_client.py [--n 1000] [--concurrency 8] [--batch-size 250]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import requests
+
+import bench_utils
+from bench_prefork import free_port, wait_ready
+from bench_uds import start_api, stop_api, wait_socket
+from prediction_client import AsyncPredictionClient, PredictionClient, Service
+
+
+def run(n, concurrency, batch_size):
+    payloads = bench_utils.sample_payloads(n)
+    socket_dir = tempfile.mkdtemp(prefix="bench_client_")
+    port_conso, port_dpe = free_port(), free_port()
+    socket_conso, socket_dpe = os.path.join(socket_dir, "conso.sock"), os.path.join(socket_dir, "dpe.sock")
+    processes = [start_api("API_Lineaire_Reg.py", port_conso, socket_conso),
+                 start_api("API_Random_Forest.py", port_dpe, socket_dpe)]
+    try:
+        if not (wait_ready(port_conso) and wait_ready(port_dpe) and wait_socket(socket_conso)
+                and wait_socket(socket_dpe)):
+            raise SystemExit("APIs non prêtes")
+        client = PredictionClient(dpe=Service("dpe", port_dpe, socket_dpe),
+                                  conso=Service("conso", port_conso, socket_conso),
+                                  batch_size=batch_size, pool_maxsize=concurrency)
+        async_client = AsyncPredictionClient(client)
+        rows = []
+
+        def measure(name, call):
+            start = time.perf_counter()
+            results = call()
+            elapsed = time.perf_counter() - start
+            rows.append((name, elapsed))
+            return results
+
+        def full_pairs(results):
+            return [(r["prediction_DPE_index"], r["conso_predite_kwh"]) for r in results]
+
+        url = f"http://127.0.0.1:{port_dpe}/predict_full"
+        reference = measure("requests.post sans session", lambda: full_pairs(
+            [requests.post(url, json=payload, timeout=30).json() for payload in payloads]))
+        sequential = measure("PredictionClient", lambda: full_pairs(
+            [client.predict_full(payload) for payload in payloads]))
+
+        async def concurrent():
+            return await asyncio.gather(*(async_client.predict_full(payload) for payload in payloads))
+        gathered = measure(f"AsyncPredictionClient x{concurrency}", lambda: full_pairs(asyncio.run(concurrent())))
+
+        def batch_pairs(batch):
+            return list(zip(batch["predictions_DPE_index"], batch["predictions_conso_kwh"]))
+        batch_sync = measure(f"predict_full_batch ({batch_size}/lot)",
+                             lambda: batch_pairs(client.predict_full_batch(payloads)))
+        batch_async = measure(f"async predict_full_batch ({batch_size}/lot)",
+                              lambda: batch_pairs(asyncio.run(async_client.predict_full_batch(payloads))))
+
+        if not (reference == sequential == gathered == batch_sync == batch_async):
+            raise AssertionError("Résultats différents selon le mode d'appel")
+        print(f"Résultats identiques sur {n} logements")
+
+        print(f"{'mode':<40} | {'total (s)':>9} | {'logements/s':>11}")
+        for name, elapsed in rows:
+            print(f"{name:<40} | {elapsed:>9.3f} | {n / elapsed:>11.1f}")
+        print(json.dumps(client.latency_summary(), indent=2, ensure_ascii=False))
+        asyncio.run(async_client.close())
+    finally:
+        for process in processes:
+            stop_api(process)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=250)
+    args = parser.parse_args()
+    run(args.n, args.concurrency, args.batch_size)
@@ -0,0 +1,97 @@
+"""Micro-benchmark de l'encodage d'une requête /predict_dpe
+
+Compare l'ancien chemin pandas (DataFrame + get_dummies + .loc cellule par cellule)
+à l'encodeur compilé depuis feature_spec, et vérifie que les sorties sont identiques.
+
+Usage : python benchmarks/bench_encoder_dpe.py [--n 2000]
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import bench_utils
+
+bench_utils.use_project_dir()
+
+import API_Random_Forest  # noqa: E402  (charge les colonnes et compile l'encodeur)
+
+# Le modèle se charge en arrière-plan depuis l'import
+API_Random_Forest.dpe_loader.wait()
+
+warnings.simplefilter("ignore", FutureWarning)
+
+
+def encode_pandas(data, feature_columns, ordinal_categories):
+    """Ancien pré-traitement de predict_dpe, conservé comme référence"""
+    input_df = pd.DataFrame([data])
+    df_processed = input_df.copy()
+
+    for col, categories in ordinal_categories.items():
+        mapping = {category: i for i, category in enumerate(categories)}
+        df_processed[col] = df_processed[col].map(mapping).fillna(-1)
+
+    df_processed = pd.get_dummies(df_processed, drop_first=False)
+
+    X_final = pd.DataFrame(0, index=[0], columns=feature_columns)
+    for col in df_processed.columns:
+        if col in X_final.columns:
+            X_final.loc[0, col] = df_processed.loc[0, col]
+    return X_final
+
+
+def edge_payloads(payloads):
+    """Variantes qui activent les indicatrices et les valeurs hors domaine"""
+    variants = []
+    for payload in payloads[:50]:
+        variant = dict(payload)
+        variant["type_energie_n1"] = variant["type_energie_n1"].lower()
+        variant["type_energie_principale_chauffage"] = variant["type_energie_principale_chauffage"].lower()
+        variant["logement"] = variant["logement"].lower()
+        variant["type_batiment"] = "maison"
+        variant["qualite_isolation_murs"] = "tres bonne"
+        variants.append(variant)
+        partial = dict(payload)
+        partial.pop("hauteur_sous_plafond")
+        partial["surface_habitable_logement"] = None
+        partial["logement_neuf"] = True
+        variants.append(partial)
+    return variants
+
+
+def run(n):
+    encoder = API_Random_Forest.dpe_encoder
+    columns = API_Random_Forest.FEATURE_COLUMNS
+    ordinal = API_Random_Forest.ORDINAL_CATEGORIES
+
+    payloads = bench_utils.sample_payloads(n)
+    payloads += edge_payloads(payloads)
+
+    pandas_times, encoder_times = [], []
+    for payload in payloads:
+        start = time.perf_counter()
+        reference = encode_pandas(payload, columns, ordinal)
+        pandas_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        encoded = encoder.encode(payload)
+        encoder_times.append(time.perf_counter() - start)
+
+        if not np.array_equal(reference.to_numpy(dtype=np.float64), encoded):
+            raise AssertionError(f"Encodage différent pour {payload}")
+
+    pandas_stats = bench_utils.percentiles_ms(pandas_times)
+    encoder_stats = bench_utils.percentiles_ms(encoder_times)
+    print(f"{len(payloads)} requêtes encodées, sorties identiques")
+    print(f"{'chemin':<10} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    print(f"{'pandas':<10} | {pandas_stats['p50']:>9.4f} | {pandas_stats['p99']:>9.4f}")
+    print(f"{'encodeur':<10} | {encoder_stats['p50']:>9.4f} | {encoder_stats['p99']:>9.4f}")
+    print(f"gain p50 : x{pandas_stats['p50'] / encoder_stats['p50']:.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=2000)
+    run(parser.parse_args().n)
@@ -0,0 +1,77 @@
+"""Encodeurs compilés depuis feature_spec face aux pré-traitements historiques des deux APIs
+
+Mesure l'encodage d'une ligne et d'un lot, avant (tests/legacy_encoders.py) et avec
+feature_spec, puis affiche les valeurs du formulaire sans effet sur chaque modèle
+(dérive de vocabulaire). L'équivalence des deux encodages est vérifiée par
+tests/test_feature_spec.py (python -m pytest ml_project/tests).
+
+Usage : python benchmarks/bench_feature_spec.py [--n 2000] [--batch 20000]
+"""
+import argparse
+import time
+import warnings
+
+import bench_utils
+
+bench_utils.use_project_dir()
+
+import API_Random_Forest  # noqa: E402  (charge les colonnes DPE)
+import API_Lineaire_Reg  # noqa: E402
+from feature_spec import drift_report  # noqa: E402
+from tests.legacy_encoders import legacy_conso, legacy_conso_batch, legacy_dpe_batch  # noqa: E402
+
+# Le modèle se charge en arrière-plan depuis l'import
+API_Random_Forest.dpe_loader.wait()
+
+warnings.simplefilter("ignore", FutureWarning)
+
+
+def time_single(encode, payloads):
+    durations = []
+    for payload in payloads:
+        start = time.perf_counter()
+        encode(payload)
+        durations.append(time.perf_counter() - start)
+    return bench_utils.percentiles_ms(durations)["p50"]
+
+
+def time_once(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(n, batch):
+    dpe_encoder = API_Random_Forest.dpe_artifacts.encoder
+    conso_encoder = API_Lineaire_Reg.conso_encoder
+
+    payloads = bench_utils.sample_payloads(n)
+    conso_payloads = bench_utils.sample_conso_payloads(n)
+
+    columns = dpe_encoder.feature_columns
+    big_dpe = bench_utils.sample_payloads(batch, seed=1)
+    big_conso = bench_utils.sample_conso_payloads(batch, seed=1)
+    rows = [
+        ("DPE", lambda p: legacy_dpe_batch([p], columns), dpe_encoder.encode, payloads,
+         lambda: legacy_dpe_batch(big_dpe, columns), lambda: dpe_encoder.encode_batch(big_dpe)),
+        ("consommation", legacy_conso, conso_encoder.encode, conso_payloads,
+         lambda: legacy_conso_batch(big_conso), lambda: conso_encoder.encode_batch(big_conso)),
+    ]
+    print(f"\n{'modèle':<13} | {'1 ligne avant (ms)':>18} | {'1 ligne spec (ms)':>17} | "
+          f"{f'{batch} lignes avant (s)':>20} | {f'{batch} lignes spec (s)':>19}")
+    for name, legacy_single, single, sample, legacy_batch, spec_batch in rows:
+        print(f"{name:<13} | {time_single(legacy_single, sample[:500]):>18.4f} | {time_single(single, sample):>17.4f} | "
+              f"{time_once(legacy_batch):>20.3f} | {time_once(spec_batch):>19.3f}")
+
+    print("\nValeurs du formulaire sans effet sur le modèle :")
+    for encoder in (dpe_encoder, conso_encoder):
+        for field, values in drift_report(encoder.spec).items():
+            print(f"  {encoder.spec.name:<13} {field:<34} {values}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.n, args.batch)
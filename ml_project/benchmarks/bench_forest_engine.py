@@ -0,0 +1,87 @@
+"""Latence du moteur à plat (forest_engine.FlatForest) face à model.predict
+
+Vérifie que les classes prédites sont identiques, puis mesure la latence
+d'une ligne et d'un lot de 10 000 lignes pour les deux chemins.
+
+Usage : python benchmarks/bench_forest_engine.py [--data donnees_ml_preparees.csv] [--repeat 50]
+
+Avec --data, la vérification porte sur le split de test de Modeles/Modele_RandomForest.py
+(test_size=0.2, random_state=42, stratify) ; sinon sur des logements du formulaire.
+"""
+import argparse
+import time
+
+import numpy as np
+
+import bench_utils
+
+bench_utils.use_project_dir()
+
+import API_Random_Forest  # noqa: E402  (charge le modèle et exporte la forêt)
+from forest_engine import FlatForest  # noqa: E402
+
+# Le modèle se charge en arrière-plan depuis l'import
+API_Random_Forest.dpe_loader.wait()
+
+BATCH_SIZE = 10000
+
+
+def load_test_split(path):
+    """Reproduit le split de test de Modele_RandomForest.py"""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(path, sep=',')
+    df.columns = df.columns.str.strip().str.lower()
+    leakage_columns = ["conso_5_usages_ef", "conso_5_usages_ef_energie_n1",
+                       "cout_total_5_usages", "cout_total_5_usages_energie_n1"]
+    X = df.drop(columns=["etiquette_dpe"] + [c for c in leakage_columns if c in df.columns])
+    y = df["etiquette_dpe"]
+    _, X_test, _, _ = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    return X_test[API_Random_Forest.FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def time_calls(predict, X, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        durations.append(time.perf_counter() - start)
+    return bench_utils.percentiles_ms(durations)
+
+
+def run(data_path, repeat):
+    model = API_Random_Forest.model
+
+    start = time.perf_counter()
+    flat = FlatForest.from_sklearn(model)
+    print(f"Export : {flat.n_trees} arbres, {len(flat.feature)} noeuds en {time.perf_counter() - start:.2f}s")
+
+    if data_path:
+        X_check = load_test_split(data_path)
+        source = f"split de test ({len(X_check)} lignes)"
+    else:
+        encoder = API_Random_Forest.dpe_encoder
+        X_check = np.vstack([encoder.encode(p).copy() for p in bench_utils.sample_payloads(BATCH_SIZE)])
+        source = f"logements du formulaire ({len(X_check)} lignes)"
+
+    if not np.array_equal(flat.predict(X_check), model.predict(X_check)):
+        raise AssertionError("Le moteur à plat ne donne pas les mêmes classes que model.predict")
+    print(f"Classes identiques sur {source}")
+
+    X_batch = np.resize(X_check, (BATCH_SIZE, X_check.shape[1]))
+    X_single = X_batch[:1]
+
+    print(f"{'chemin':<14} | {'1 ligne p50 (ms)':>16} | {'1 ligne p99 (ms)':>16} | {'10k lignes p50 (ms)':>19}")
+    for name, predict in (("model.predict", model.predict), ("FlatForest", flat.predict)):
+        single = time_calls(predict, X_single, repeat)
+        batch = time_calls(predict, X_batch, max(3, repeat // 10))
+        print(f"{name:<14} | {single['p50']:>16.3f} | {single['p99']:>16.3f} | {batch['p50']:>19.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", help="CSV donnees_ml_preparees.csv pour vérifier sur le split de test")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    run(args.data, args.repeat)
@@ -0,0 +1,94 @@
+"""Scoreur linéaire fusionné (linear_scorer.FusedLinearScorer) face au pipeline sklearn
+
+Vérifie l'écart maximal entre les deux chemins, puis mesure la latence d'une
+ligne et d'un lot de 10 000 lignes, ainsi que /predict_conso de bout en bout
+(cache désactivé) avec CONSO_ENGINE=sklearn puis fused.
+
+Usage : python benchmarks/bench_linear_scorer.py [--repeat 200]
+"""
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+import bench_utils
+
+bench_utils.use_project_dir()
+os.environ["PREDICTION_CACHE_SIZE"] = "0"
+
+import API_Lineaire_Reg  # noqa: E402  (charge les assets et compile le scoreur)
+
+# Les assets se chargent en arrière-plan depuis l'import
+API_Lineaire_Reg.conso_loader.wait()
+
+BATCH_SIZE = 10000
+
+
+def quiet():
+    """Masque les print de la route (une ligne par champ reçu)"""
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def encode_rows(payloads):
+    """Matrices brutes dans l'ordre All_Data, via l'encodeur de la route"""
+    with quiet():
+        return np.vstack([API_Lineaire_Reg.encode_conso(payload) for payload in payloads])
+
+
+def time_calls(predict, X, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        durations.append(time.perf_counter() - start)
+    return bench_utils.percentiles_ms(durations)
+
+
+def time_route(payloads):
+    client = API_Lineaire_Reg.app.test_client()
+    durations = []
+    with quiet():
+        for payload in payloads:
+            start = time.perf_counter()
+            client.post("/predict_conso", json=payload)
+            durations.append(time.perf_counter() - start)
+    return bench_utils.percentiles_ms(durations)
+
+
+def run(repeat):
+    artifacts = API_Lineaire_Reg.conso_artifacts
+    scorer = artifacts.fused_scorer
+    if scorer is None:
+        raise SystemExit("Scoreur fusionné non compilé (CONSO_ENGINE=sklearn ou validation échouée)")
+    pipeline = artifacts.predict_pipeline
+
+    payloads = bench_utils.sample_conso_payloads(2000)
+    X_form = encode_rows(payloads)
+    X_form[::10, 0] = np.nan  # hauteur absente : imputation
+    error = scorer.max_abs_error(pipeline, X_form)
+    print(f"Ecart max sur {len(X_form)} logements du formulaire : {error:.2e} kWh")
+
+    X_batch = np.resize(X_form, (BATCH_SIZE, X_form.shape[1]))
+    X_single = X_batch[:1]
+
+    print(f"{'chemin':<16} | {'1 ligne p50 (ms)':>16} | {'1 ligne p99 (ms)':>16} | {'10k lignes p50 (ms)':>19}")
+    for name, predict in (("pipeline sklearn", pipeline), ("fusionné", scorer.predict)):
+        single = time_calls(predict, X_single, repeat)
+        batch = time_calls(predict, X_batch, max(3, repeat // 10))
+        print(f"{name:<16} | {single['p50']:>16.4f} | {single['p99']:>16.4f} | {batch['p50']:>19.2f}")
+
+    print(f"\n{'/predict_conso':<16} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    for name, fused in (("sklearn", None), ("fused", scorer)):
+        artifacts.fused_scorer = fused
+        route = time_route(payloads[:repeat])
+        print(f"{name:<16} | {route['p50']:>9.3f} | {route['p99']:>9.3f}")
+    artifacts.fused_scorer = scorer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    run(args.repeat)
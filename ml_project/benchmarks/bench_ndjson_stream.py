@@ -0,0 +1,167 @@
+"""Mode streaming NDJSON face au lot JSON sur /predict_full/batch et /predict_conso/batch
+
+Démarre les deux APIs puis, pour chaque route :
+- envoie N logements en un lot JSON (réponse unique, jsonify) ;
+- envoie les mêmes logements en NDJSON avec Accept: application/x-ndjson, corps
+  envoyé en chunked par un thread pendant que la réponse est lue ligne à ligne.
+Mesure le temps jusqu'au premier octet, la durée totale et la hausse de mémoire
+(RSS) du processus serveur pendant la requête ; vérifie que les prédictions sont
+identiques. Le streaming est ensuite répété sur 5 x N logements (au-delà de la
+limite des lots) pour montrer que la mémoire ne croît pas avec la taille.
+
+Usage : python benchmarks/bench_ndjson_stream.py [--n 100000]
+"""
+import argparse
+import http.client
+import json
+import socket
+import threading
+import time
+
+import psutil
+import requests
+
+import bench_utils
+from bench_predict_full import start_api, stop_api
+from bench_prefork import free_port, wait_ready
+
+NDJSON_HEADERS = {"Content-Type": "application/x-ndjson", "Accept": "application/x-ndjson"}
+
+
+class RssSampler:
+    """Relève le RSS maximal d'un processus pendant une mesure"""
+
+    def __init__(self, pid, interval_s=0.005):
+        self.process = psutil.Process(pid)
+        self.interval_s = interval_s
+
+    def __enter__(self):
+        self.baseline = self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            time.sleep(self.interval_s)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def growth_mb(self):
+        return (self.peak - self.baseline) / 1e6
+
+
+def ndjson_lines(records, repeat=1):
+    for _ in range(repeat):
+        for record in records:
+            yield (json.dumps(record) + "\n").encode()
+
+
+def post_batch(session, url, records, pid):
+    with RssSampler(pid) as rss:
+        start = time.perf_counter()
+        response = session.post(url, json=records, stream=True)
+        first = None
+        chunks = []
+        for chunk in response.iter_content(65536):
+            first = first or time.perf_counter()
+            chunks.append(chunk)
+        result = json.loads(b"".join(chunks))
+        total = time.perf_counter() - start
+    return result, first - start, total, rss.growth_mb
+
+
+def post_stream(port, route, records, pid, repeat=1):
+    """Envoie le corps en chunked depuis un thread pendant que la réponse est lue (full duplex).
+
+    Un client qui envoie tout le corps avant de lire (requests) se bloquerait dès que
+    les tampons TCP de la réponse sont pleins.
+    """
+    with RssSampler(pid) as rss:
+        start = time.perf_counter()
+        sock = socket.create_connection(("127.0.0.1", port))
+
+        def send():
+            head = (f"POST {route} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nTransfer-Encoding: chunked\r\n"
+                    + "".join(f"{k}: {v}\r\n" for k, v in NDJSON_HEADERS.items()) + "\r\n")
+            sock.sendall(head.encode())
+            buffer = []
+            for line in ndjson_lines(records, repeat):
+                buffer.append(line)
+                if len(buffer) == 500:
+                    data = b"".join(buffer)
+                    sock.sendall(b"%x\r\n%s\r\n" % (len(data), data))
+                    buffer = []
+            if buffer:
+                data = b"".join(buffer)
+                sock.sendall(b"%x\r\n%s\r\n" % (len(data), data))
+            sock.sendall(b"0\r\n\r\n")
+
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        response = http.client.HTTPResponse(sock, method="POST")
+        response.begin()
+        first = None
+        results, summary = [], None
+        for line in response:
+            first = first or time.perf_counter()
+            row = json.loads(line)
+            if "resume" in row:
+                summary = row["resume"]
+            elif repeat == 1:
+                results.append(row)
+        total = time.perf_counter() - start
+        sender.join()
+        sock.close()
+    return results, summary, first - start, total, rss.growth_mb
+
+
+def run(n):
+    records = bench_utils.sample_conso_payloads(n)
+    port_conso, port_dpe = free_port(), free_port()
+    processes = [start_api("API_Lineaire_Reg.py", port_conso), start_api("API_Random_Forest.py", port_dpe)]
+    try:
+        if not (wait_ready(port_conso) and wait_ready(port_dpe)):
+            raise SystemExit("APIs non prêtes")
+        session = requests.Session()
+        routes = [
+            ("/predict_conso/batch", processes[0], port_conso,
+             [("predictions_conso_kwh", "conso_predite_kwh")]),
+            ("/predict_full/batch", processes[1], port_dpe,
+             [("predictions_DPE_index", "prediction_DPE_index"), ("predictions_conso_kwh", "conso_predite_kwh")]),
+        ]
+        print(f"{'route':<22} | {'mode':<16} | {'logements':>9} | {'1er octet (s)':>13} | {'total (s)':>9} | "
+              f"{'+RSS (Mo)':>9}")
+        for route, process, port, keys in routes:
+            url = f"http://127.0.0.1:{port}{route}"
+            post_stream(port, route, records[:100], process.pid)
+            batch, batch_ttfb, batch_total, batch_rss = post_batch(session, url, records, process.pid)
+            rows, summary, ttfb, total, rss = post_stream(port, route, records, process.pid)
+            for batch_key, stream_key in keys:
+                streamed = [row.get(stream_key) for row in rows]
+                if streamed != batch[batch_key]:
+                    raise AssertionError(f"{route} : {stream_key} différent entre le lot et le streaming")
+            if [row["index"] for row in rows] != list(range(n)):
+                raise AssertionError(f"{route} : indices du streaming incorrects")
+            print(f"{route:<22} | {'lot JSON':<16} | {n:>9} | {batch_ttfb:>13.3f} | {batch_total:>9.3f} | "
+                  f"{batch_rss:>9.1f}")
+            print(f"{route:<22} | {'streaming NDJSON':<16} | {n:>9} | {ttfb:>13.3f} | {total:>9.3f} | {rss:>9.1f}")
+            _, summary, ttfb, total, rss = post_stream(port, route, records, process.pid, repeat=5)
+            print(f"{route:<22} | {'streaming NDJSON':<16} | {summary['n_logements']:>9} | {ttfb:>13.3f} | "
+                  f"{total:>9.3f} | {rss:>9.1f}")
+            print(f"{'':<22} | résultats identiques, serveur : {summary['timings_ms']}")
+    finally:
+        for process in processes:
+            stop_api(process)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000)
+    args = parser.parse_args()
+    run(args.n)
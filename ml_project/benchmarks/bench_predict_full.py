@@ -0,0 +1,89 @@
+"""/predict_full (DPE puis consommation dans le même processus) face aux deux appels HTTP chaînés
+
+Démarre les deux APIs (cache de prédictions désactivé), puis mesure pour N logements :
+- l'enchaînement de la page Streamlit d'origine : /predict_dpe puis /predict_conso ;
+- un appel /predict_full par logement ;
+- un seul appel /predict_full/batch pour les N logements.
+
+Usage : python benchmarks/bench_predict_full.py [--n 300]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+import bench_utils
+from bench_prefork import free_port, wait_ready
+
+
+def start_api(api_file, port):
+    env = dict(os.environ, PORT=str(port), PREDICTION_CACHE_SIZE="0", PYTHONWARNINGS="ignore")
+    return subprocess.Popen([sys.executable, api_file], cwd=bench_utils.PROJECT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def stop_api(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def timed(call, payloads):
+    durations, results = [], []
+    for payload in payloads:
+        start = time.perf_counter()
+        results.append(call(payload))
+        durations.append(time.perf_counter() - start)
+    return results, bench_utils.percentiles_ms(durations), sum(durations)
+
+
+def run(n):
+    payloads = bench_utils.sample_payloads(n)
+    port_conso, port_dpe = free_port(), free_port()
+    processes = [start_api("API_Lineaire_Reg.py", port_conso), start_api("API_Random_Forest.py", port_dpe)]
+    try:
+        if not (wait_ready(port_conso) and wait_ready(port_dpe)):
+            raise SystemExit("APIs non prêtes")
+        session = requests.Session()
+
+        def chained(payload):
+            dpe = session.post(f"http://127.0.0.1:{port_dpe}/predict_dpe", json=payload).json()["prediction_DPE_index"]
+            conso = session.post(f"http://127.0.0.1:{port_conso}/predict_conso",
+                                 json=dict(payload, etiquette_dpe=dpe)).json()["conso_predite_kwh"]
+            return dpe, conso
+
+        def full(payload):
+            result = session.post(f"http://127.0.0.1:{port_dpe}/predict_full", json=payload).json()
+            return result["prediction_DPE_index"], result["conso_predite_kwh"]
+
+        chained_results, chained_stats, chained_total = timed(chained, payloads)
+        full_results, full_stats, full_total = timed(full, payloads)
+
+        start = time.perf_counter()
+        batch = session.post(f"http://127.0.0.1:{port_dpe}/predict_full/batch", json=payloads).json()
+        batch_total = time.perf_counter() - start
+        batch_results = list(zip(batch["predictions_DPE_index"], batch["predictions_conso_kwh"]))
+
+        if not (chained_results == full_results == batch_results):
+            raise AssertionError("Résultats différents entre les appels chaînés et /predict_full")
+        print(f"Résultats identiques sur {n} logements")
+
+        print(f"{'chemin':<26} | {'p50 (ms)':>9} | {'p99 (ms)':>9} | {'total (s)':>9}")
+        print(f"{'/predict_dpe + conso':<26} | {chained_stats['p50']:>9.2f} | {chained_stats['p99']:>9.2f} | {chained_total:>9.3f}")
+        print(f"{'/predict_full':<26} | {full_stats['p50']:>9.2f} | {full_stats['p99']:>9.2f} | {full_total:>9.3f}")
+        print(f"{'/predict_full/batch':<26} | {'':>9} | {'':>9} | {batch_total:>9.3f}  {batch['timings_ms']}")
+    finally:
+        for process in processes:
+            stop_api(process)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=300)
+    run(parser.parse_args().n)
@@ -0,0 +1,112 @@
+"""Débit des APIs en mode pre-fork selon le nombre de workers
+
+Pour chaque valeur de API_WORKERS, démarre l'API (modèles chargés une fois dans le
+maître puis fork des workers), envoie des requêtes /predict_* en boucle fermée
+depuis --concurrency clients pendant --duration secondes, puis mesure le débit.
+
+Usage : python benchmarks/bench_prefork.py [--api dpe|conso] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+import bench_utils
+
+APIS = {
+    "dpe": ("API_Random_Forest.py", "/predict_dpe"),
+    "conso": ("API_Lineaire_Reg.py", "/predict_conso"),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=2).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def closed_loop(url, payloads, concurrency, duration):
+    """concurrency clients qui renvoient une requête dès la réponse précédente reçue"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        local, local_errors, i = [], 0, offset
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                ok = session.post(url, json=payloads[i % len(payloads)], timeout=30).status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            local_errors += not ok
+            i += concurrency
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def run(api, workers_list, concurrency, duration):
+    api_file, route = APIS[api]
+    payloads = bench_utils.sample_payloads(1000)
+    for payload in payloads:
+        payload["etiquette_dpe"] = 3
+
+    print(f"{'workers':>7} | {'req/s':>8} | {'p50 (ms)':>9} | {'p99 (ms)':>9} | {'erreurs':>7}")
+    for workers in workers_list:
+        port = free_port()
+        env = dict(os.environ, PORT=str(port), API_WORKERS=str(workers), PYTHONWARNINGS="ignore")
+        process = subprocess.Popen([sys.executable, api_file], cwd=bench_utils.PROJECT_DIR, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+        try:
+            if not wait_ready(port):
+                print(f"{workers:>7} | API non prête")
+                continue
+            latencies, errors = closed_loop(f"http://127.0.0.1:{port}{route}", payloads, concurrency, duration)
+            stats = bench_utils.percentiles_ms(latencies)
+            print(f"{workers:>7} | {len(latencies) / duration:>8.1f} | {stats['p50']:>9.2f} | "
+                  f"{stats['p99']:>9.2f} | {errors:>7}")
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--api", choices=sorted(APIS), default="dpe")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    run(args.api, args.workers, args.concurrency, args.duration)
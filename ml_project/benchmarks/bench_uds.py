@@ -0,0 +1,124 @@
+"""Latence aller-retour d'une prédiction unitaire : socket Unix face au TCP local
+
+Démarre les deux APIs (cache de prédictions désactivé) avec leur port TCP et un
+socket Unix (API_UNIX_SOCKET, comme APIManager), puis envoie séquentiellement
+les mêmes N logements à /predict_conso et /predict_full par chaque transport :
+- session requests (connexion persistante), comme la page Streamlit et APIManager ;
+- http.client brut (connexion persistante), pour isoler le coût du transport.
+
+Usage : python benchmarks/bench_uds.py [--n 2000]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import bench_utils
+from bench_prefork import free_port, wait_ready
+from uds_transport import session, unix_url
+
+
+class UnixHTTPClientConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def start_api(api_file, port, unix_socket):
+    env = dict(os.environ, PORT=str(port), API_UNIX_SOCKET=unix_socket,
+               PREDICTION_CACHE_SIZE="0", PYTHONWARNINGS="ignore")
+    return subprocess.Popen([sys.executable, api_file], cwd=bench_utils.PROJECT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def stop_api(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def wait_socket(path, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not os.path.exists(path):
+        time.sleep(0.1)
+    return os.path.exists(path)
+
+
+def timed(call, payloads):
+    durations, results = [], []
+    for payload in payloads:
+        start = time.perf_counter()
+        results.append(call(payload))
+        durations.append(time.perf_counter() - start)
+    return results, bench_utils.percentiles_ms(durations)
+
+
+def requests_caller(api_session, url):
+    return lambda payload: api_session.post(url, json=payload, timeout=30).json()
+
+
+def raw_caller(connection, route):
+    headers = {"Content-Type": "application/json"}
+
+    def call(payload):
+        connection.request("POST", route, body=json.dumps(payload), headers=headers)
+        return json.loads(connection.getresponse().read())
+    return call
+
+
+def run(n):
+    socket_dir = tempfile.mkdtemp(prefix="bench_uds_")
+    apis = {
+        "/predict_conso": ("API_Lineaire_Reg.py", free_port(), os.path.join(socket_dir, "conso.sock"),
+                           bench_utils.sample_conso_payloads(n)),
+        "/predict_full": ("API_Random_Forest.py", free_port(), os.path.join(socket_dir, "dpe.sock"),
+                          bench_utils.sample_payloads(n)),
+    }
+    processes = [start_api(api_file, port, path) for api_file, port, path, _ in apis.values()]
+    try:
+        for _, port, path, _ in apis.values():
+            if not (wait_ready(port) and wait_socket(path)):
+                raise SystemExit("APIs non prêtes")
+        api_session = session()
+
+        print(f"{'route':<15} | {'transport':<22} | {'p50 (ms)':>9} | {'p99 (ms)':>9} | {'max (ms)':>9}")
+        for route, (_, port, path, payloads) in apis.items():
+            callers = {
+                "TCP (requests)": requests_caller(api_session, f"http://127.0.0.1:{port}{route}"),
+                "Unix (requests)": requests_caller(api_session, unix_url(path, route)),
+                "TCP (http.client)": raw_caller(http.client.HTTPConnection("127.0.0.1", port), route),
+                "Unix (http.client)": raw_caller(UnixHTTPClientConnection(path), route),
+            }
+            # Échauffement : connexions ouvertes et chemins de code chargés
+            for call in callers.values():
+                call(payloads[0])
+            reference = None
+            for name, call in callers.items():
+                results, stats = timed(call, payloads)
+                if reference is None:
+                    reference = results
+                elif results != reference:
+                    raise AssertionError(f"Résultats différents entre les transports sur {route}")
+                print(f"{route:<15} | {name:<22} | {stats['p50']:>9.3f} | {stats['p99']:>9.3f} | {stats['max']:>9.3f}")
+        print(f"Résultats identiques sur {n} logements par route")
+    finally:
+        for process in processes:
+            stop_api(process)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=2000)
+    run(parser.parse_args().n)
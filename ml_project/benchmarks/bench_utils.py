@@ -0,0 +1,54 @@
+"""Outils communs aux benchmarks des APIs de prédiction"""
+import os
+import sys
+import pathlib
+import random
+
+import numpy as np
+
+# Répertoire ml_project (les APIs résolvent leurs fichiers depuis le dossier courant)
+PROJECT_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+if str(PROJECT_DIR) not in sys.path:
+    sys.path.insert(0, str(PROJECT_DIR))
+
+# Domaines des champs du formulaire de views/prediction.py
+from feature_spec import FORM_DOMAINS  # noqa: E402
+
+
+def use_project_dir():
+    """Place ml_project dans le sys.path et en dossier courant"""
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    os.chdir(PROJECT_DIR)
+
+
+def sample_payloads(n: int, seed: int = 42) -> list:
+    """Génère n logements aléatoires dans les domaines du formulaire"""
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(n):
+        payload = {field: rng.choice(values) for field, values in FORM_DOMAINS.items()}
+        payload["surface_habitable_logement"] = rng.randrange(10, 501, 5)
+        payload["hauteur_sous_plafond"] = round(rng.randrange(20, 51) / 10, 1)
+        payloads.append(payload)
+    return payloads
+
+
+def sample_conso_payloads(n: int, seed: int = 42) -> list:
+    """Logements du formulaire complétés de l'étiquette DPE prédite, comme envoyés à /predict_conso"""
+    rng = random.Random(seed)
+    payloads = sample_payloads(n, seed)
+    for payload in payloads:
+        payload["etiquette_dpe"] = rng.randrange(7)
+    return payloads
+
+
+def percentiles_ms(durations_s) -> dict:
+    """Résume une liste de durées (secondes) en p50/p99/max (millisecondes)"""
+    values = np.asarray(durations_s) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p99": round(float(np.percentile(values, 99)), 4),
+        "max": round(float(values.max()), 4),
+    }
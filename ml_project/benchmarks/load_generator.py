@@ -0,0 +1,379 @@
+"""Générateur de charge des APIs de prédiction, démarrées localement par APIManager
+
+Rejoue des logements réalistes (tirés des domaines du formulaire de
+views/prediction.py et de Data/historique_predictions.csv) sur les routes
+unitaires et batch, en boucle fermée (N clients qui renvoient une requête dès
+la réponse reçue) ou en boucle ouverte (arrivées à débit fixe, latence comptée
+depuis l'instant prévu d'envoi : une API saturée n'est pas masquée par des
+clients qui ralentissent). Le rapport JSON donne par route le débit, les
+latences p50/p95/p99/max, un histogramme et les taux d'erreur.
+
+Usage :
+  python benchmarks/load_generator.py run --mode closed --concurrency 8 --duration 30 --output base.json
+  python benchmarks/load_generator.py run --mode open --rate 200 --routes dpe conso full_batch
+  python benchmarks/load_generator.py compare base.json candidat.json [--threshold 0.10]
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+import bench_utils
+from bench_prefork import free_port
+
+bench_utils.use_project_dir()
+
+from api_manager import APIManager  # noqa: E402
+
+HISTORY_FILE = bench_utils.PROJECT_DIR / "Data" / "historique_predictions.csv"
+
+# Même correspondance indice -> classe que views/prediction.py
+CLASSES_DPE_MAPPING = ["G", "F", "E", "D", "C", "B", "A"]
+
+# Route -> (fichier de l'API qui la sert, chemin, requête batch ?)
+ROUTES = {
+    "dpe": ("API_Random_Forest.py", "/predict_dpe", False),
+    "conso": ("API_Lineaire_Reg.py", "/predict_conso", False),
+    "full": ("API_Random_Forest.py", "/predict_full", False),
+    "dpe_batch": ("API_Random_Forest.py", "/predict_dpe/batch", True),
+    "conso_batch": ("API_Lineaire_Reg.py", "/predict_conso/batch", True),
+    "full_batch": ("API_Random_Forest.py", "/predict_full/batch", True),
+}
+
+# Bornes (ms) des classes de l'histogramme de latence, la dernière classe est ouverte
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+FORM_FIELDS = list(bench_utils.FORM_DOMAINS) + ["surface_habitable_logement", "hauteur_sous_plafond"]
+
+
+# --- Logements rejoués ---
+
+def history_payloads(path=HISTORY_FILE):
+    """Logements de l'historique des prédictions, étiquette DPE prédite comprise"""
+    payloads = []
+    with open(path, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            payload = {field: row[field] for field in FORM_FIELDS if field in row}
+            for field in ("surface_habitable_logement", "hauteur_sous_plafond"):
+                payload[field] = float(payload[field])
+            if row.get("Classe_predite") in CLASSES_DPE_MAPPING:
+                payload["etiquette_dpe"] = CLASSES_DPE_MAPPING.index(row["Classe_predite"])
+            payloads.append(payload)
+    return payloads
+
+
+def build_payloads(n, history_ratio, seed):
+    """n logements : une part history_ratio tirée de l'historique, le reste des domaines du formulaire"""
+    rng = random.Random(seed)
+    form = bench_utils.sample_conso_payloads(n, seed)
+    history = history_payloads() if history_ratio > 0 else []
+    if not history:
+        return form
+    return [dict(rng.choice(history)) if rng.random() < history_ratio else payload for payload in form]
+
+
+# --- Mesures ---
+
+class RouteStats:
+    """Latences et statuts d'une route (mise à jour depuis plusieurs threads)"""
+
+    def __init__(self, rows_per_request):
+        self.rows_per_request = rows_per_request
+        self.latencies = []
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, latency_s, status):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == "200":
+                self.latencies.append(latency_s)
+
+    def report(self, duration_s):
+        latencies_ms = np.asarray(self.latencies) * 1000
+        n_requests = sum(self.statuses.values())
+        n_ok = len(latencies_ms)
+        report = {
+            "requests": n_requests,
+            "ok": n_ok,
+            "error_rate": round((n_requests - n_ok) / n_requests, 6) if n_requests else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+            "throughput_rps": round(n_ok / duration_s, 3),
+            "rows_per_s": round(n_ok * self.rows_per_request / duration_s, 3),
+        }
+        if n_ok:
+            report["latency_ms"] = {
+                "mean": round(float(latencies_ms.mean()), 4),
+                "p50": round(float(np.percentile(latencies_ms, 50)), 4),
+                "p95": round(float(np.percentile(latencies_ms, 95)), 4),
+                "p99": round(float(np.percentile(latencies_ms, 99)), 4),
+                "max": round(float(latencies_ms.max()), 4),
+            }
+            counts = np.bincount(np.searchsorted(HISTOGRAM_BOUNDS_MS, latencies_ms, side="right"),
+                                 minlength=len(HISTOGRAM_BOUNDS_MS) + 1)
+            labels = [f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"]
+            report["histogram_ms"] = dict(zip(labels, counts.tolist()))
+        return report
+
+
+class LoadRunner:
+    """Envoie les requêtes d'un scénario et relève leurs latences"""
+
+    def __init__(self, ports, routes, payloads, batch_size, timeout_s, seed):
+        self.urls = {route: f"http://127.0.0.1:{ports[ROUTES[route][0]]}{ROUTES[route][1]}" for route in routes}
+        self.routes = list(routes)
+        self.payloads = payloads
+        self.batch_size = batch_size
+        self.timeout_s = timeout_s
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {route: RouteStats(batch_size if ROUTES[route][2] else 1) for route in routes}
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def next_request(self):
+        """Route et corps de la prochaine requête (route tirée au hasard parmi celles du scénario)"""
+        with self._rng_lock:
+            route = self.rng.choice(self.routes)
+            if ROUTES[route][2]:
+                start = self.rng.randrange(len(self.payloads))
+                body = [self.payloads[(start + i) % len(self.payloads)] for i in range(self.batch_size)]
+            else:
+                body = self.rng.choice(self.payloads)
+        return route, body
+
+    def send(self, route, body, scheduled_at=None):
+        """Envoie une requête ; la latence part de scheduled_at (boucle ouverte) ou de l'envoi"""
+        start = time.perf_counter() if scheduled_at is None else scheduled_at
+        try:
+            status = str(self._session().post(self.urls[route], json=body, timeout=self.timeout_s).status_code)
+        except requests.exceptions.Timeout:
+            status = "timeout"
+        except requests.exceptions.RequestException:
+            status = "connection_error"
+        self.stats[route].record(time.perf_counter() - start, status)
+
+    def closed_loop(self, concurrency, duration_s):
+        stop_at = time.perf_counter() + duration_s
+
+        def client():
+            while time.perf_counter() < stop_at:
+                self.send(*self.next_request())
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def open_loop(self, rate, duration_s, arrival, max_in_flight):
+        """Arrivées à `rate` requêtes/s (intervalles constants ou exponentiels)"""
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            start = time.perf_counter()
+            scheduled = start
+            while scheduled < start + duration_s:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                route, body = self.next_request()
+                pool.submit(self.send, route, body, scheduled)
+                with self._rng_lock:
+                    gap = self.rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+                scheduled += gap
+
+    def reset(self):
+        self.stats = {route: RouteStats(stats.rows_per_request) for route, stats in self.stats.items()}
+
+
+# --- Exécution contre les APIs démarrées par APIManager ---
+
+def start_manager(api_workers, cache):
+    """APIManager sur des ports libres : la charge ne vise que les processus qu'il a lui-même démarrés"""
+    manager = APIManager()
+    ports = {}
+    for config in manager.api_configs:
+        config["port"] = ports[config["file"]] = free_port()
+        config["workers"] = api_workers
+        if not cache:
+            config.setdefault("env", {})["PREDICTION_CACHE_SIZE"] = "0"
+    processes = manager.start_apis()
+    if len(processes) != len(manager.api_configs):
+        manager.stop_apis()
+        raise SystemExit("Les APIs n'ont pas toutes démarré")
+    # Les logs des APIs (une ligne par requête) ne doivent pas peser sur la mesure
+    logging.getLogger("api_manager").setLevel(logging.WARNING)
+    return manager, ports
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=bench_utils.PROJECT_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    payloads = build_payloads(args.payloads, args.history_ratio, args.seed)
+    manager, ports = start_manager(args.api_workers, args.cache)
+    try:
+        runner = LoadRunner(ports, args.routes, payloads, args.batch_size, args.timeout, args.seed)
+        if args.warmup > 0:
+            runner.closed_loop(max(1, args.concurrency), args.warmup)
+            runner.reset()
+
+        start = time.perf_counter()
+        if args.mode == "closed":
+            runner.closed_loop(args.concurrency, args.duration)
+        else:
+            runner.open_loop(args.rate, args.duration, args.arrival, args.max_in_flight)
+        elapsed = time.perf_counter() - start
+    finally:
+        manager.stop_apis()
+
+    routes = {route: stats.report(elapsed) for route, stats in runner.stats.items()}
+    n_requests = sum(route["requests"] for route in routes.values())
+    n_ok = sum(route["ok"] for route in routes.values())
+    report = {
+        "scenario": {
+            "mode": args.mode, "routes": args.routes, "duration_s": args.duration,
+            "concurrency": args.concurrency if args.mode == "closed" else None,
+            "rate_rps": args.rate if args.mode == "open" else None,
+            "arrival": args.arrival if args.mode == "open" else None,
+            "batch_size": args.batch_size, "history_ratio": args.history_ratio,
+            "api_workers": args.api_workers, "prediction_cache": args.cache, "seed": args.seed,
+        },
+        "environment": {"git": git_revision(), "python": platform.python_version(), "cpus": os.cpu_count(),
+                        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "elapsed_s": round(elapsed, 3),
+        "total": {"requests": n_requests, "ok": n_ok,
+                  "error_rate": round((n_requests - n_ok) / n_requests, 6) if n_requests else 0.0,
+                  "throughput_rps": round(n_ok / elapsed, 3)},
+        "routes": routes,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return report
+
+
+# --- Comparaison de deux rapports ---
+
+def compare(baseline, candidate, threshold, min_delta_ms, max_error_rate_delta):
+    """Écarts par route ; une régression = latence ou débit dégradés au-delà du seuil, ou plus d'erreurs"""
+    results, regressions = {}, []
+    for route, base in baseline["routes"].items():
+        cand = candidate["routes"].get(route)
+        if cand is None:
+            continue
+        checks = {}
+        for key in ("p50", "p95", "p99", "max"):
+            before = base.get("latency_ms", {}).get(key)
+            after = cand.get("latency_ms", {}).get(key)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            # Le maximum (une seule requête) est trop bruité pour juger : il est donné à titre indicatif
+            regressed = key != "max" and change > threshold and after - before > min_delta_ms
+            checks[f"latency_{key}_ms"] = {"baseline": before, "candidate": after,
+                                          "change": round(change, 4), "regression": regressed}
+        before, after = base["throughput_rps"], cand["throughput_rps"]
+        change = (after - before) / before if before else 0.0
+        checks["throughput_rps"] = {"baseline": before, "candidate": after, "change": round(change, 4),
+                                    "regression": change < -threshold}
+        before, after = base["error_rate"], cand["error_rate"]
+        checks["error_rate"] = {"baseline": before, "candidate": after, "change": round(after - before, 6),
+                                "regression": after - before > max_error_rate_delta}
+        results[route] = checks
+        regressions += [f"{route}.{name}" for name, check in checks.items() if check["regression"]]
+    if baseline.get("scenario") != candidate.get("scenario"):
+        print("⚠️ Scénarios différents entre les deux rapports : comparaison indicative")
+    return {"threshold": threshold, "regressions": regressions, "routes": results}
+
+
+def run_compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    result = compare(baseline, candidate, args.threshold, args.min_delta_ms, args.max_error_rate_delta)
+
+    print(f"{'route':<12} | {'mesure':<16} | {'référence':>10} | {'candidat':>10} | {'écart':>8} |")
+    for route, checks in result["routes"].items():
+        for name, check in checks.items():
+            flag = "RÉGRESSION" if check["regression"] else ""
+            change = f"{check['change']:+.1%}" if name != "error_rate" else f"{check['change']:+.4f}"
+            print(f"{route:<12} | {name:<16} | {check['baseline']:>10} | {check['candidate']:>10} | "
+                  f"{change:>8} | {flag}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if result["regressions"]:
+        print(f"❌ {len(result['regressions'])} régression(s) : {', '.join(result['regressions'])}")
+        return 1
+    print("✅ Aucune régression")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Démarre les APIs et mesure un scénario de charge")
+    run_parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    run_parser.add_argument("--routes", nargs="+", choices=list(ROUTES), default=["dpe", "conso"])
+    run_parser.add_argument("--duration", type=float, default=20.0, help="Durée de la mesure (s)")
+    run_parser.add_argument("--warmup", type=float, default=3.0, help="Charge non mesurée avant la mesure (s)")
+    run_parser.add_argument("--concurrency", type=int, default=4, help="Clients en boucle fermée")
+    run_parser.add_argument("--rate", type=float, default=50.0, help="Requêtes/s en boucle ouverte")
+    run_parser.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson")
+    run_parser.add_argument("--max-in-flight", type=int, default=256, help="Requêtes simultanées max (ouverte)")
+    run_parser.add_argument("--batch-size", type=int, default=100, help="Logements par requête batch")
+    run_parser.add_argument("--payloads", type=int, default=5000, help="Logements distincts rejoués")
+    run_parser.add_argument("--history-ratio", type=float, default=0.3,
+                            help="Part des logements tirés de historique_predictions.csv")
+    run_parser.add_argument("--api-workers", type=int, default=1, help="Workers pre-fork par API")
+    run_parser.add_argument("--cache", action="store_true", help="Garde le cache de prédictions des APIs")
+    run_parser.add_argument("--timeout", type=float, default=30.0, help="Délai maximal par requête (s)")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", help="Fichier JSON du rapport")
+
+    compare_parser = commands.add_parser("compare", help="Compare deux rapports et signale les régressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Dégradation relative tolérée (latence, débit)")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                                help="Écart de latence absolu ignoré (bruit de mesure)")
+    compare_parser.add_argument("--max-error-rate-delta", type=float, default=0.001)
+    compare_parser.add_argument("--output", help="Fichier JSON de la comparaison")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        return run_compare(args)
+    if args.mode == "open" and args.rate <= 0:
+        parser.error("--rate doit être positif")
+    run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Scoring de masse d'un fichier Parquet de logements (DPE puis consommation), hors APIs.
+
+Les modèles sont chargés une seule fois, dans ce processus, puis partagés par fork
+avec les workers. Le Parquet est lu par lots (record batches) : chaque lot est
+encodé en colonnes (FeatureEncoder.encode_columns, comme les requêtes Arrow de
+/predict_full/batch), prédit, puis écrit par le worker lui-même dans un fichier
+du dossier de sortie. Au plus `2 x workers` lots sont en mémoire à un instant
+donné, quelle que soit la taille du fichier d'entrée.
+
+Colonnes ajoutées : prediction_DPE_index, classe_dpe_predite, conso_predite_kwh
+(null pour une ligne en erreur) et erreur.
+
+Usage : python bulk_score.py [Data/df_logements.parquet] [--output Data/predictions_logements]
+        [--batch-size 50000] [--workers N] [--keep id_logement ...] [--partition-by classe_dpe_predite]
+"""
+import argparse
+import functools
+import multiprocessing
+import os
+import pathlib
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import arrow_io
+from feature_spec import FORM_DOMAINS, Variable_Standardisee
+
+CURRENT_DIR = pathlib.Path(__file__).parent
+DEFAULT_INPUT = CURRENT_DIR / 'Data' / 'df_logements.parquet'
+DEFAULT_OUTPUT = CURRENT_DIR / 'Data' / 'predictions_logements'
+
+# Même correspondance indice -> classe que views/prediction.py
+CLASSES_DPE_MAPPING = ["G", "F", "E", "D", "C", "B", "A"]
+
+# Champs lus par les deux modèles
+MODEL_FIELDS = list(FORM_DOMAINS) + Variable_Standardisee
+
+# Colonnes ajoutées à chaque lot, dans l'ordre d'écriture
+PREDICTION_COLUMNS = ['prediction_DPE_index', 'classe_dpe_predite', 'conso_predite_kwh', 'erreur']
+# Colonnes ajoutées impropres au partitionnement (un dossier par valeur distincte)
+HIGH_CARDINALITY_COLUMNS = {'conso_predite_kwh': "valeur continue", 'erreur': "message libre"}
+
+# Étapes chronométrées dans chaque lot
+STAGES = ("read", "encode_dpe", "predict_dpe", "encode_conso", "predict_conso", "write")
+
+# Modèles chargés par load_models() avant la création des workers (hérités au fork)
+_models = None
+
+
+def load_models(workers):
+    """Charge les modèles DPE et consommation une fois pour tous les workers"""
+    global _models
+    import API_Random_Forest as dpe_api
+
+    dpe_api.dpe_loader.wait()
+    dpe_api.conso_api.conso_loader.wait()
+    for loader in (dpe_api.dpe_loader, dpe_api.conso_api.conso_loader):
+        if not loader.ready:
+            raise RuntimeError(f"Chargement des modèles impossible : {loader.snapshot()['error']}")
+    dpe_artifacts = dpe_api.dpe_artifacts
+    # Chaque worker occupe un cœur : pas de threads joblib concurrents dans la forêt
+    if workers > 1 and hasattr(dpe_artifacts.model, 'set_params'):
+        dpe_artifacts.model.set_params(n_jobs=1)
+    _models = (dpe_api, dpe_artifacts, dpe_api.conso_api.conso_artifacts)
+
+
+def score_batch(index, batch, output_dir, keep, partition_by):
+    """Prédit un lot et l'écrit dans le dossier de sortie ; renvoie ses statistiques"""
+    dpe_api, dpe_artifacts, conso_artifacts = _models
+    timings = {}
+    t_start = time.perf_counter()
+    table = pa.Table.from_batches([batch])
+    columns = arrow_io.table_columns(table.select([name for name in table.column_names if name in MODEL_FIELDS]))
+    timings["read"] = time.perf_counter() - t_start
+
+    n = table.num_rows
+    labels, valid_dpe, consos, valid, errors = dpe_api.predict_full_columns(
+        columns, n, dpe_artifacts, conso_artifacts, timings)
+
+    t_write = time.perf_counter()
+    classes = np.asarray(CLASSES_DPE_MAPPING)[np.clip(labels, 0, len(CLASSES_DPE_MAPPING) - 1)]
+    output = table.select(keep if keep is not None else table.column_names)
+    output = output.append_column('prediction_DPE_index', pa.array(labels, mask=~valid_dpe))
+    output = output.append_column('classe_dpe_predite',
+                                  pa.array(classes, mask=~valid_dpe).dictionary_encode())
+    output = output.append_column('conso_predite_kwh', pa.array(consos, mask=~valid))
+    output = output.append_column('erreur', arrow_io.error_column(errors, n))
+    if partition_by:
+        pq.write_to_dataset(output, output_dir, partition_cols=[partition_by],
+                            basename_template=f"part-{index:05d}-{{i}}.parquet")
+    else:
+        pq.write_table(output, os.path.join(output_dir, f"part-{index:05d}.parquet"))
+    timings["write"] = time.perf_counter() - t_write
+    return index, n, len(errors), timings
+
+
+def _run_inline(batches, score):
+    """Un seul worker : les lots sont prédits dans ce processus, sans pool"""
+    for index, batch in enumerate(batches):
+        yield score(index, batch)
+
+
+def _run_pool(batches, score, workers):
+    """Distribue les lots sur les workers, au plus 2 lots en vol par worker (mémoire bornée)"""
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        # Les workers sont forkés dès la première tâche, avant le début de la lecture
+        pool.submit(os.getpid).result()
+        pending = set()
+        for index, batch in enumerate(batches):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(score, index, batch))
+        for future in pending:
+            yield future.result()
+
+
+def check_partition_column(partition_by, output_columns, schema):
+    """Refuse une colonne de partition absente de la sortie ou à forte cardinalité"""
+    if partition_by not in output_columns:
+        raise SystemExit(f"Colonne de partition inconnue : {partition_by}")
+    reason = HIGH_CARDINALITY_COLUMNS.get(partition_by)
+    if reason is None and partition_by in schema.names and pa.types.is_floating(schema.field(partition_by).type):
+        reason = "colonne décimale"
+    if reason:
+        raise SystemExit(f"Colonne de partition à forte cardinalité ({reason}) : {partition_by}, "
+                         f"un dossier serait créé par valeur distincte")
+
+
+def run(input_path, output_dir, batch_size, workers, keep=None, partition_by=None, overwrite=False):
+    parquet = pq.ParquetFile(input_path)
+    total = parquet.metadata.num_rows
+    names = parquet.schema_arrow.names
+    missing = [field for field in MODEL_FIELDS if field not in names]
+    if missing:
+        print(f"⚠️ Colonnes absentes de {input_path} (traitées comme des champs absents) : {missing}")
+    unknown = [column for column in keep or [] if column not in names]
+    if unknown:
+        raise SystemExit(f"Colonnes à conserver introuvables : {unknown}")
+    output_columns = (names if keep is None else keep) + PREDICTION_COLUMNS
+    if partition_by:
+        check_partition_column(partition_by, output_columns, parquet.schema_arrow)
+
+    if os.path.exists(output_dir) and os.listdir(output_dir):
+        if not overwrite:
+            raise SystemExit(f"Le dossier {output_dir} n'est pas vide (--overwrite pour le remplacer)")
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print("📥 Chargement des modèles...")
+    t_load = time.perf_counter()
+    load_models(workers)
+    print(f"✅ Modèles chargés en {time.perf_counter() - t_load:.1f}s")
+
+    print(f"🚀 Scoring de {total:,} logements : lots de {batch_size:,}, {workers} worker(s)")
+    # Seules les colonnes utiles sont lues : champs des modèles et colonnes conservées
+    read_columns = [name for name in names if name in MODEL_FIELDS or keep is None or name in keep]
+    batches = parquet.iter_batches(batch_size=batch_size, columns=read_columns)
+
+    score = functools.partial(score_batch, output_dir=str(output_dir), keep=keep, partition_by=partition_by)
+    runner = _run_inline(batches, score) if workers == 1 else _run_pool(batches, score, workers)
+    t_start = time.perf_counter()
+    done_rows = n_errors = n_batches = 0
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    for index, n, batch_errors, timings in runner:
+        done_rows += n
+        n_errors += batch_errors
+        n_batches += 1
+        for stage, duration in timings.items():
+            stage_totals[stage] += duration
+        elapsed = time.perf_counter() - t_start
+        print(f"  lot {index:>5} : {done_rows:>12,}/{total:,} logements ({done_rows / max(total, 1):6.1%}), "
+              f"{done_rows / elapsed:,.0f} logements/s, {n_errors:,} en erreur", flush=True)
+
+    elapsed = time.perf_counter() - t_start
+    print(f"🎯 {done_rows:,} logements prédits en {elapsed:.1f}s ({done_rows / max(elapsed, 1e-9):,.0f} logements/s), "
+          f"{n_errors:,} en erreur, {n_batches} lot(s) écrits dans {output_dir}")
+    print("   Temps cumulé par étape (tous workers) : "
+          + ", ".join(f"{stage} {duration:.1f}s" for stage, duration in stage_totals.items()))
+    return {"rows": done_rows, "errors": n_errors, "batches": n_batches, "elapsed_s": elapsed,
+            "rows_per_s": done_rows / max(elapsed, 1e-9), "stages_s": stage_totals}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring de masse DPE + consommation d'un fichier Parquet")
+    parser.add_argument("input", nargs="?", default=str(DEFAULT_INPUT), help="Parquet des logements")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="Dossier Parquet de sortie")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Logements par lot")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processus de scoring")
+    parser.add_argument("--keep", nargs="*", default=None,
+                        help="Colonnes d'entrée recopiées en sortie (par défaut : toutes)")
+    parser.add_argument("--partition-by", default=None,
+                        help="Partitionne la sortie (dossiers colonne=valeur), ex. classe_dpe_predite")
+    parser.add_argument("--overwrite", action="store_true", help="Remplace un dossier de sortie non vide")
+    args = parser.parse_args(argv)
+    if args.batch_size <= 0 or args.workers <= 0:
+        parser.error("--batch-size et --workers doivent être positifs")
+    run(args.input, args.output, args.batch_size, args.workers, args.keep, args.partition_by, args.overwrite)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,415 @@
+"""Spécification déclarative des variables d'un modèle et encodeurs compilés.
+
+Une FeatureSpec décrit l'ordre des colonnes d'un modèle et la façon dont chaque
+champ d'un logement y est écrit : valeur numérique, code ordinal ou indicatrice.
+Elle se compile une fois (FeatureEncoder) : chaque champ et chaque modalité est
+résolu en indice de colonne, puis `encode` écrit un logement dans un buffer numpy
+et `encode_batch` remplit une matrice champ par champ, en signalant les lignes
+en erreur au lieu d'interrompre le lot. `encode_columns` reçoit un lot déjà en
+colonnes (ex. Arrow) : chaque modalité distincte est encodée une fois puis
+recopiée par indexation numpy, sans objet Python par ligne. Les chemins partagent
+les mêmes règles : une requête unitaire et la même ligne dans un lot donnent le
+même vecteur.
+"""
+import math
+import threading
+
+import numpy as np
+
+# Code d'une modalité ordinale inconnue (comme .map(mapping).fillna(-1))
+UNKNOWN_CODE = -1
+
+# Champ absent du logement (distinct de None, envoyé explicitement)
+MISSING = object()
+
+NON_NUMERIC_MESSAGE = "Valeur manquante ou non numerique dans les donnees."
+NOT_AN_OBJECT_MESSAGE = "Chaque logement doit etre un objet JSON."
+
+_NUMBER_TYPES = (int, float, bool)
+
+
+class Categories:
+    """Colonne textuelle codée : `values` (modalités distinctes) et `codes` (indice par ligne)"""
+
+    def __init__(self, values, codes):
+        self.values = list(values)
+        self.codes = np.asarray(codes, dtype=np.intp)
+
+
+class Numbers:
+    """Colonne numérique : valeurs float64 (NaN aux nulls) et masque des nulls.
+
+    `to_list` reconstruit les valeurs d'origine (entiers, None) pour les champs non numériques.
+    """
+
+    def __init__(self, values, nulls, to_list):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.nulls = np.asarray(nulls, dtype=bool)
+        self.to_list = to_list
+
+
+class _Compiled:
+    """Fonctions d'écriture d'un champ et colonnes qu'il écrit (`ones` : n'écrit que des 1)"""
+
+    def __init__(self, write, write_batch, indices, write_numbers=None, ones=False):
+        self.write = write
+        self.write_batch = write_batch
+        self.indices = indices
+        self.write_numbers = write_numbers
+        self.ones = ones
+
+
+def _add_errors(errors, rows, error):
+    for i in rows:
+        errors.setdefault(int(i), error)
+
+
+def error_message(error) -> str:
+    """Message renvoyé par les APIs pour une erreur d'encodage"""
+    if isinstance(error, KeyError):
+        return f"Cle manquante dans les donnees: {error}"
+    return str(error)
+
+
+class Numeric:
+    """Champ numérique copié dans la colonne du même nom.
+
+    default  : valeur d'un champ absent ; required : un champ absent lève KeyError.
+    nullable : None (ou NaN) devient NaN, imputé par le modèle, au lieu d'une erreur.
+    Les nombres en texte ("2.5") sont acceptés ; toute autre valeur, ou un infini,
+    lève ValueError.
+    """
+
+    def __init__(self, field, default=0.0, required=False, nullable=False):
+        self.field = field
+        self.default = float(default)
+        self.required = required
+        self.nullable = nullable
+
+    def parse(self, value) -> float:
+        if value is None:
+            if self.nullable:
+                return math.nan
+            raise ValueError(NON_NUMERIC_MESSAGE)
+        if type(value) in _NUMBER_TYPES:
+            number = float(value)
+            if math.isnan(number) and self.nullable:
+                return number
+        elif isinstance(value, str):
+            try:
+                number = float(value)
+            except ValueError:
+                raise ValueError(NON_NUMERIC_MESSAGE) from None
+        else:
+            raise ValueError(NON_NUMERIC_MESSAGE)
+        if not math.isfinite(number):
+            raise ValueError(NON_NUMERIC_MESSAGE)
+        return number
+
+    def compile(self, column_index):
+        index = column_index[self.field]
+
+        def write(data, row):
+            value = data.get(self.field, MISSING)
+            if value is MISSING:
+                if self.required:
+                    raise KeyError(self.field)
+                row[index] = self.default
+            else:
+                row[index] = self.parse(value)
+
+        def write_batch(values, X, errors):
+            column = X[:, index]
+            # Cas courant : que des nombres finis, copiés en une fois
+            if all(type(value) is float or type(value) is int for value in values):
+                column[:] = values
+                if np.isfinite(column).all():
+                    return
+            for i, value in enumerate(values):
+                if value is MISSING:
+                    if self.required:
+                        errors.setdefault(i, KeyError(self.field))
+                    column[i] = self.default
+                    continue
+                try:
+                    column[i] = self.parse(value)
+                except ValueError as e:
+                    errors.setdefault(i, e)
+
+        def write_numbers(column, X, errors):
+            values = column.values
+            bad = np.isinf(values) if self.nullable else ~np.isfinite(values)
+            X[:, index] = np.where(bad, 0.0, values)
+            _add_errors(errors, np.flatnonzero(bad), ValueError(NON_NUMERIC_MESSAGE))
+
+        return _Compiled(write, write_batch, [index], write_numbers)
+
+
+class Passthrough:
+    """Champs numériques copiés tels quels dans la colonne de même nom (comportement de get_dummies).
+
+    Seuls les nombres sont copiés : texte, None ou champ absent laissent la colonne à 0,
+    NaN est conservé.
+    """
+
+    # Pas de champ unique : write_batch reçoit les logements entiers
+    field = None
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+
+    def compile(self, column_index):
+        indices = {column: column_index[column] for column in self.columns}
+
+        def write(data, row):
+            for field, value in data.items():
+                index = indices.get(field)
+                if index is not None and type(value) in _NUMBER_TYPES:
+                    row[index] = value
+
+        def write_batch(records, X, errors):
+            present = set().union(*records) if records else set()
+            for field in present.intersection(indices):
+                values = [record.get(field) for record in records]
+                if not all(type(value) is float or type(value) is int for value in values):
+                    values = [value if type(value) in _NUMBER_TYPES else 0.0 for value in values]
+                X[:, indices[field]] = values
+
+        def write_columns(columns, X, errors):
+            # Seules les colonnes numériques sont copiées (nulls -> 0, NaN conservé)
+            for field, column in columns.items():
+                if field in indices and isinstance(column, Numbers):
+                    X[:, indices[field]] = np.where(column.nulls, 0.0, column.values)
+
+        return _Compiled(write, write_batch, list(indices.values()), write_columns)
+
+
+class Ordinal:
+    """Champ catégoriel ordonné {modalité: code} ; un champ absent lève KeyError.
+
+    unknown : code d'une modalité inconnue, ou None pour lever KeyError(modalité).
+    """
+
+    def __init__(self, field, mapping, unknown=UNKNOWN_CODE):
+        self.field = field
+        self.mapping = dict(mapping)
+        self.unknown = unknown
+
+    @classmethod
+    def from_categories(cls, field, categories, **kwargs):
+        return cls(field, {category: code for code, category in enumerate(categories)}, **kwargs)
+
+    def accepts(self, value) -> bool:
+        return value in self.mapping
+
+    def code(self, value):
+        code = self.mapping.get(value) if type(value) is str else None
+        if code is not None:
+            return code
+        if self.unknown is None:
+            raise KeyError(value)
+        return self.unknown
+
+    def compile(self, column_index):
+        # Colonne absente du modèle : le champ reste obligatoire mais n'est pas écrit
+        index = column_index.get(self.field)
+
+        def write(data, row):
+            code = self.code(data[self.field])
+            if index is not None:
+                row[index] = code
+
+        def write_batch(values, X, errors):
+            get = self.mapping.get
+            codes = [get(value) if type(value) is str else None for value in values]
+            # Seules les modalités inconnues et les champs absents repassent par le chemin unitaire
+            for i in [i for i, code in enumerate(codes) if code is None]:
+                codes[i] = 0
+                try:
+                    if values[i] is MISSING:
+                        raise KeyError(self.field)
+                    codes[i] = self.code(values[i])
+                except KeyError as e:
+                    errors.setdefault(i, e)
+            if index is not None:
+                X[:, index] = codes
+
+        return _Compiled(write, write_batch, [] if index is None else [index])
+
+
+class OneHot:
+    """Champ catégoriel vers indicatrices {modalité: colonne}.
+
+    key    : normalisation de la valeur reçue avant la recherche de sa colonne.
+    strict : une valeur non textuelle lève ValueError au lieu d'être ignorée.
+    Une modalité sans colonne (modalité de référence, orthographe différente) laisse tout à 0.
+    """
+
+    def __init__(self, field, columns, key=None, strict=False):
+        self.field = field
+        self.columns = dict(columns)
+        self.key = key
+        self.strict = strict
+
+    @classmethod
+    def from_columns(cls, field, feature_columns, **kwargs):
+        """Indicatrices "champ_modalité" présentes dans les colonnes du modèle"""
+        prefix = f"{field}_"
+        columns = {column[len(prefix):]: column for column in feature_columns if column.startswith(prefix)}
+        return cls(field, columns, **kwargs)
+
+    def accepts(self, value) -> bool:
+        return (self.key(value) if self.key else value) in self.columns
+
+    def compile(self, column_index):
+        lookup = {value: column_index[column] for value, column in self.columns.items()}
+        key = self.key
+
+        def column_of(value):
+            if type(value) is not str:
+                if self.strict and value is not MISSING:
+                    raise ValueError(f"Valeur invalide pour {self.field}: {value!r}")
+                return None
+            return lookup.get(key(value) if key else value)
+
+        def write(data, row):
+            index = column_of(data.get(self.field, MISSING))
+            if index is not None:
+                row[index] = 1.0
+
+        def write_batch(values, X, errors):
+            get = lookup.get
+            if key:
+                indices = [get(key(value)) if type(value) is str else None for value in values]
+            else:
+                indices = [get(value) if type(value) is str else None for value in values]
+            if self.strict:
+                for i, value in enumerate(values):
+                    if type(value) is not str and value is not MISSING:
+                        errors.setdefault(i, ValueError(f"Valeur invalide pour {self.field}: {value!r}"))
+            rows = [i for i, index in enumerate(indices) if index is not None]
+            X[rows, [indices[i] for i in rows]] = 1.0
+
+        return _Compiled(write, write_batch, sorted(set(lookup.values())), ones=True)
+
+
+class FeatureSpec:
+    """Colonnes d'un modèle et règles d'écriture de chaque champ, appliquées dans l'ordre.
+
+    Les colonnes sans champ déclaré restent à 0 ; à colonne partagée, le dernier champ l'emporte.
+    """
+
+    def __init__(self, name, columns, fields):
+        self.name = name
+        self.columns = list(columns)
+        self.fields = list(fields)
+
+    def compile(self):
+        return FeatureEncoder(self)
+
+    def drift(self, domains) -> dict:
+        """Valeurs de `domains` ({champ: modalités}) sans effet sur le modèle : {champ: [modalités]}"""
+        report = {}
+        for field in self.fields:
+            values = domains.get(field.field, ())
+            unmatched = [value for value in values if hasattr(field, 'accepts') and not field.accepts(value)]
+            if unmatched:
+                report[field.field] = unmatched
+        return report
+
+
+class FeatureEncoder:
+    """FeatureSpec compilée en fonctions d'écriture, pour un logement ou un lot"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.feature_columns = spec.columns
+        self.n_features = len(spec.columns)
+        self.column_index = {column: i for i, column in enumerate(spec.columns)}
+        self._compiled = [(field.field, field.compile(self.column_index)) for field in spec.fields]
+        self._writers = [compiled.write for _, compiled in self._compiled]
+        self._local = threading.local()
+
+    def _row_buffer(self):
+        """Buffer (1, n_features) réutilisé d'une requête à l'autre, propre à chaque thread"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.zeros((1, self.n_features), dtype=np.float64)
+            self._local.buffer = buffer
+        else:
+            buffer.fill(0.0)
+        return buffer
+
+    def encode(self, data):
+        """Encode un logement dans le buffer du thread courant et le retourne (vue (1, n_features)).
+
+        Lève KeyError (champ ou modalité manquante) ou ValueError (valeur invalide).
+        Le buffer est réécrit au prochain appel sur le même thread : l'utiliser avant.
+        """
+        buffer = self._row_buffer()
+        row = buffer[0]
+        for write in self._writers:
+            write(data, row)
+        return buffer
+
+    def encode_batch(self, records):
+        """Encode un lot en une matrice (n, n_features).
+
+        Renvoie la matrice et les erreurs par ligne {indice: exception} ; seule la
+        première erreur d'une ligne est gardée et ses valeurs ne sont pas à utiliser.
+        """
+        n = len(records)
+        X = np.zeros((n, self.n_features), dtype=np.float64)
+        errors = {}
+        rows = []
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors[i] = ValueError(NOT_AN_OBJECT_MESSAGE)
+                record = {}
+            rows.append(record)
+
+        for field, compiled in self._compiled:
+            if field is None:
+                compiled.write_batch(rows, X, errors)
+            else:
+                compiled.write_batch([row.get(field, MISSING) for row in rows], X, errors)
+        return X, errors
+
+    def encode_columns(self, columns, n):
+        """Encode un lot de `n` logements fourni en colonnes {champ: Categories | Numbers | liste}.
+
+        Même résultat que encode_batch sur les logements correspondants (champ absent du
+        dict : absent de tous les logements, null : None). Renvoie la matrice et les erreurs.
+        """
+        X = np.zeros((n, self.n_features), dtype=np.float64)
+        errors = {}
+        for field, compiled in self._compiled:
+            if field is None:
+                compiled.write_numbers(columns, X, errors)
+                continue
+            column = columns.get(field)
+            if column is None:
+                column = Categories([MISSING], np.zeros(n, dtype=np.intp))
+            if isinstance(column, Categories):
+                self._write_categories(compiled, column, X, errors)
+            elif isinstance(column, Numbers) and compiled.write_numbers is not None:
+                compiled.write_numbers(column, X, errors)
+            else:
+                values = column.to_list() if isinstance(column, Numbers) else column
+                compiled.write_batch(values, X, errors)
+        return X, errors
+
+    def _write_categories(self, compiled, column, X, errors):
+        """Encode chaque modalité distincte une fois, puis recopie sa ligne sur les lignes qui la portent"""
+        scratch = np.zeros((len(column.values), self.n_features), dtype=np.float64)
+        category_errors = {}
+        compiled.write_batch(column.values, scratch, category_errors)
+        if compiled.indices:
+            block = scratch[:, compiled.indices][column.codes]
+            if compiled.ones:
+                # Indicatrices : les 1 s'ajoutent aux valeurs déjà écrites (cf. Passthrough)
+                X[:, compiled.indices] = np.where(block == 1.0, 1.0, X[:, compiled.indices])
+            else:
+                X[:, compiled.indices] = block
+        for code, error in category_errors.items():
+            _add_errors(errors, np.flatnonzero(column.codes == code), error)
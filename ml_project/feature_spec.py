@@ -0,0 +1,133 @@
+"""Variables des deux modèles, déclarées une seule fois (cf. feature_encoders).
+
+Les APIs, les benchmarks et les traitements de masse compilent ces spécifications
+au lieu de recoder leur pré-traitement. Les vocabulaires propres à chaque modèle
+sont conservés tels qu'ils ont servi jusqu'ici (les modèles en production en
+dépendent) ; `drift_report` liste les valeurs du formulaire qu'un modèle ne
+reconnaît pas, par exemple 'très bonne' pour le modèle DPE qui attend 'tres bonne'.
+"""
+from feature_encoders import FeatureSpec, Numeric, OneHot, Ordinal, Passthrough
+
+# Domaines des champs du formulaire de views/prediction.py
+FORM_DOMAINS = {
+    "periode_construction": [
+        "avant 1948", "1948-1974", "1975-1977", "1978-1982", "1983-1988",
+        "1989-2000", "2001-2005", "2006-2012", "2013-2021", "après 2021"
+    ],
+    "nombre_appartement_cat": [
+        "Maison(Unitaire ou 2 à 3 logements)",
+        "Petit Collectif(4 à 9 logements)",
+        "Moyen Collectif(10 à 30 logements)",
+        "Grand Collectif(> 30 logements)"
+    ],
+    "type_energie_n1": [
+        "Gaz naturel", "Électricité", "Réseau de chauffage urbain",
+        "Bois et biomasse", "Fioul", "Gaz (GPL/Propane/Butane)", "Charbon"
+    ],
+    "type_energie_principale_chauffage": [
+        "Gaz naturel", "Électricité", "Réseau de chauffage urbain",
+        "Bois et biomasse", "Fioul", "Gaz (GPL/Propane/Butane)", "Charbon"
+    ],
+    "qualite_isolation_murs": ["Insuffisante", "Moyenne", "bonne", "très bonne"],
+    "logement": ["Neuf", "Ancien"],
+}
+
+# ----------------------------------------------------
+# MODÈLE DPE (colonnes lues dans feature_columns_final.pkl)
+# ----------------------------------------------------
+
+ORDINAL_CATEGORIES = {
+    'qualite_isolation_murs': ['Insuffisante', 'Moyenne', 'bonne', 'tres bonne'],
+    'nombre_appartement_cat': [
+        'Maison(Unitaire ou 2 à 3 logements)',
+        'Petit Collectif(4 à 9 logements)',
+        'Moyen Collectif(10 à 30 logements)',
+        'Grand Collectif(> 30 logements)'
+    ]
+}
+
+# Champs textuels passés par pd.get_dummies : indicatrices "champ_modalité" du modèle
+DPE_ONE_HOT_FIELDS = ['type_batiment', 'type_energie_principale_chauffage', 'type_energie_n1', 'logement']
+
+
+def dpe_feature_spec(feature_columns) -> FeatureSpec:
+    """Pré-traitement historique du modèle DPE : ordinaux (modalité inconnue -> -1),
+    puis get_dummies et alignement sur FEATURE_COLUMNS"""
+    ordinals = [Ordinal.from_categories(field, categories) for field, categories in ORDINAL_CATEGORIES.items()]
+    # get_dummies conserve les colonnes numériques : tout nombre nommé comme une colonne y est copié,
+    # puis les indicatrices sont écrites
+    numeric_columns = [column for column in feature_columns if column not in ORDINAL_CATEGORIES]
+    one_hots = [OneHot.from_columns(field, feature_columns) for field in DPE_ONE_HOT_FIELDS]
+    return FeatureSpec('DPE', feature_columns, ordinals + [Passthrough(numeric_columns)] + one_hots)
+
+# ----------------------------------------------------
+# MODÈLE DE CONSOMMATION (régression linéaire)
+# ----------------------------------------------------
+
+# Variables numériques à standardiser
+Variable_Standardisee = ['hauteur_sous_plafond', 'surface_habitable_logement']
+
+# Variables OHE/booléennes (celles qui sont 0/1 ou encodées)
+Data_OHE_Boolean = [
+    'qualite_isolation_murs', 'etiquette_dpe', 'periode_construction', 'nombre_appartement_cat', 'type_batiment_immeuble',
+    'type_batiment_maison', 'type_energie_principale_chauffage_Charbon', 'type_energie_principale_chauffage_Fioul',
+    'type_energie_principale_chauffage_Gaz (GPL/Propane/Butane)', 'type_energie_principale_chauffage_Gaz naturel',
+    'type_energie_principale_chauffage_Réseau de chauffage urbain', 'type_energie_principale_chauffage_Électricité',
+    'type_energie_n1_Charbon', 'type_energie_n1_Fioul', 'type_energie_n1_Gaz (GPL/Propane/Butane)',
+    'type_energie_n1_Gaz naturel', 'type_energie_n1_Réseau de chauffage urbain', 'type_energie_n1_Électricité', 'logement_neuf'
+]
+
+All_Data = Variable_Standardisee + Data_OHE_Boolean
+
+Qualite_Isolation_Mapping = {
+    'Insuffisante': 0,
+    'Moyenne': 1,
+    'bonne': 2,
+    'très bonne': 3
+}
+
+Periode_Construction_Mapping = {
+    "avant 1948": 0, "1948-1974": 1, "1975-1977": 2, "1978-1982": 3,
+    "1983-1988": 4, "1989-2000": 5, "2001-2005": 6, "2006-2012": 7,
+    "2013-2021": 8, "après 2021": 9
+}
+
+Nombre_App_Mapping = {
+    "Maison(Unitaire ou 2 à 3 logements)": 0,
+    "Petit Collectif(4 à 9 logements)": 1,
+    "Moyen Collectif(10 à 30 logements)": 2,
+    "Grand Collectif(> 30 logements)": 3
+}
+
+# Blocs OHE des energies
+Energie_Prefixes = ['type_energie_principale_chauffage', 'type_energie_n1']
+
+
+def energie_key(value):
+    """Clé historique f'{prefix}_{energie}'.replace(' ', '_') : seules les colonnes sans espace
+    (Charbon, Fioul, Électricité) peuvent correspondre, les autres énergies restent à 0"""
+    return value.strip().replace(' ', '_')
+
+
+def conso_feature_spec() -> FeatureSpec:
+    """Pré-traitement du modèle de consommation, dans l'ordre All_Data (type_batiment_* reste à 0).
+
+    L'ordre des champs fixe l'erreur signalée quand un logement en cumule plusieurs.
+    """
+    fields = [
+        Ordinal('qualite_isolation_murs', Qualite_Isolation_Mapping, unknown=None),
+        Ordinal('periode_construction', Periode_Construction_Mapping, unknown=None),
+        Ordinal('nombre_appartement_cat', Nombre_App_Mapping, unknown=None),
+        # Étiquette DPE prédite par l'API 5001
+        Numeric('etiquette_dpe', required=True),
+        OneHot('logement', {'Neuf': 'logement_neuf'}),
+    ]
+    fields += [OneHot.from_columns(prefix, All_Data, key=energie_key, strict=True) for prefix in Energie_Prefixes]
+    # Variables standardisées : absentes -> 0, None -> NaN (imputé)
+    fields += [Numeric(feature, nullable=True) for feature in Variable_Standardisee]
+    return FeatureSpec('consommation', All_Data, fields)
+
+
+def drift_report(spec) -> dict:
+    """Valeurs du formulaire sans effet sur le modèle de `spec` : {champ: [modalités]}"""
+    return spec.drift(FORM_DOMAINS)
@@ -0,0 +1,215 @@
+"""Moteur d'inférence à plat pour la forêt aléatoire DPE.
+
+Les arbres d'un RandomForestClassifier entraîné sont concaténés dans des tableaux
+contigus (feature, seuil float32, décalage des enfants, distribution des classes aux feuilles),
+puis parcourus de façon vectorisée avec NumPy pour tous les logements et tous
+les arbres à la fois, sans la validation ni le dispatch joblib de model.predict.
+
+Usage (export) : python forest_engine.py [--mmap] [modele.joblib] [sortie.joblib]
+"""
+import os
+import sys
+import numpy as np
+from joblib import dump, load
+
+ARRAY_FIELDS = (
+    'feature', 'threshold', 'children', 'missing_left',
+    'leaf_index', 'leaf_values', 'roots', 'classes'
+)
+
+
+class FlatForest:
+    """Forêt aléatoire exportée en tableaux contigus, prédictions identiques à sklearn.
+
+    Les deux enfants d'un noeud interne sont rangés côte à côte : l'enfant droit
+    est toujours children[noeud] + 1, ce qui évite un accès mémoire par niveau.
+    """
+
+    def __init__(self, feature, threshold, children, missing_left,
+                 leaf_index, leaf_values, roots, classes, n_features):
+        self.feature = feature            # int32 (n_noeuds,)   variable testée
+        self.threshold = threshold        # float32 (n_noeuds,) seuil "x <= seuil"
+        self.children = children          # int32 (n_noeuds,)   enfant gauche (indice global), droit = +1
+        self.missing_left = missing_left  # bool (n_noeuds,)    NaN envoyés à gauche
+        self.leaf_index = leaf_index      # int32 (n_noeuds,)   ligne dans leaf_values, -1 si noeud interne
+        self.leaf_values = leaf_values    # float64 (n_feuilles, n_classes) probabilités par feuille
+        self.roots = roots                # int32 (n_arbres,)   racine de chaque arbre
+        self.classes = classes
+        self.classes_ = classes
+        self.n_features = int(n_features)
+        self.n_trees = len(roots)
+        self.has_missing_left = bool(missing_left.any())
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Exporte un RandomForestClassifier (mono-sortie) entraîné"""
+        features, thresholds, children, missing = [], [], [], []
+        leaf_indexes, leaf_values, roots = [], [], []
+        node_offset = 0
+        leaf_offset = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            internal = tree.children_left != -1
+
+            # Renumérotation : racine en 0, puis les enfants du k-ième noeud interne en 2k+1 et 2k+2
+            pair_start = 1 + 2 * np.arange(internal.sum())
+            new_id = np.empty(n_nodes, dtype=np.int64)
+            new_id[0] = 0
+            new_id[tree.children_left[internal]] = pair_start
+            new_id[tree.children_right[internal]] = pair_start + 1
+
+            def relayout(values):
+                out = np.empty_like(values)
+                out[new_id] = values
+                return out
+
+            # sklearn compare x (float32) au seuil float64 : on garde le plus grand
+            # float32 <= seuil pour que "x <= seuil" donne exactement le même résultat
+            threshold = tree.threshold.astype(np.float32)
+            too_high = threshold.astype(np.float64) > tree.threshold
+            threshold[too_high] = np.nextafter(threshold[too_high], np.float32(-np.inf))
+
+            child = np.full(n_nodes, -1, dtype=np.int64)
+            child[internal] = pair_start + node_offset
+
+            is_leaf = relayout(~internal)
+            leaf_index = np.full(n_nodes, -1, dtype=np.int32)
+            leaf_index[is_leaf] = leaf_offset + np.arange(is_leaf.sum(), dtype=np.int32)
+
+            # Même normalisation que DecisionTreeClassifier.predict_proba
+            values = relayout(tree.value[:, 0, :forest.n_classes_].astype(np.float64))[is_leaf]
+            normalizer = values.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values /= normalizer
+
+            missing_go_to_left = getattr(tree, 'missing_go_to_left', np.zeros(n_nodes, dtype=np.uint8))
+
+            roots.append(node_offset)
+            features.append(relayout(np.where(internal, tree.feature, 0)))
+            thresholds.append(relayout(np.where(internal, threshold, np.float32(0))))
+            children.append(relayout(child))
+            missing.append(relayout(internal & (missing_go_to_left != 0)))
+            leaf_indexes.append(leaf_index)
+            leaf_values.append(values)
+
+            node_offset += n_nodes
+            leaf_offset += int(is_leaf.sum())
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float32),
+            children=np.concatenate(children).astype(np.int32),
+            missing_left=np.concatenate(missing),
+            leaf_index=np.concatenate(leaf_indexes),
+            leaf_values=np.concatenate(leaf_values),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=np.asarray(forest.classes_),
+            n_features=forest.n_features_in_,
+        )
+
+    def to_arrays(self) -> dict:
+        """Tableaux à sauvegarder (joblib) pour recharger la forêt sans sklearn"""
+        arrays = {name: getattr(self, name) for name in ARRAY_FIELDS}
+        arrays['n_features'] = self.n_features
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict):
+        return cls(**{name: arrays[name] for name in ARRAY_FIELDS}, n_features=arrays['n_features'])
+
+    def apply(self, X):
+        """Indice (dans leaf_values) de la feuille atteinte par chaque logement dans chaque arbre"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X doit avoir {self.n_features} colonnes, recu {X.shape}")
+
+        n_rows = X.shape[0]
+        X_flat = X.ravel()
+
+        # Un couple (arbre, logement) par position, rangés arbre par arbre pour rester
+        # dans les mêmes noeuds en mémoire ; seuls les couples encore sur un noeud
+        # interne avancent, ce qui suit la profondeur réelle de chaque branche
+        node = np.repeat(self.roots, n_rows)
+        row_offset = np.tile(np.arange(n_rows, dtype=np.int32) * self.n_features, self.n_trees)
+        active = np.flatnonzero(self.leaf_index[node] < 0)
+
+        while active.size:
+            current = node[active]
+            x = X_flat[row_offset[active] + self.feature[current]]
+            # NaN : "x <= seuil" est faux, donc à droite sauf si le noeud les envoie à gauche
+            go_right = ~(x <= self.threshold[current])
+            if self.has_missing_left:
+                go_right &= ~(np.isnan(x) & self.missing_left[current])
+            current = self.children[current] + go_right
+            node[active] = current
+            active = active[self.leaf_index[current] < 0]
+
+        return self.leaf_index[node].reshape(self.n_trees, n_rows).T
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.leaf_values.shape[1]), dtype=np.float64)
+        # Accumulation arbre par arbre, dans l'ordre, comme RandomForestClassifier
+        for t in range(self.n_trees):
+            proba += self.leaf_values[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def export_forest(forest, path, compress=3):
+    """Exporte un RandomForestClassifier entraîné vers un fichier de tableaux joblib"""
+    flat = FlatForest.from_sklearn(forest)
+    dump(flat.to_arrays(), path, compress=compress)
+    return flat
+
+
+def export_mmap_artifact(forest, feature_columns, path):
+    """Exporte la forêt et ses colonnes sans compression, pour un chargement en mmap_mode='r'.
+
+    Les tableaux restent alors dans le cache de pages du système, partagé par
+    tous les processus qui servent /predict_dpe, au lieu d'être décompressés
+    dans la mémoire privée de chacun.
+    """
+    flat = FlatForest.from_sklearn(forest)
+    arrays = flat.to_arrays()
+    arrays['feature_columns'] = np.asarray(list(feature_columns), dtype=str)
+
+    # Écriture dans un fichier temporaire puis renommage atomique : un processus
+    # qui charge l'artefact pendant l'export ne voit jamais un fichier partiel
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    dump(arrays, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+    return flat
+
+
+def load_flat_forest(path, mmap_mode=None):
+    return FlatForest.from_arrays(load(path, mmap_mode=mmap_mode))
+
+
+if __name__ == '__main__':
+    import argparse
+    import pickle
+
+    parser = argparse.ArgumentParser(description="Export de la forêt DPE en tableaux plats")
+    parser.add_argument('model_file', nargs='?', default='random_forest_dpe_final_weighted.joblib')
+    parser.add_argument('flat_file', nargs='?')
+    parser.add_argument('--mmap', action='store_true',
+                        help="artefact non compressé (forêt + colonnes) pour mmap_mode='r'")
+    parser.add_argument('--columns', default='feature_columns_final.pkl')
+    args = parser.parse_args()
+
+    suffix = '.mmap.joblib' if args.mmap else '.flat.joblib'
+    flat_file = args.flat_file or args.model_file.replace('.joblib', suffix)
+
+    print(f"Export de {args.model_file} vers {flat_file}...")
+    if args.mmap:
+        with open(args.columns, 'rb') as f:
+            flat = export_mmap_artifact(load(args.model_file), pickle.load(f), flat_file)
+    else:
+        flat = export_forest(load(args.model_file), flat_file)
+    print(f"{flat.n_trees} arbres, {len(flat.feature)} noeuds, {len(flat.leaf_values)} feuilles exportes")
@@ -0,0 +1,73 @@
+"""Scoreur linéaire fusionné pour l'API de consommation.
+
+L'imputation (SimpleImputer), la standardisation (StandardScaler) et la
+régression (LinearRegression) sont toutes affines sur les variables numériques :
+elles se replient en un seul vecteur de poids, une constante et les valeurs
+d'imputation. Une requête devient un produit scalaire, un lot un produit
+matrice-vecteur, sans DataFrame ni validation sklearn à chaque appel.
+"""
+import numpy as np
+
+
+class FusedLinearScorer:
+    """imputer -> scaler (n_standard premières colonnes) -> hstack -> LinearRegression, replié"""
+
+    def __init__(self, coef, intercept, fill_values):
+        self.coef = coef                  # float64 (n_features,) poids sur les valeurs brutes
+        self.intercept = intercept        # float   constante
+        self.fill_values = fill_values    # float64 (n_standard,) valeurs d'imputation des NaN
+        self.n_standard = len(fill_values)
+        self.n_features = len(coef)
+
+    @classmethod
+    def from_pipeline(cls, imputer, scaler, model, n_standard):
+        """Replie des estimateurs sklearn entraînés ; ValueError si la configuration n'est pas affine"""
+        if getattr(imputer, 'add_indicator', False):
+            raise ValueError("Imputer avec indicateurs de valeurs manquantes non supporte")
+        fill_values = np.asarray(imputer.statistics_, dtype=np.float64)
+        if fill_values.shape != (n_standard,) or np.isnan(fill_values).any():
+            raise ValueError("Valeurs d'imputation absentes ou de taille inattendue")
+
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        intercept = float(np.asarray(model.intercept_, dtype=np.float64))
+        if coef.ndim != 1:
+            raise ValueError("Regression multi-sorties non supportee")
+
+        # (x - mean) / scale * w  =  x * (w / scale) - mean * w / scale
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_standard)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_standard)
+        fused = coef.copy()
+        fused[:n_standard] = coef[:n_standard] / scale
+        intercept -= float(np.dot(mean, fused[:n_standard]))
+
+        return cls(fused, intercept, fill_values)
+
+    def predict(self, X):
+        """Prédictions pour une matrice de valeurs brutes (NaN imputés sur les n_standard premières colonnes)"""
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X doit avoir {self.n_features} colonnes, recu {X.shape}")
+
+        standard = X[:, :self.n_standard]
+        missing = np.isnan(standard)
+        if missing.any():
+            standard[missing] = np.broadcast_to(self.fill_values, standard.shape)[missing]
+
+        # Comme sklearn : une valeur manquante hors imputation (ou infinie) est une erreur
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+        return X @ self.coef + self.intercept
+
+    def max_abs_error(self, reference_predict, X) -> float:
+        """Écart maximal avec le pipeline sklearn d'origine sur la matrice X"""
+        return float(np.max(np.abs(self.predict(X) - reference_predict(X))))
+
+
+def validation_matrix(n_standard, n_features, n_rows=512, seed=0):
+    """Lignes de contrôle : numériques positives (avec NaN) puis indicatrices/ordinaux entiers"""
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, n_features), dtype=np.float64)
+    X[:, :n_standard] = rng.uniform(1.0, 500.0, size=(n_rows, n_standard))
+    X[:, :n_standard][rng.random((n_rows, n_standard)) < 0.1] = np.nan
+    X[:, n_standard:] = rng.integers(0, 10, size=(n_rows, n_features - n_standard))
+    return X
@@ -0,0 +1,207 @@
+"""Collecte des sorties stdout/stderr des APIs lancées par APIManager.
+
+Un seul thread lit les pipes de toutes les APIs à l'aide d'un selector (lectures non
+bloquantes par blocs) : une API qui écrit beaucoup (journal d'accès, traces
+d'erreurs) n'est jamais bloquée sur un pipe plein. Chaque ligne devient un
+enregistrement :
+- ligne JSON objet (format d'api_logging : {"t": ..., "level": "warning",
+  "message": "...", ...}) : horodatage, niveau, message et champs repris tels quels ;
+- autre ligne : message brut, niveau INFO, horodaté à la lecture.
+Les enregistrements en attente sont transmis au journal par lots (toutes les
+`flush_interval` secondes ou `max_batch` lignes, un seul passage du verrou) mais
+chacun reste un LogRecord distinct, avec son horodatage d'origine et les
+attributs `api` et `stream`. Les `buffer_lines` derniers de chaque API sont
+conservés pour APIManager.get_status.
+
+Sans selector sur les pipes (Windows), un thread par flux alimente le même traitement.
+"""
+import collections
+import json
+import logging
+import os
+import selectors
+import threading
+import time
+
+# Niveaux acceptés dans le champ "level" d'une ligne JSON
+LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING,
+          "warn": logging.WARNING, "error": logging.ERROR, "critical": logging.CRITICAL}
+
+READ_SIZE = 65536
+# Au-delà, une ligne sans fin de ligne est enregistrée telle quelle
+MAX_LINE_BYTES = 1024 * 1024
+
+
+def parse_line(line: str) -> dict:
+    """Enregistrement d'une ligne de sortie : niveau, message, horodatage et champs structurés éventuels"""
+    if line.startswith("{"):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            level = str(data.pop("level", "info")).lower()
+            message = data.pop("message") if "message" in data else data.pop("msg", "")
+            record = {"level": logging.getLevelName(LEVELS.get(level, logging.INFO)),
+                      "message": str(message)}
+            t = data.pop("t", None)
+            if isinstance(t, (int, float)) and not isinstance(t, bool):
+                record["t"] = t
+            record["fields"] = data
+            return record
+    return {"level": "INFO", "message": line}
+
+
+class LogCollector:
+    """Lit les sorties de toutes les APIs dans un seul thread"""
+
+    def __init__(self, logger: logging.Logger, buffer_lines: int = 200, flush_interval: float = 0.2,
+                 max_batch: int = 500):
+        self.logger = logger
+        self.buffer_lines = buffer_lines
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._buffers = {}
+        self._pending = []
+        self._lines = collections.Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._use_selector = os.name == 'posix'
+        if self._use_selector:
+            self._selector = selectors.DefaultSelector()
+            # Réveil du thread de collecte quand un flux est ajouté (enregistré depuis ce thread)
+            self._wakeup_read, self._wakeup_write = os.pipe()
+            os.set_blocking(self._wakeup_read, False)
+            self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+            self._to_register = []
+
+    def add(self, api_name: str, process):
+        """Collecte stdout et stderr d'un processus lancé avec des pipes binaires"""
+        with self._lock:
+            self._buffers.setdefault(api_name, collections.deque(maxlen=self.buffer_lines))
+        streams = [(stream, name) for stream, name in ((process.stdout, "stdout"), (process.stderr, "stderr"))
+                   if stream is not None]
+        if not self._use_selector:
+            for stream, stream_name in streams:
+                threading.Thread(target=self._read_blocking, args=(api_name, stream, stream_name),
+                                 daemon=True, name=f"logs-{api_name}-{stream_name}").start()
+            return
+
+        for stream, _ in streams:
+            os.set_blocking(stream.fileno(), False)
+        with self._lock:
+            self._to_register.extend((stream, {"api": api_name, "stream": stream_name, "stream_obj": stream,
+                                               "partial": b""})
+                                     for stream, stream_name in streams)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="log-collector")
+                self._thread.start()
+        os.write(self._wakeup_write, b"\0")
+
+    def recent(self, api_name: str, n: int = None) -> list:
+        """Derniers enregistrements d'une API (les `n` plus récents), du plus ancien au plus récent"""
+        with self._lock:
+            records = list(self._buffers.get(api_name, ()))
+        if n is None:
+            return records
+        return records[-n:] if n > 0 else []
+
+    def stats(self, api_name: str) -> dict:
+        with self._lock:
+            return {"lines": self._lines[api_name], "buffered": len(self._buffers.get(api_name, ()))}
+
+    # ----------------------------------------------------
+    # Collecte
+    # ----------------------------------------------------
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            timeout = self.flush_interval if self._pending else None
+            for key, _ in self._selector.select(timeout=timeout):
+                if key.data is None:
+                    self._register_new_streams()
+                else:
+                    self._read_ready(key)
+            now = time.monotonic()
+            if self._pending and (now - last_flush >= self.flush_interval or len(self._pending) >= self.max_batch):
+                self._flush()
+                last_flush = now
+
+    def _register_new_streams(self):
+        try:
+            while os.read(self._wakeup_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            new_streams, self._to_register = self._to_register, []
+        for stream, state in new_streams:
+            self._selector.register(stream.fileno(), selectors.EVENT_READ, state)
+
+    def _read_ready(self, key):
+        state = key.data
+        try:
+            data = os.read(key.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            # Fin du flux (API arrêtée) : la dernière ligne incomplète est conservée
+            self._selector.unregister(key.fd)
+            if state["partial"]:
+                self._ingest(state["api"], state["stream"], [state["partial"]])
+            state["stream_obj"].close()
+            return
+        lines = (state["partial"] + data).split(b"\n")
+        state["partial"] = lines.pop()
+        if len(state["partial"]) > MAX_LINE_BYTES:
+            lines.append(state["partial"])
+            state["partial"] = b""
+        self._ingest(state["api"], state["stream"], lines)
+
+    def _read_blocking(self, api_name, stream, stream_name):
+        try:
+            for line in iter(stream.readline, b""):
+                self._ingest(api_name, stream_name, [line.rstrip(b"\n")])
+                self._flush()
+        except (OSError, ValueError):
+            self.logger.debug(f"Fin lecture {stream_name} pour {api_name}")
+
+    def _ingest(self, api_name, stream_name, raw_lines):
+        now = time.time()
+        records = []
+        for raw in raw_lines:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line:
+                record = parse_line(line)
+                record.setdefault("t", round(now, 3))
+                record["stream"] = stream_name
+                records.append(record)
+        if not records:
+            return
+        with self._lock:
+            self._buffers[api_name].extend(records)
+            self._lines[api_name] += len(records)
+            self._pending.extend((api_name, record) for record in records)
+
+    def _flush(self):
+        """Transmet les lignes en attente au journal : un LogRecord par ligne, à son horodatage"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for api_name, record in pending:
+            level = logging.getLevelName(record["level"])
+            if not self.logger.isEnabledFor(level):
+                continue
+            fields = record.get("fields")
+            message = f"{api_name} [{record['stream']}]: {record['message']}"
+            if fields:
+                message += f" {json.dumps(fields, ensure_ascii=False, default=str)}"
+            log_record = self.logger.makeRecord(self.logger.name, level, __file__, 0, message, (), None,
+                                                func="_flush")
+            log_record.created = record["t"]
+            log_record.msecs = (record["t"] - int(record["t"])) * 1000
+            log_record.api = api_name
+            log_record.stream = record["stream"]
+            self.logger.handle(log_record)
@@ -0,0 +1,514 @@
+"""Métriques Prometheus des APIs de prédiction (GET /metrics, format texte 0.0.4).
+
+- api_requests_total{route, method, status} et api_request_duration_seconds{route} ;
+- api_stage_duration_seconds{route, stage} : parse, encode, batch_wait (attente du
+  micro-batching), inference, serialize, cumulés par requête (stage / timed / add_stage,
+  sans effet hors requête) ;
+- api_model_load_duration_seconds{model}, api_model_load_memory_bytes{model} (hausse
+  du RSS pendant le chargement) et api_model_loads_total{model, result} ;
+- api_prediction_cache_lookups_total{cache, result}, api_prediction_cache_evictions_total{cache}
+  et api_prediction_cache_entries{cache} ;
+- api_microbatch_size{batcher} (lignes par lot), api_microbatch_wait_seconds{batcher}
+  (attente ajoutée à chaque ligne) et api_microbatch_queue_depth{batcher} ;
+- process_resident_memory_bytes.
+
+En pre-fork, chaque worker écrit ses valeurs dans un répertoire partagé créé par le
+maître avant les forks (share_between_workers) ; /metrics additionne les compteurs
+et histogrammes de tous les processus, y compris des workers arrêtés.
+summarize() résume une exposition pour APIManager.get_status.
+"""
+import bisect
+import contextlib
+import functools
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import psutil
+from flask import Response, g, has_request_context, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bornes supérieures des tailles de lot du micro-batching
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Intervalle d'écriture des valeurs d'un worker pre-fork dans le répertoire partagé (secondes)
+SHARE_INTERVAL_S = 1.0
+
+UNKNOWN_ROUTE = 'inconnue'
+
+
+class _Metric:
+    def __init__(self, name, help, kind, labelnames, buckets=None, merge='sum'):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        # Jauges de plusieurs processus : additionnées ('sum') ou valeur la plus récente ('last')
+        self.merge = merge
+        self.values = {}
+
+
+class Registry:
+    """Compteurs, jauges et histogrammes d'un processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self.changed = False
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(_Metric(name, help, 'counter', labelnames))
+
+    def gauge(self, name, help, labelnames=(), merge='sum'):
+        return self._add(_Metric(name, help, 'gauge', labelnames, merge=merge))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(_Metric(name, help, 'histogram', labelnames, buckets=buckets))
+
+    def inc(self, metric, labels=(), amount=1.0):
+        with self._lock:
+            metric.values[labels] = metric.values.get(labels, 0.0) + amount
+            self.changed = True
+
+    def set(self, metric, labels=(), value=0.0):
+        with self._lock:
+            metric.values[labels] = float(value)
+            self.changed = True
+
+    def observe(self, metric, labels, value):
+        with self._lock:
+            state = metric.values.get(labels)
+            if state is None:
+                # Comptes par intervalle (le dernier au-delà de la plus grande borne), somme, nombre
+                state = metric.values[labels] = [[0] * (len(metric.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(metric.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+            self.changed = True
+
+    def reset_counts(self):
+        """Remet à zéro compteurs et histogrammes (worker tout juste créé par fork)"""
+        with self._lock:
+            for metric in self._metrics.values():
+                if metric.kind != 'gauge':
+                    metric.values.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self.changed = False
+            return {metric.name: {
+                "kind": metric.kind, "help": metric.help, "labelnames": list(metric.labelnames),
+                "buckets": metric.buckets and list(metric.buckets), "merge": metric.merge,
+                "values": [[list(labels), json.loads(json.dumps(value))] for labels, value in metric.values.items()]
+            } for metric in self._metrics.values()}
+
+
+registry = Registry()
+
+REQUESTS = registry.counter('api_requests_total', "Requetes HTTP traitees", ('route', 'method', 'status'))
+REQUEST_DURATION = registry.histogram('api_request_duration_seconds', "Duree des requetes HTTP (corps en "
+                                      "streaming compris)", ('route',))
+STAGE_DURATION = registry.histogram('api_stage_duration_seconds', "Duree des etapes d'une prediction "
+                                    "(parse, encode, batch_wait, inference, serialize)", ('route', 'stage'))
+MODEL_LOAD_DURATION = registry.gauge('api_model_load_duration_seconds', "Duree du dernier chargement "
+                                     "des modeles", ('model',), merge='last')
+MODEL_LOAD_MEMORY = registry.gauge('api_model_load_memory_bytes', "Hausse du RSS pendant le dernier "
+                                   "chargement des modeles", ('model',), merge='last')
+MODEL_LOADS = registry.counter('api_model_loads_total', "Chargements des modeles", ('model', 'result'))
+CACHE_LOOKUPS = registry.counter('api_prediction_cache_lookups_total', "Consultations du cache de "
+                                 "predictions (hit, miss)", ('cache', 'result'))
+CACHE_EVICTIONS = registry.counter('api_prediction_cache_evictions_total', "Entrees evincees du cache "
+                                   "de predictions", ('cache',))
+CACHE_ENTRIES = registry.gauge('api_prediction_cache_entries', "Entrees du cache de predictions", ('cache',))
+MICROBATCH_SIZE = registry.histogram('api_microbatch_size', "Lignes par lot du micro-batching", ('batcher',),
+                                     buckets=BATCH_SIZE_BUCKETS)
+MICROBATCH_WAIT = registry.histogram('api_microbatch_wait_seconds', "Attente ajoutee par le micro-batching "
+                                     "(par ligne)", ('batcher',))
+MICROBATCH_QUEUE = registry.gauge('api_microbatch_queue_depth', "Lignes en attente de micro-batching",
+                                  ('batcher',))
+RESIDENT_MEMORY = registry.gauge('process_resident_memory_bytes', "RSS des processus de l'API")
+
+
+# ----------------------------------------------------
+# Mesures (côté API)
+# ----------------------------------------------------
+
+def add_stage(stage, seconds):
+    """Ajoute une durée à une étape de la requête en cours (sans effet hors requête, ex. bulk_score)"""
+    if has_request_context():
+        stages = g.get('_metrics_stages')
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Chronomètre un bloc comme étape `name` de la requête en cours"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage(name, time.perf_counter() - start)
+
+
+def timed(stage_name):
+    """Décorateur : chaque appel compte comme étape `stage_name` de la requête en cours"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe_model_load(model, seconds, memory_bytes, ok=True):
+    """Enregistre un chargement (initial ou à chaud) des modèles `model`"""
+    registry.inc(MODEL_LOADS, (model, 'ok' if ok else 'failed'))
+    if ok:
+        registry.set(MODEL_LOAD_DURATION, (model,), seconds)
+        registry.set(MODEL_LOAD_MEMORY, (model,), memory_bytes)
+
+
+def observe_cache_lookup(cache, hit):
+    registry.inc(CACHE_LOOKUPS, (cache, 'hit' if hit else 'miss'))
+
+
+def observe_cache_size(cache, entries, evicted=0):
+    """Taille du cache `cache` après une écriture ou une invalidation, et entrées évincées"""
+    registry.set(CACHE_ENTRIES, (cache,), entries)
+    if evicted:
+        registry.inc(CACHE_EVICTIONS, (cache,), evicted)
+
+
+def observe_microbatch(batcher, waits, queue_depth):
+    """Un lot du micro-batching : attente de chaque ligne (secondes) et lignes restant en file"""
+    registry.observe(MICROBATCH_SIZE, (batcher,), len(waits))
+    for wait in waits:
+        registry.observe(MICROBATCH_WAIT, (batcher,), wait)
+    registry.set(MICROBATCH_QUEUE, (batcher,), queue_depth)
+
+
+def set_microbatch_queue(batcher, queue_depth):
+    registry.set(MICROBATCH_QUEUE, (batcher,), queue_depth)
+
+
+def current_rss() -> int:
+    return psutil.Process().memory_info().rss
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else UNKNOWN_ROUTE
+
+
+def register(app):
+    """Mesure chaque requête de `app` et ajoute GET /metrics"""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        g._metrics_stages = {}
+
+    @app.after_request
+    def _record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    # Après la fin du corps en streaming (stream_with_context garde la requête jusque-là)
+    @app.teardown_request
+    def _record_request(exc):
+        start = g.get('_metrics_start')
+        if start is None:
+            return
+        route = _route()
+        status = g.get('_metrics_status', 500)
+        registry.inc(REQUESTS, (route, request.method, str(status)))
+        registry.observe(REQUEST_DURATION, (route,), time.perf_counter() - start)
+        for stage_name, seconds in g._metrics_stages.items():
+            registry.observe(STAGE_DURATION, (route, stage_name), seconds)
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
+
+
+# ----------------------------------------------------
+# Pre-fork : valeurs de tous les workers
+# ----------------------------------------------------
+
+_share_dir = None
+
+
+def share_between_workers():
+    """Maître pre-fork, avant les forks : les workers écriront leurs valeurs dans un répertoire partagé"""
+    global _share_dir
+    _share_dir = tempfile.mkdtemp(prefix='api-metrics-')
+    # Requêtes servies par le maître pendant le chargement et durées de chargement
+    _write_snapshot()
+
+
+def start_worker():
+    """Worker pre-fork, après le fork : compteurs propres et écriture périodique de ses valeurs"""
+    if _share_dir is None:
+        return
+    registry.reset_counts()
+    _write_snapshot()
+
+    def share():
+        while True:
+            time.sleep(SHARE_INTERVAL_S)
+            if registry.changed:
+                _write_snapshot()
+
+    threading.Thread(target=share, daemon=True, name="metrics-share").start()
+
+
+def flush():
+    """Worker pre-fork qui s'arrête : dernières valeurs écrites avant de quitter"""
+    if _share_dir is not None:
+        _write_snapshot()
+
+
+def cleanup():
+    """Maître pre-fork, à l'arrêt : supprime le répertoire partagé"""
+    global _share_dir
+    if _share_dir is not None:
+        shutil.rmtree(_share_dir, ignore_errors=True)
+        _share_dir = None
+
+
+def _write_snapshot():
+    registry.set(RESIDENT_MEMORY, (), current_rss())
+    path = os.path.join(_share_dir, f"{os.getpid()}.json")
+    try:
+        with open(path + '.tmp', 'w') as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        # Répertoire supprimé par le maître pendant l'arrêt
+        pass
+
+
+def _read_snapshots():
+    """Valeurs de chaque processus (pid, en vie, valeurs), de la plus ancienne à la plus récente"""
+    snapshots = []
+    for entry in os.scandir(_share_dir):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as f:
+                values = json.load(f)
+            pid = int(entry.name[:-5])
+            snapshots.append((entry.stat().st_mtime, pid, psutil.pid_exists(pid), values))
+        except (OSError, ValueError):
+            continue
+    snapshots.sort(key=lambda snapshot: snapshot[0])
+    return [(pid, alive, values) for _, pid, alive, values in snapshots]
+
+
+def _merge(snapshots):
+    merged = {}
+    for pid, alive, values in snapshots:
+        for name, metric in values.items():
+            target = merged.setdefault(name, dict(metric, values={}))["values"]
+            for labels, value in metric["values"]:
+                labels = tuple(labels)
+                if metric["kind"] == 'histogram':
+                    if labels in target:
+                        counts, total, count = target[labels]
+                        value = [[a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2]]
+                    target[labels] = value
+                elif metric["kind"] == 'counter' or (metric["merge"] == 'sum' and alive):
+                    target[labels] = target.get(labels, 0.0) + value
+                elif metric["kind"] == 'gauge' and metric["merge"] == 'last':
+                    target[labels] = value
+    for metric in merged.values():
+        metric["values"] = [[list(labels), value] for labels, value in metric["values"].items()]
+    return merged
+
+
+# ----------------------------------------------------
+# Exposition
+# ----------------------------------------------------
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format(snapshot):
+    lines = []
+    for name, metric in snapshot.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for labels, value in sorted(metric["values"], key=lambda item: item[0]):
+            if metric["kind"] != 'histogram':
+                lines.append(f"{name}{_format_labels(names, labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, n in zip(list(metric["buckets"]) + [math.inf], counts):
+                cumulative += n
+                le = _format_value(bound)
+                lines.append(f"{name}_bucket{_format_labels(names, labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(names, labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(names, labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def render() -> str:
+    """Exposition texte des métriques du processus (ou de tous les workers en pre-fork)"""
+    if _share_dir is None:
+        registry.set(RESIDENT_MEMORY, (), current_rss())
+        return _format(registry.snapshot())
+    _write_snapshot()
+    return _format(_merge(_read_snapshots()))
+
+
+def render_registry(other) -> str:
+    """Exposition texte d'un registre autre que celui de l'API (ex. latences côté client)"""
+    return _format(other.snapshot())
+
+
+# ----------------------------------------------------
+# Lecture (côté APIManager)
+# ----------------------------------------------------
+
+_SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text) -> dict:
+    """Échantillons d'une exposition texte : {nom: [(étiquettes, valeur)]}"""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE_LINE.match(line.strip())
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        labels = {key: raw.replace('\\"', '"').replace('\\n', '\n').replace('\\\\', '\\')
+                  for key, raw in _LABEL.findall(labels or '')}
+        samples.setdefault(name, []).append((labels, float(value)))
+    return samples
+
+
+def quantile(buckets, q):
+    """Quantile estimé d'un histogramme [(borne, nombre cumulé)] (interpolation comme histogram_quantile)"""
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if total == 0:
+        return None
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == math.inf:
+                return lower_bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / max(count - lower_count, 1e-12)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def summarize(text) -> dict:
+    """Résumé d'une exposition : requêtes par route, latence des étapes (ms), chargements, cache,
+    micro-batching, mémoire"""
+    samples = parse(text)
+    requests_by_route = {}
+    for labels, value in samples.get('api_requests_total', []):
+        route = requests_by_route.setdefault(labels.get('route'), {"total": 0, "errors": 0, "by_status": {}})
+        route["total"] += int(value)
+        route["by_status"][labels.get('status')] = route["by_status"].get(labels.get('status'), 0) + int(value)
+        if labels.get('status', '').startswith('5'):
+            route["errors"] += int(value)
+
+    stages = {}
+    sums = {(labels['route'], labels['stage']): value
+            for labels, value in samples.get('api_stage_duration_seconds_sum', [])}
+    counts = {(labels['route'], labels['stage']): value
+              for labels, value in samples.get('api_stage_duration_seconds_count', [])}
+    buckets = {}
+    for labels, value in samples.get('api_stage_duration_seconds_bucket', []):
+        buckets.setdefault((labels['route'], labels['stage']), []).append((float(labels['le']), value))
+    for (route, stage_name), count in counts.items():
+        if count:
+            p95 = quantile(buckets.get((route, stage_name), []), 0.95)
+            stages.setdefault(route, {})[stage_name] = {
+                "count": int(count),
+                "mean_ms": round(sums.get((route, stage_name), 0.0) / count * 1000, 3),
+                "p95_ms": None if p95 is None else round(p95 * 1000, 3)
+            }
+
+    caches = {}
+
+    def cache_entry(name):
+        return caches.setdefault(name, {"hits": 0, "misses": 0, "evictions": 0, "entries": 0})
+
+    for labels, value in samples.get('api_prediction_cache_lookups_total', []):
+        cache_entry(labels['cache'])["hits" if labels['result'] == 'hit' else "misses"] += int(value)
+    for labels, value in samples.get('api_prediction_cache_evictions_total', []):
+        cache_entry(labels['cache'])["evictions"] = int(value)
+    for labels, value in samples.get('api_prediction_cache_entries', []):
+        cache_entry(labels['cache'])["entries"] = int(value)
+    for cache in caches.values():
+        lookups = cache["hits"] + cache["misses"]
+        cache["hit_rate"] = round(cache["hits"] / lookups, 4) if lookups else 0.0
+
+    def by_batcher(name):
+        return {labels['batcher']: value for labels, value in samples.get(name, [])}
+
+    rows, wait_sums = by_batcher('api_microbatch_size_sum'), by_batcher('api_microbatch_wait_seconds_sum')
+    queue_depths = by_batcher('api_microbatch_queue_depth')
+    wait_buckets = {}
+    for labels, value in samples.get('api_microbatch_wait_seconds_bucket', []):
+        wait_buckets.setdefault(labels['batcher'], []).append((float(labels['le']), value))
+    micro_batching = {}
+    for batcher, count in by_batcher('api_microbatch_size_count').items():
+        n_rows = rows.get(batcher, 0.0)
+        p95 = quantile(wait_buckets.get(batcher, []), 0.95)
+        micro_batching[batcher] = {
+            "batches": int(count),
+            "rows": int(n_rows),
+            "mean_batch_size": round(n_rows / count, 2) if count else 0.0,
+            "queue_depth": int(queue_depths.get(batcher, 0)),
+            "added_wait_ms": {"mean": round(wait_sums.get(batcher, 0.0) / n_rows * 1000, 3) if n_rows else 0.0,
+                              "p95": None if p95 is None else round(p95 * 1000, 3)}
+        }
+
+    memory = {labels['model']: value for labels, value in samples.get('api_model_load_memory_bytes', [])}
+    rss = samples.get('process_resident_memory_bytes')
+    return {
+        "requests_total": sum(route["total"] for route in requests_by_route.values()),
+        "errors_total": sum(route["errors"] for route in requests_by_route.values()),
+        "requests": requests_by_route,
+        "stages": stages,
+        "model_loads": {labels['model']: {"duration_s": round(value, 3),
+                                          "memory_mb": round(memory.get(labels['model'], 0.0) / 1e6, 1)}
+                        for labels, value in samples.get('api_model_load_duration_seconds', [])},
+        "cache": caches,
+        "micro_batching": micro_batching,
+        "rss_mb": round(rss[0][1] / 1e6, 1) if rss else None
+    }
@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+import metrics
+
+# Activation et réglages (par API, via les variables d'environnement transmises par APIManager)
+MICROBATCH_ENABLED = os.environ.get('MICROBATCH_ENABLED', '0') == '1'
+MICROBATCH_WINDOW_MS = float(os.environ.get('MICROBATCH_WINDOW_MS', 3.0))
+MICROBATCH_MAX_SIZE = int(os.environ.get('MICROBATCH_MAX_SIZE', 64))
+
+# Bornes supérieures des classes de l'histogramme des tailles de lot (les mêmes sur /metrics)
+BATCH_SIZE_BUCKETS = metrics.BATCH_SIZE_BUCKETS
+
+
+class _PendingRow:
+    __slots__ = ('row', 'predict_fn', 'enqueued_at', 'done', 'result', 'error', 'wait_s', 'predict_s')
+
+    def __init__(self, row, predict_fn):
+        self.row = row
+        self.predict_fn = predict_fn
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Attente avant l'appel au modèle et durée de cet appel (partagé avec le reste du lot)
+        self.wait_s = 0.0
+        self.predict_s = 0.0
+
+
+class MicroBatcher:
+    """Regroupe les lignes arrivées dans une courte fenêtre en un seul appel au modèle.
+
+    Chaque requête dépose sa ligne encodée puis attend ; un thread dédié prend la
+    première ligne en attente, complète le lot pendant `window_ms` (ou jusqu'à
+    `max_batch_size` lignes), appelle `predict_fn` une seule fois sur la matrice
+    empilée et renvoie à chaque requête sa propre prédiction.
+    """
+
+    def __init__(self, predict_fn, window_ms=MICROBATCH_WINDOW_MS, max_batch_size=MICROBATCH_MAX_SIZE,
+                 name='default'):
+        self.predict_fn = predict_fn
+        # Étiquette `batcher` des métriques /metrics
+        self.name = name
+        self.window_s = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.batches = 0
+        self.rows = 0
+        self.wait_sum_s = 0.0
+        self.wait_max_s = 0.0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    def _ensure_worker(self):
+        """Démarre le thread de batching dans le processus courant (après un éventuel fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # La file et le thread du processus maître ne survivent pas au fork
+            self._queue = queue.Queue()
+            self._reset_metrics()
+            threading.Thread(target=self._run, daemon=True, name="micro-batcher").start()
+            self._pid = os.getpid()
+
+    def submit(self, row, predict_fn=None):
+        """Prédit une ligne (vecteur 1D) en la faisant passer par le prochain lot.
+
+        `predict_fn` remplace celui du batcher pour cette ligne : une requête
+        commencée avant un rechargement du modèle reste prédite par l'ancien.
+        L'attente du lot et l'appel au modèle sont comptés dans les étapes
+        `batch_wait` et `inference` de la requête en cours (cf. metrics.add_stage).
+        """
+        self._ensure_worker()
+        pending = _PendingRow(row, predict_fn or self.predict_fn)
+        self._queue.put(pending)
+        metrics.set_microbatch_queue(self.name, self._queue.qsize())
+        pending.done.wait()
+        metrics.add_stage('batch_wait', pending.wait_s)
+        metrics.add_stage('inference', pending.predict_s)
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        """Attend une première ligne puis complète le lot jusqu'à la fin de la fenêtre"""
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.window_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Un lot ne mélange pas deux versions du modèle (rechargement à chaud en cours)
+            groups = {}
+            for pending in batch:
+                groups.setdefault(pending.predict_fn, []).append(pending)
+            try:
+                for predict_fn, group in groups.items():
+                    self._predict(predict_fn, group)
+            finally:
+                self._record(batch)
+                for pending in batch:
+                    pending.done.set()
+
+    @staticmethod
+    def _predict(predict_fn, group):
+        started = time.perf_counter()
+        try:
+            results = predict_fn(np.vstack([pending.row for pending in group]))
+            for pending, result in zip(group, results):
+                pending.result = result
+        except Exception as e:
+            for pending in group:
+                pending.error = e
+        finally:
+            predict_s = time.perf_counter() - started
+            for pending in group:
+                pending.wait_s = started - pending.enqueued_at
+                pending.predict_s = predict_s
+
+    def _record(self, batch):
+        waits = [pending.wait_s for pending in batch]
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if len(batch) <= bound),
+                      len(BATCH_SIZE_BUCKETS))
+        with self._metrics_lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.wait_sum_s += sum(waits)
+            self.wait_max_s = max(self.wait_max_s, max(waits))
+            self.batch_size_counts[bucket] += 1
+        metrics.observe_microbatch(self.name, waits, self._queue.qsize())
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            labels = [f"<={bound}" for bound in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+            return {
+                "window_ms": self.window_s * 1000,
+                "max_batch_size": self.max_batch_size,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "batches": self.batches,
+                "rows": self.rows,
+                "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": dict(zip(labels, self.batch_size_counts)),
+                "added_wait_ms": {
+                    "mean": round(self.wait_sum_s / self.rows * 1000, 3) if self.rows else 0.0,
+                    "max": round(self.wait_max_s * 1000, 3)
+                }
+            }
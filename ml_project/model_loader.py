@@ -0,0 +1,247 @@
+"""Chargement des modèles en arrière-plan pour les APIs de prédiction.
+
+Le serveur HTTP écoute dès le démarrage pendant qu'un thread télécharge puis
+charge les artefacts. /health expose l'avancement (phase, octets lus, durée) et,
+en cas d'échec, l'erreur rencontrée au lieu d'un simple modèle absent.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Phases successives d'un chargement
+PHASE_STARTING = 'starting'
+PHASE_DOWNLOADING = 'downloading'
+PHASE_LOADING = 'loading'
+PHASE_READY = 'ready'
+PHASE_FAILED = 'failed'
+
+# Attente maximale acceptée pour /health?wait=N (secondes)
+MAX_HEALTH_WAIT = 30.0
+
+
+class _CountingFileIO(io.FileIO):
+    """Fichier binaire qui signale chaque lecture au suivi de chargement"""
+
+    def __init__(self, path, progress):
+        super().__init__(path, 'rb')
+        self._progress = progress
+
+    def readinto(self, buffer):
+        n = super().readinto(buffer)
+        if n:
+            self._progress.add_bytes(n)
+        return n
+
+
+class LoadProgress:
+    """État partagé d'un chargement de modèles exécuté dans un thread dédié"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self.phase = PHASE_STARTING
+        self.artifact = None
+        self.bytes_loaded = 0
+        self.bytes_total = 0
+        self.error = None
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    def start(self, load_fn):
+        """Lance load_fn(progress) en arrière-plan ; une exception marque le chargement en échec"""
+        threading.Thread(target=self._run, args=(load_fn,), daemon=True, name="model-loader").start()
+
+    def _run(self, load_fn):
+        try:
+            load_fn(self)
+        except Exception as e:
+            self._finish(PHASE_FAILED, f"{type(e).__name__}: {e}")
+        else:
+            self._finish(PHASE_READY)
+
+    def _finish(self, phase, error=None):
+        with self._lock:
+            self.phase = phase
+            self.artifact = None
+            self.error = error
+            self.finished_at = time.perf_counter()
+        self._done.set()
+
+    def set_phase(self, phase, artifact=None):
+        with self._lock:
+            self.phase = phase
+            self.artifact = artifact
+
+    def expect(self, *paths):
+        """Ajoute la taille des artefacts à lire au total attendu"""
+        with self._lock:
+            self.bytes_total += sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def add_bytes(self, n):
+        with self._lock:
+            self.bytes_loaded += n
+
+    def open(self, path):
+        """Ouvre un artefact en lecture en comptant les octets lus (à passer à joblib.load/pickle.load)"""
+        self.set_phase(PHASE_LOADING, os.path.basename(path))
+        return io.BufferedReader(_CountingFileIO(path, self))
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == PHASE_READY
+
+    def wait(self, timeout=None) -> bool:
+        """Attend la fin du chargement (succès ou échec), True si terminé"""
+        return self._done.wait(timeout)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            end = self.finished_at if self.finished_at is not None else time.perf_counter()
+            return {
+                "phase": self.phase,
+                "artifact": self.artifact,
+                "bytes_loaded": self.bytes_loaded,
+                "bytes_total": self.bytes_total,
+                "elapsed_s": round(end - self.started_at, 3),
+                "error": self.error
+            }
+
+
+def health_wait_seconds(args) -> float:
+    """Durée de long-poll demandée par ?wait=N sur /health, bornée à MAX_HEALTH_WAIT"""
+    try:
+        return min(max(float(args.get('wait', 0)), 0.0), MAX_HEALTH_WAIT)
+    except ValueError:
+        return 0.0
+
+
+def artifact_version(paths) -> str:
+    """Version courte d'un ensemble d'artefacts (nom, taille, date de modification)"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def _signature(paths):
+    """Empreinte des fichiers surveillés, None si l'un d'eux est absent (écriture en cours)"""
+    try:
+        return artifact_version(paths)
+    except OSError:
+        return None
+
+
+class ModelReloader:
+    """Rechargement à chaud des modèles d'une API.
+
+    Les nouveaux artefacts sont chargés dans un thread (`build(progress)`),
+    validés par une prédiction de contrôle (`smoke_test(artefacts)`), puis
+    installés d'un seul coup (`install(artefacts)`). Les requêtes en cours
+    terminent avec les artefacts qu'elles ont déjà en main ; en cas d'échec,
+    l'ancienne version reste en service.
+    """
+
+    def __init__(self, name, build, smoke_test, install, watched_paths):
+        self.name = name
+        self.build = build
+        self.smoke_test = smoke_test
+        self.install = install
+        self.watched_paths = list(watched_paths)
+        self._lock = threading.Lock()
+        self.progress = None
+        self._pid = os.getpid()
+        self.installed_signature = None
+        self.trigger = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_duration_s = None
+
+    def reload(self, trigger) -> bool:
+        """Lance un rechargement en arrière-plan, False si un rechargement est déjà en cours"""
+        with self._lock:
+            # Un rechargement hérité du maître au moment du fork n'a plus de thread : on l'ignore
+            if self.progress is not None and not self.progress.done and self._pid == os.getpid():
+                return False
+            logger.info(f"Rechargement des modeles {self.name} ({trigger})...")
+            self._pid = os.getpid()
+            self.trigger = trigger
+            self.progress = LoadProgress()
+            self.progress.start(self._run)
+            return True
+
+    def load(self, progress):
+        """Construit, valide puis installe les artefacts (utilisable comme load_fn de LoadProgress.start)"""
+        signature = _signature(self.watched_paths)
+        started_at, rss_before = time.perf_counter(), metrics.current_rss()
+        try:
+            artifacts = self.build(progress)
+            self.smoke_test(artifacts)
+            self.install(artifacts)
+        except Exception:
+            metrics.observe_model_load(self.name, 0, 0, ok=False)
+            raise
+        self.installed_signature = signature
+        # Hausse du RSS approximative si un autre chargement tourne en même temps (API DPE)
+        metrics.observe_model_load(self.name, time.perf_counter() - started_at,
+                                   max(metrics.current_rss() - rss_before, 0))
+
+    def _run(self, progress):
+        try:
+            self.load(progress)
+            self.reloads += 1
+            logger.info(f"Modeles {self.name} recharges en {time.perf_counter() - progress.started_at:.2f}s")
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Rechargement {self.name} abandonne, version precedente conservee : {e}")
+            raise
+        finally:
+            self.last_duration_s = round(time.perf_counter() - progress.started_at, 3)
+
+    def wait(self, timeout=None) -> bool:
+        progress = self.progress
+        return progress is None or progress.wait(timeout)
+
+    def start_watcher(self, interval_s):
+        """Surveille les artefacts et recharge quand ils changent (après une période sans modification)"""
+        if interval_s <= 0:
+            return
+        threading.Thread(target=self._watch, args=(interval_s,), daemon=True,
+                         name=f"{self.name}-watcher").start()
+
+    def _watch(self, interval_s):
+        seen = attempted = _signature(self.watched_paths)
+        while True:
+            time.sleep(interval_s)
+            current = _signature(self.watched_paths)
+            # Empreinte identique sur deux passages : le fichier n'est plus en cours d'écriture.
+            # Rien avant la fin du chargement initial, et une seule tentative par version des fichiers
+            if (current is not None and current == seen and current != attempted
+                    and self.installed_signature is not None and current != self.installed_signature):
+                if self.reload("fichiers modifies"):
+                    attempted = current
+                    self.wait()
+            seen = current
+
+    def status(self) -> dict:
+        progress = self.progress
+        return {
+            "in_progress": progress is not None and not progress.done,
+            "last_trigger": self.trigger,
+            "last_outcome": None if progress is None or not progress.done else progress.phase,
+            "last_error": None if progress is None else progress.error,
+            "last_duration_s": self.last_duration_s,
+            "reloads": self.reloads,
+            "failures": self.failures
+        }
@@ -0,0 +1,132 @@
+"""Mode streaming NDJSON des routes /batch des APIs de prédiction.
+
+Une requête NDJSON (un logement JSON par ligne) dont l'en-tête Accept demande du
+NDJSON est lue au fil de l'eau, prédite par blocs de STREAM_CHUNK_SIZE logements,
+et la réponse est renvoyée bloc par bloc par un générateur Flask : une ligne
+{"index": i, ...} par logement (ou {"index": i, "error": message}), puis une ligne
+{"resume": {...}} avec les compteurs et les durées. Ni la requête ni la réponse
+ne sont gardées entières en mémoire, quelle que soit leur taille.
+"""
+import json
+import logging
+import os
+import time
+
+from flask import Response, stream_with_context
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Types de contenu reconnus comme NDJSON (un logement JSON par ligne)
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+
+# Logements encodés et prédits ensemble dans une réponse en streaming
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 1000))
+
+# Taille des lectures dans le corps de la requete (octets)
+READ_BLOCK_SIZE = 64 * 1024
+
+INVALID_LINE_MESSAGE = "Ligne JSON invalide"
+
+
+def wants_stream(request) -> bool:
+    """Corps NDJSON et réponse NDJSON demandée (Accept), plutôt qu'un seul objet JSON"""
+    if request.mimetype not in NDJSON_MIMETYPES:
+        return False
+    return request.accept_mimetypes.best_match(('application/json',) + NDJSON_MIMETYPES) in NDJSON_MIMETYPES
+
+
+def iter_lines(stream, block_size=READ_BLOCK_SIZE):
+    """Lignes non vides du corps, lues par blocs (une lecture par ligne serait trop coûteuse)"""
+    pending = b""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+
+def iter_chunks(stream, chunk_size):
+    """Blocs (logements, erreurs de lecture {indice: message}) lus au fil du corps"""
+    records, parse_errors = [], {}
+    for line in iter_lines(stream):
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            parse_errors[len(records)] = INVALID_LINE_MESSAGE
+            records.append(None)
+        if len(records) == chunk_size:
+            yield records, parse_errors
+            records, parse_errors = [], {}
+    if records:
+        yield records, parse_errors
+
+
+def format_chunk(offset, n, predictions, errors) -> str:
+    """Lignes NDJSON d'un bloc : {nom: (valeurs, masque des lignes valides)} et erreurs {indice: message}"""
+    columns = [(name, values.tolist()) for name, (values, _) in predictions.items()]
+    lines = []
+    for i in range(n):
+        if i in errors:
+            lines.append(json.dumps({"index": offset + i, "error": errors[i]}))
+        else:
+            result = {"index": offset + i}
+            for name, values in columns:
+                result[name] = values[i]
+            lines.append(json.dumps(result))
+    return "\n".join(lines) + "\n"
+
+
+def stream_response(request, score_chunk, chunk_size=None):
+    """Réponse NDJSON en streaming ; score_chunk(logements) -> (prédictions, erreurs) comme format_chunk"""
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    stream = request.stream
+
+    def generate():
+        t_start = time.perf_counter()
+        durations = {"parse": 0.0, "predict": 0.0, "serialize": 0.0}
+        n_total = n_errors = 0
+        chunks = iter_chunks(stream, chunk_size)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                records, parse_errors = next(chunks)
+            except StopIteration:
+                break
+            t1 = time.perf_counter()
+            try:
+                predictions, errors = score_chunk(records)
+            except Exception as e:
+                # Les en-tetes sont deja partis : l'erreur est signalee dans le flux
+                logger.exception(f"Erreur interne lors de la prediction en streaming : {str(e)}")
+                yield json.dumps({"error": f"Erreur interne lors de la prediction : {str(e)}",
+                                  "index": n_total}) + "\n"
+                return
+            # Une ligne illisible prime sur l'erreur d'encodage de sa valeur (None)
+            errors.update(parse_errors)
+            t2 = time.perf_counter()
+            body = format_chunk(n_total, len(records), predictions, errors)
+            t3 = time.perf_counter()
+            durations["parse"] += t1 - t0
+            durations["predict"] += t2 - t1
+            durations["serialize"] += t3 - t2
+            n_total += len(records)
+            n_errors += len(errors)
+            yield body
+
+        # Encodage et inference sont comptes par les fonctions de score (metrics.timed)
+        metrics.add_stage("parse", durations["parse"])
+        metrics.add_stage("serialize", durations["serialize"])
+        timings_ms = {stage: round(duration * 1000, 3) for stage, duration in durations.items()}
+        timings_ms["total"] = round((time.perf_counter() - t_start) * 1000, 3)
+        yield json.dumps({"resume": {"n_logements": n_total, "n_erreurs": n_errors,
+                                     "taille_bloc": chunk_size, "timings_ms": timings_ms}}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPES[0])
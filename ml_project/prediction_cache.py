@@ -0,0 +1,106 @@
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# Taille par défaut du cache (nombre de profils de logement distincts), 0 pour le désactiver
+DEFAULT_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+
+
+def _canonical_value(value):
+    """Normalise une valeur JSON : 80 et 80.0 donnent la même clé, les chaînes sont conservées telles quelles"""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _canonical_value(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_canonical_value(v) for v in value)
+    return value
+
+
+class PredictionCache:
+    """Cache LRU borné des prédictions, indexé sur la requête canonicalisée.
+
+    Chaque chargement des modèles appelle clear(), qui change la génération du
+    cache : une prédiction calculée avec l'ancien modèle et enregistrée après
+    coup est ignorée.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, name='default'):
+        self.maxsize = maxsize
+        # Étiquette `cache` des métriques /metrics
+        self.name = name
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(payload):
+        """Clé canonique d'une requête (champs triés, nombres en float), None si non cachable"""
+        if not isinstance(payload, dict):
+            return None
+        key = _canonical_value(payload)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key):
+        """Prédiction en cache pour cette clé, ou None"""
+        if key is None or self.maxsize <= 0:
+            return None
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.observe_cache_lookup(self.name, value is not None)
+        return value
+
+    def put(self, key, value, generation):
+        """Enregistre une prédiction calculée pendant la génération `generation` du cache"""
+        if key is None or self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+            entries = len(self._entries)
+        metrics.observe_cache_size(self.name, entries, evicted)
+
+    def clear(self):
+        """Invalide tout le cache (à appeler à chaque (re)chargement des modèles)"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+        metrics.observe_cache_size(self.name, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,333 @@
+"""Client Python des APIs de prédiction (tableau de bord, APIManager, traitements de masse).
+
+- connexions persistantes : un pool par API, sur son socket Unix s'il est en place
+  et en TCP sinon (cf. uds_transport) ;
+- predict_dpe, predict_conso, predict_full et leurs variantes *_batch, un lot
+  étant découpé en requêtes de `batch_size` logements au plus ;
+- nouvelles tentatives avec attente exponentielle, dans le délai `timeout` de
+  l'appel (toutes tentatives comprises) : erreur de connexion, délai d'une
+  tentative dépassé, 502/503/504 (modèle en cours de chargement). Les 4xx et 500
+  (logement invalide) ne sont pas rejoués ;
+- latence vue du client par API, route et résultat : latency_summary(), ou
+  render_metrics() au format Prometheus.
+
+AsyncPredictionClient expose les mêmes méthodes en coroutines : les appels
+passent par un pool de threads de la taille du pool de connexions (pas de
+dépendance HTTP asynchrone) et les morceaux d'un lot partent en parallèle.
+
+Usage :
+    with PredictionClient() as client:
+        client.predict_full(logement)  # {"prediction_DPE_index": 3, "conso_predite_kwh": 12345.67}
+"""
+import asyncio
+import functools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import metrics
+from uds_transport import CONSO_SOCKET, DPE_SOCKET, api_url, session
+
+DPE_PORT = 5001
+CONSO_PORT = 5000
+
+# Délai d'un appel, nouvelles tentatives comprises (secondes)
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF_S = 0.1
+MAX_RETRY_BACKOFF_S = 2.0
+# Statuts rejoués : API en cours de chargement ou momentanément indisponible
+RETRY_STATUSES = frozenset({502, 503, 504})
+# Logements par requête batch (les APIs en acceptent jusqu'à MAX_BATCH_SIZE = 100000)
+DEFAULT_BATCH_SIZE = 10000
+
+# Route, colonnes de prédictions et service de chaque type de lot
+BATCH_ROUTES = {
+    "dpe": ("dpe", "/predict_dpe/batch", ("predictions_DPE_index",)),
+    "conso": ("conso", "/predict_conso/batch", ("predictions_conso_kwh",)),
+    "full": ("dpe", "/predict_full/batch", ("predictions_DPE_index", "predictions_conso_kwh")),
+}
+
+
+class PredictionError(Exception):
+    """Appel en échec : statut HTTP (None sans réponse de l'API) et message d'erreur"""
+
+    def __init__(self, message, status=None, route=None):
+        super().__init__(message)
+        self.status = status
+        self.route = route
+
+
+class Service:
+    """Adresse d'une API : socket Unix s'il est en place, sinon TCP sur `port`"""
+
+    def __init__(self, name, port, unix_socket=None, host='127.0.0.1'):
+        self.name = name
+        self.port = port
+        self.unix_socket = unix_socket
+        self.host = host
+
+    def url(self, route):
+        # Résolu à chaque appel : le socket apparaît au démarrage de l'API et disparaît à son arrêt
+        return api_url(self.unix_socket, self.port, route, self.host)
+
+
+def merge_batches(columns, chunks, bodies) -> dict:
+    """Réponses des morceaux d'un lot réunies comme une seule réponse batch"""
+    merged = {column: [] for column in columns}
+    errors, timings, offset = [], {}, 0
+    for chunk, body in zip(chunks, bodies):
+        for column in columns:
+            merged[column].extend(body[column])
+        errors.extend({"index": error["index"] + offset, "error": error["error"]}
+                      for error in body.get("erreurs", []))
+        for stage, ms in body.get("timings_ms", {}).items():
+            timings[stage] = round(timings.get(stage, 0.0) + ms, 3)
+        offset += len(chunk)
+    merged.update(n_logements=offset, n_erreurs=len(errors), erreurs=errors, timings_ms=timings)
+    return merged
+
+
+class PredictionClient:
+    """Client synchrone des APIs DPE et consommation, sûr entre threads"""
+
+    def __init__(self, dpe=None, conso=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 batch_size=DEFAULT_BATCH_SIZE, pool_maxsize=10):
+        self.services = {
+            "dpe": dpe or Service("dpe", DPE_PORT, DPE_SOCKET),
+            "conso": conso or Service("conso", CONSO_PORT, CONSO_SOCKET),
+        }
+        self.timeout = timeout
+        self.retries = retries
+        self.batch_size = batch_size
+        self.pool_maxsize = pool_maxsize
+        self.http = session(pool_maxsize)
+
+        self.registry = metrics.Registry()
+        self._duration = self.registry.histogram(
+            'prediction_client_request_duration_seconds',
+            "Duree des appels vue du client, nouvelles tentatives comprises", ('service', 'route', 'outcome'))
+        self._attempts = self.registry.counter(
+            'prediction_client_attempts_total', "Tentatives par route et resultat", ('service', 'route', 'result'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.http.close()
+
+    # ----------------------------------------------------
+    # Transport
+    # ----------------------------------------------------
+
+    def request(self, method, service, route, timeout=None, retries=None, **kwargs) -> requests.Response:
+        """Appel HTTP avec nouvelles tentatives tant que le délai `timeout` n'est pas écoulé.
+
+        `service` : "dpe", "conso" ou un Service. Renvoie la dernière réponse, quel que
+        soit son statut ; PredictionError si l'API n'a jamais répondu.
+        """
+        target = service if isinstance(service, Service) else self.services[service]
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        start = time.perf_counter()
+        deadline = start + timeout
+        attempt = 0
+        while True:
+            response, error = None, None
+            try:
+                # Chaque tentative n'a droit qu'au temps restant avant l'échéance de l'appel
+                response = self.http.request(method, target.url(route),
+                                             timeout=max(deadline - time.perf_counter(), 0.001), **kwargs)
+            except requests.exceptions.RequestException as e:
+                error = e
+            if response is not None:
+                result = 'ok' if response.status_code < 400 else str(response.status_code)
+            else:
+                result = type(error).__name__
+            self.registry.inc(self._attempts, (target.name, route, result))
+
+            retryable = response is None or response.status_code in RETRY_STATUSES
+            # Attente exponentielle avec gigue : les clients relancés ensemble ne se synchronisent pas
+            delay = min(RETRY_BACKOFF_S * 2 ** attempt, MAX_RETRY_BACKOFF_S) * random.uniform(0.5, 1.0)
+            if not retryable or attempt >= retries or time.perf_counter() + delay >= deadline:
+                break
+            time.sleep(delay)
+            attempt += 1
+
+        outcome = 'ok' if response is not None and response.status_code < 400 else 'error'
+        self.registry.observe(self._duration, (target.name, route, outcome), time.perf_counter() - start)
+        if response is None:
+            raise PredictionError(f"{target.name} {route} : aucune réponse après {attempt + 1} "
+                                  f"tentative(s) ({error})", route=route) from error
+        return response
+
+    def _post_json(self, service, route, payload, timeout=None) -> dict:
+        response = self.request('POST', service, route, json=payload, timeout=timeout)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if response.status_code != 200:
+            message = body.get("error") if isinstance(body, dict) else None
+            raise PredictionError(message or f"HTTP {response.status_code} : {response.text[:200]}",
+                                  response.status_code, route)
+        return body
+
+    # ----------------------------------------------------
+    # Prédictions
+    # ----------------------------------------------------
+
+    def predict_dpe(self, record, timeout=None) -> int:
+        """Indice de classe DPE d'un logement (0 = G ... 6 = A)"""
+        return self._post_json("dpe", "/predict_dpe", record, timeout)["prediction_DPE_index"]
+
+    def predict_conso(self, record, timeout=None) -> float:
+        """Consommation (kWh) d'un logement dont l'etiquette_dpe est connue"""
+        return self._post_json("conso", "/predict_conso", record, timeout)["conso_predite_kwh"]
+
+    def predict_full(self, record, timeout=None) -> dict:
+        """Classe DPE puis consommation en un seul appel (chaînage dans l'API DPE)"""
+        return self._post_json("dpe", "/predict_full", record, timeout)
+
+    def _chunks(self, records):
+        records = list(records)
+        return [records[i:i + self.batch_size] for i in range(0, len(records), self.batch_size)]
+
+    def _post_batch(self, kind, chunk, timeout=None) -> dict:
+        service, route, _ = BATCH_ROUTES[kind]
+        return self._post_json(service, route, chunk, timeout)
+
+    def _batch(self, kind, records, timeout):
+        chunks = self._chunks(records)
+        bodies = [self._post_batch(kind, chunk, timeout) for chunk in chunks]
+        return merge_batches(BATCH_ROUTES[kind][2], chunks, bodies)
+
+    def predict_dpe_batch(self, records, timeout=None) -> dict:
+        """Classes DPE d'un lot ; `timeout` s'applique à chaque requête de `batch_size` logements"""
+        return self._batch("dpe", records, timeout)
+
+    def predict_conso_batch(self, records, timeout=None) -> dict:
+        return self._batch("conso", records, timeout)
+
+    def predict_full_batch(self, records, timeout=None) -> dict:
+        return self._batch("full", records, timeout)
+
+    # ----------------------------------------------------
+    # Santé et métriques
+    # ----------------------------------------------------
+
+    def health(self, service, wait=0, timeout=10, retries=0) -> dict:
+        """Rapport /health (y compris en cours de chargement) et son statut HTTP ; PredictionError sans réponse.
+
+        Avec `wait`, l'API ne répond qu'à la fin du chargement ou après `wait` secondes.
+        """
+        response = self.request('GET', service, "/health", params={"wait": wait} if wait else None,
+                                timeout=wait + timeout, retries=retries)
+        health = response.json()
+        health["http_status"] = response.status_code
+        return health
+
+    def is_ready(self, service, timeout=10) -> bool:
+        try:
+            return self.request('GET', service, "/health", timeout=timeout, retries=0).status_code == 200
+        except PredictionError:
+            return False
+
+    def api_metrics(self, service, timeout=5) -> str:
+        """Exposition Prometheus de l'API (GET /metrics)"""
+        response = self.request('GET', service, "/metrics", timeout=timeout, retries=0)
+        response.raise_for_status()
+        return response.text
+
+    def render_metrics(self) -> str:
+        """Métriques du client au format Prometheus"""
+        return metrics.render_registry(self.registry)
+
+    def latency_summary(self) -> dict:
+        """{API: {route: appels, erreurs, tentatives, latence moyenne et p50/p95/p99 (ms) des succès}}"""
+        snapshot = self.registry.snapshot()
+        summary = {}
+
+        def entry_for(service, route):
+            return summary.setdefault(service, {}).setdefault(route, {"calls": 0, "errors": 0, "attempts": 0})
+
+        for (service, route, outcome), (counts, total, count) in snapshot[self._duration.name]["values"]:
+            entry = entry_for(service, route)
+            entry["calls"] += count
+            if outcome != 'ok':
+                entry["errors"] += count
+                continue
+            cumulative, buckets = 0, []
+            for bound, n in zip(list(self._duration.buckets) + [float('inf')], counts):
+                cumulative += n
+                buckets.append((bound, cumulative))
+            entry["mean_ms"] = round(total / count * 1000, 3)
+            for q in (0.5, 0.95, 0.99):
+                entry[f"p{int(q * 100)}_ms"] = round(metrics.quantile(buckets, q) * 1000, 3)
+        for (service, route, _), value in snapshot[self._attempts.name]["values"]:
+            entry_for(service, route)["attempts"] += int(value)
+        return summary
+
+
+class AsyncPredictionClient:
+    """Mêmes méthodes que PredictionClient, en coroutines"""
+
+    def __init__(self, client=None, max_concurrency=None, **kwargs):
+        self.client = client or PredictionClient(**kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency or self.client.pool_maxsize,
+                                            thread_name_prefix="prediction-client")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+        self.client.close()
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def predict_dpe(self, record, timeout=None) -> int:
+        return await self._run(self.client.predict_dpe, record, timeout)
+
+    async def predict_conso(self, record, timeout=None) -> float:
+        return await self._run(self.client.predict_conso, record, timeout)
+
+    async def predict_full(self, record, timeout=None) -> dict:
+        return await self._run(self.client.predict_full, record, timeout)
+
+    async def _batch(self, kind, records, timeout):
+        chunks = self.client._chunks(records)
+        bodies = await asyncio.gather(*(self._run(self.client._post_batch, kind, chunk, timeout)
+                                        for chunk in chunks))
+        return merge_batches(BATCH_ROUTES[kind][2], chunks, bodies)
+
+    async def predict_dpe_batch(self, records, timeout=None) -> dict:
+        return await self._batch("dpe", records, timeout)
+
+    async def predict_conso_batch(self, records, timeout=None) -> dict:
+        return await self._batch("conso", records, timeout)
+
+    async def predict_full_batch(self, records, timeout=None) -> dict:
+        return await self._batch("full", records, timeout)
+
+    async def health(self, service, wait=0, timeout=10) -> dict:
+        return await self._run(self.client.health, service, wait, timeout)
+
+    async def is_ready(self, service, timeout=10) -> bool:
+        return await self._run(self.client.is_ready, service, timeout)
+
+    def latency_summary(self) -> dict:
+        return self.client.latency_summary()
+
+    def render_metrics(self) -> str:
+        return self.client.render_metrics()
@@ -0,0 +1,234 @@
+"""Serveur pre-fork pour les APIs de prédiction.
+
+Le processus maître ouvre le socket d'écoute et y répond lui-même (/health) pendant
+que les modèles se chargent en arrière-plan, puis crée N workers par fork : la
+mémoire des modèles, en lecture seule, est partagée en copy-on-write et chaque
+worker accepte les connexions sur le même socket. Le maître relance un worker qui
+meurt et arrête tout sur SIGTERM/SIGINT. SIGHUP demande un rechargement des
+modèles : le maître recharge les siens (pour les futurs workers) et relaie le
+signal à chaque worker. Avec `unix_socket`, chaque processus sert aussi les
+connexions d'un socket Unix (clients locaux, cf. uds_transport).
+"""
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+
+from werkzeug.serving import ThreadedWSGIServer
+
+import metrics
+import readiness
+
+logger = logging.getLogger(__name__)
+
+STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+RELOAD_SIGNAL = getattr(signal, 'SIGHUP', None)
+# Signaux différés pendant un fork, traités une fois les gestionnaires en place
+FORK_BLOCKED_SIGNALS = STOP_SIGNALS | ({RELOAD_SIGNAL} if RELOAD_SIGNAL else set())
+
+# pid du maître, connu des seuls workers pre-fork (None en mono-processus)
+_master_pid = None
+
+
+def master_pid():
+    """pid du maître pre-fork vu depuis un worker, None si le processus sert seul"""
+    return _master_pid
+
+
+def _install_reload_handler(on_reload, relay=None):
+    """SIGHUP -> on_reload('SIGHUP') dans ce processus, puis relai éventuel aux workers"""
+    if on_reload is None or RELOAD_SIGNAL is None:
+        return
+
+    def handle(signum, frame):
+        on_reload('SIGHUP')
+        if relay is not None:
+            relay()
+
+    signal.signal(RELOAD_SIGNAL, handle)
+
+
+class PreforkWSGIServer(ThreadedWSGIServer):
+    """Serveur WSGI multi-thread dont la file d'attente d'écoute (backlog) est configurable"""
+
+    def __init__(self, host, port, app, backlog=128):
+        self.request_queue_size = backlog
+        super().__init__(host, port, app)
+
+    def serve_until_shutdown(self, poll_interval=0.5):
+        """Comme serve_forever, sans fermer le socket d'écoute au retour de shutdown() (les workers en héritent)"""
+        socketserver.BaseServer.serve_forever(self, poll_interval)
+
+
+def _serve_in_threads(servers):
+    """Sert les sockets d'écoute supplémentaires (socket Unix) depuis des threads du processus"""
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True, name="extra-listener").start()
+
+
+def _remove_unix_socket(path):
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _run_worker(server, on_start=None, on_reload=None, extra_servers=()):
+    """Boucle d'un worker : sert les requêtes jusqu'à SIGTERM puis quitte sans repasser par le maître"""
+    global _master_pid
+    _master_pid = os.getppid()
+
+    def stop(signum, frame):
+        # shutdown() attend la fin de serve_forever : il doit tourner dans un autre thread
+        for listener in (server,) + tuple(extra_servers):
+            threading.Thread(target=listener.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, stop)
+    _install_reload_handler(on_reload)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, FORK_BLOCKED_SIGNALS)
+    try:
+        # Les threads du maître (surveillance des fichiers...) ne survivent pas au fork
+        metrics.start_worker()
+        if on_start is not None:
+            on_start()
+        _serve_in_threads(extra_servers)
+        server.serve_forever()
+    finally:
+        metrics.flush()
+        os._exit(0)
+
+
+def serve(app, host='0.0.0.0', port=5000, workers=1, backlog=128, preload=None,
+          on_start=None, on_reload=None, unix_socket=None):
+    """Sert l'application Flask avec `workers` processus partageant le même socket.
+
+    `preload` (bloquant, ex. attente de la fin du chargement des modèles) est appelé
+    dans le maître avant de créer les workers, le maître servant les requêtes en attendant.
+    `on_start()` est appelé dans chaque processus qui sert (ex. démarrage des threads
+    de surveillance) et `on_reload(trigger)` à la réception de SIGHUP. Le gestionnaire
+    est prévenu de l'ouverture du socket puis de la fin de `preload` (cf. readiness).
+    `unix_socket` : chemin d'un socket Unix servi en plus du port TCP.
+    """
+    if not hasattr(os, 'fork'):
+        # Windows : pas de fork, serveur de développement mono-processus
+        logger.warning("Fork indisponible sur cette plateforme, serveur mono-processus")
+        app.run(host=host, port=port, debug=False)
+        return
+
+    server = PreforkWSGIServer(host, port, app, backlog=backlog)
+    logger.info(f"Ecoute sur {host}:{port} (backlog {backlog}), {workers} worker(s)")
+    extra_servers = ()
+    if unix_socket:
+        os.makedirs(os.path.dirname(unix_socket) or '.', exist_ok=True)
+        # Un socket laissé par une exécution précédente est remplacé par werkzeug
+        extra_servers = (PreforkWSGIServer(f"unix://{unix_socket}", 0, app, backlog=backlog),)
+        logger.info(f"Ecoute sur le socket Unix {unix_socket}")
+    readiness.notify(readiness.EVENT_BIND, port=port, unix_socket=unix_socket)
+
+    if workers <= 1:
+        # Prêt dès que le chargement attendu par preload est terminé, pendant que le serveur répond
+        def announce_ready():
+            if preload is not None:
+                preload()
+            readiness.notify(readiness.EVENT_READY, workers=1)
+
+        threading.Thread(target=announce_ready, daemon=True, name="readiness").start()
+
+        def stop(signum, frame):
+            # Arrêt propre sur SIGTERM : le socket Unix est supprimé et les clients reviennent au TCP
+            for listener in (server,) + extra_servers:
+                threading.Thread(target=listener.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        _install_reload_handler(on_reload)
+        if on_start is not None:
+            on_start()
+        _serve_in_threads(extra_servers)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            for listener in extra_servers:
+                listener.server_close()
+            _remove_unix_socket(unix_socket)
+        return
+
+    if preload is not None:
+        # Les threads ne survivent pas au fork : le chargement doit être terminé avant
+        waiters = [threading.Thread(target=listener.serve_until_shutdown, daemon=True)
+                   for listener in (server,) + extra_servers]
+        for waiter in waiters:
+            waiter.start()
+        preload()
+        for listener in (server,) + extra_servers:
+            listener.shutdown()
+        for waiter in waiters:
+            waiter.join()
+
+    # Chaque worker écrit ses métriques dans un répertoire commun, agrégé par /metrics
+    metrics.share_between_workers()
+    children = set()
+    stopping = False
+
+    def spawn():
+        # SIGTERM/SIGINT bloqués pendant le fork : un arrêt demandé à ce moment est traité
+        # une fois le worker enregistré (parent) ou ses propres gestionnaires installés (worker)
+        signal.pthread_sigmask(signal.SIG_BLOCK, FORK_BLOCKED_SIGNALS)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                _run_worker(server, on_start, on_reload, extra_servers)
+            children.add(pid)
+        finally:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, FORK_BLOCKED_SIGNALS)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def relay_reload():
+        for pid in list(children):
+            try:
+                os.kill(pid, RELOAD_SIGNAL)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    # Le maître recharge aussi ses modèles : un worker relancé plus tard naît à jour
+    _install_reload_handler(on_reload, relay_reload)
+
+    for _ in range(workers):
+        if not stopping:
+            spawn()
+    readiness.notify(readiness.EVENT_READY, workers=len(children))
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} arrete (statut {status}), relance...")
+            spawn()
+
+    server.server_close()
+    for listener in extra_servers:
+        listener.server_close()
+    _remove_unix_socket(unix_socket)
+    metrics.cleanup()
+    sys.exit(0)
@@ -0,0 +1,44 @@
+"""Signal de démarrage des APIs vers APIManager.
+
+APIManager passe à chaque API l'extrémité d'écriture d'un pipe (variable
+API_READY_FD). L'API y écrit une ligne JSON par étape de son démarrage : bind
+(socket d'écoute ouvert), model_loaded (un modèle chargé), load_failed, puis
+ready (modèles chargés et requêtes servies). Le gestionnaire suit ces étapes au
+lieu d'interroger /health à intervalle fixe. Sans API_READY_FD (lancement
+manuel, docker-compose), notify ne fait rien.
+"""
+import json
+import os
+import threading
+import time
+
+READY_FD_ENV = 'API_READY_FD'
+
+# Étapes successives du démarrage d'une API
+EVENT_BIND = 'bind'
+EVENT_MODEL_LOADED = 'model_loaded'
+EVENT_LOAD_FAILED = 'load_failed'
+EVENT_READY = 'ready'
+
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def _ready_fd():
+    value = os.environ.get(READY_FD_ENV)
+    # Les workers pre-fork héritent du descripteur : seul le processus lancé par le gestionnaire écrit
+    return int(value) if value and os.getpid() == _pid else None
+
+
+def notify(event, **details):
+    """Signale une étape du démarrage au gestionnaire (sans effet hors APIManager)"""
+    fd = _ready_fd()
+    if fd is None:
+        return
+    line = json.dumps(dict(details, event=event, t=time.time(), pid=os.getpid())) + "\n"
+    with _lock:
+        try:
+            os.write(fd, line.encode())
+        except OSError:
+            # Gestionnaire arrêté ou pipe fermé : le démarrage continue sans lui
+            pass
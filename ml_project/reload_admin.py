@@ -0,0 +1,64 @@
+"""Déclencheurs du rechargement à chaud des modèles (cf. model_loader.ModelReloader).
+
+- POST /admin/reload : protégé par le jeton ADMIN_TOKEN (en-tête X-Admin-Token)
+  s'il est défini, sinon réservé aux appels locaux ;
+- surveillance des artefacts toutes les MODEL_RELOAD_WATCH_S secondes (0 : désactivée) ;
+- SIGHUP (cf. prefork_server), relayé par le maître à tous les workers.
+"""
+import hmac
+import os
+
+from flask import jsonify, request
+
+from model_loader import health_wait_seconds
+from prefork_server import RELOAD_SIGNAL, master_pid
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+MODEL_RELOAD_WATCH_S = float(os.environ.get('MODEL_RELOAD_WATCH_S', 5))
+
+# Pairs locaux : boucle locale IPv4/IPv6 et socket Unix (adresse '<local>' pour werkzeug)
+LOCAL_ADDRESSES = ('127.0.0.1', '::1', '<local>')
+
+
+def reload_all(reloaders, trigger):
+    """Lance le rechargement de chaque jeu de modèles, {nom: démarré}"""
+    return {reloader.name: reloader.reload(trigger) for reloader in reloaders}
+
+
+def start_watchers(reloaders):
+    for reloader in reloaders:
+        reloader.start_watcher(MODEL_RELOAD_WATCH_S)
+
+
+def _authorized():
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+    return request.remote_addr in LOCAL_ADDRESSES
+
+
+def register(app, reloaders):
+    """Ajoute POST /admin/reload (?wait=N : attend la fin en mono-processus)"""
+
+    @app.route('/admin/reload', methods=['POST'])
+    def admin_reload():
+        if not _authorized():
+            return jsonify({"error": "Acces refuse."}), 403
+
+        # Pre-fork : le maître recharge ses modèles et relaie à tous les workers
+        parent = master_pid()
+        if parent is not None and RELOAD_SIGNAL is not None:
+            os.kill(parent, RELOAD_SIGNAL)
+            return jsonify({"status": "reload_requested", "scope": "all_workers"}), 202
+
+        started = reload_all(reloaders, "admin")
+        if not any(started.values()):
+            return jsonify({"error": "Rechargement deja en cours.", "started": started}), 409
+
+        wait = health_wait_seconds(request.args)
+        if wait:
+            for reloader in reloaders:
+                reloader.wait(wait)
+        status = {reloader.name: reloader.status() for reloader in reloaders}
+        done = not any(s["in_progress"] for s in status.values())
+        return jsonify({"status": "done" if done else "reloading", "started": started, "reload": status}), \
+            200 if done else 202
@@ -1,35 +1,137 @@
+"""Lance la pile complète : APIs de prédiction puis tableau de bord Streamlit.
+
+Les APIs démarrent en arrière-plan ; Streamlit est lancé dès que APIManager
+signale qu'elles sont prêtes (wait_until_ready), ou en mode dégradé après
+UI_DEGRADED_AFTER secondes si elles ne le sont pas encore (les pages de
+prédiction répondent alors en erreur jusqu'à la fin du chargement). Le temps
+jusqu'à l'interface interactive est mesuré depuis le lancement du script.
+
+Usage : python start_app.py [--degraded-after 30] [--port 8501]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
 import threading
 import time
+
+import requests
+
 from api_manager import APIManager
-import subprocess
-import sys
-import os
 
-def start_apis():
+STREAMLIT_PORT = int(os.environ.get('STREAMLIT_PORT', 8501))
+# Secondes d'attente des APIs avant de lancer l'interface sans elles (négatif : attendre la fin du démarrage)
+UI_DEGRADED_AFTER = float(os.environ.get('UI_DEGRADED_AFTER', 30))
+# Délai maximal de démarrage de Streamlit lui-même
+STREAMLIT_STARTUP_TIMEOUT = 60
+
+
+def start_apis(api_manager, timings):
     """Démarre les APIs en arrière-plan"""
     print("🚀 Démarrage des APIs...")
-    api_manager = APIManager()
-    processes = api_manager.start_apis()
-    return api_manager, processes
 
-def start_streamlit():
-    """Démarre l'application Streamlit"""
+    def run():
+        api_manager.start_apis()
+        timings["apis"] = time.perf_counter()
+
+    thread = threading.Thread(target=run, name="api-startup", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_streamlit(port):
+    """Démarre l'application Streamlit dans un sous-processus"""
     print("🌐 Démarrage de l'application Streamlit...")
-    time.sleep(10)  # Attendre que les APIs soient prêtes
-    os.system("streamlit run app.py --server.port=8501 --server.address=0.0.0.0")
+    return subprocess.Popen([sys.executable, "-m", "streamlit", "run", "app.py",
+                             f"--server.port={port}", "--server.address=0.0.0.0",
+                             "--server.headless=true"])
 
-if __name__ == "__main__":
-    # Démarrer les APIs
-    api_manager, processes = start_apis()
-    
-    # Démarrer Streamlit dans un thread séparé
-    streamlit_thread = threading.Thread(target=start_streamlit, daemon=True)
-    streamlit_thread.start()
-    
+
+def wait_for_streamlit(process, port, timeout=STREAMLIT_STARTUP_TIMEOUT) -> bool:
+    """Attend que Streamlit réponde sur /_stcore/health"""
+    deadline = time.time() + timeout
+    while time.time() < deadline and process.poll() is None:
+        try:
+            if requests.get(f"http://localhost:{port}/_stcore/health", timeout=1).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def stop_streamlit(process):
+    """Arrête Streamlit (SIGTERM puis SIGKILL après 5 secondes)"""
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _raise_exit(signum, frame):
+    raise SystemExit(0)
+
+
+def main(port=STREAMLIT_PORT, degraded_after=UI_DEGRADED_AFTER):
+    started_at = time.perf_counter()
+    timings = {}
+    api_manager = APIManager()
+    # Ctrl+C et docker stop arrêtent toute la pile (et pas seulement les APIs)
+    signal.signal(signal.SIGINT, _raise_exit)
+    signal.signal(signal.SIGTERM, _raise_exit)
+
+    streamlit = None
     try:
-        # Maintenir le programme en vie
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
+        start_apis(api_manager, timings)
+
+        # Barrière : APIs prêtes, ou mode dégradé passé le délai configuré
+        ready = api_manager.wait_until_ready(None if degraded_after < 0 else degraded_after)
+        if not ready:
+            if api_manager.startup_done.is_set():
+                print("⚠️ Certaines APIs n'ont pas démarré : interface lancée en mode dégradé")
+            else:
+                print(f"⚠️ APIs non prêtes après {degraded_after:.0f}s : interface lancée en mode dégradé")
+
+        streamlit = start_streamlit(port)
+        if not wait_for_streamlit(streamlit, port):
+            print("❌ Streamlit n'a pas démarré correctement")
+            return 1
+        timings["ui"] = time.perf_counter()
+        print(f"⏱️ Interface disponible sur le port {port} en {timings['ui'] - started_at:.2f}s"
+              + ("" if ready else " (mode dégradé)"))
+
+        reported = False
+        while streamlit.poll() is None:
+            if not reported and api_manager.startup_done.is_set():
+                reported = True
+                if api_manager.all_ready:
+                    # La pile est interactive quand l'interface et les APIs répondent toutes les deux
+                    print(f"⏱️ Pile complète interactive en {max(timings.values()) - started_at:.2f}s "
+                          f"(APIs {timings['apis'] - started_at:.2f}s, "
+                          f"Streamlit {timings['ui'] - started_at:.2f}s)")
+                else:
+                    print("⚠️ Démarrage des APIs terminé avec des erreurs : pile incomplète")
+            time.sleep(0.5)
+        print(f"🛑 Streamlit s'est arrêté (code {streamlit.returncode})")
+        return streamlit.returncode
+    except SystemExit:
         print("\n🛑 Arrêt de l'application...")
-        api_manager.stop_apis()
\ No newline at end of file
+        return 0
+    finally:
+        stop_streamlit(streamlit)
+        api_manager.stop_apis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=STREAMLIT_PORT)
+    parser.add_argument("--degraded-after", type=float, default=UI_DEGRADED_AFTER,
+                        help="secondes d'attente des APIs avant de lancer l'interface en mode dégradé "
+                             "(négatif : attendre la fin de leur démarrage)")
+    args = parser.parse_args()
+    sys.exit(main(args.port, args.degraded_after))
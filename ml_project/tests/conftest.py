@@ -0,0 +1,15 @@
+"""Configuration commune des tests : modules de ml_project et générateurs des benchmarks"""
+import pathlib
+import sys
+
+PROJECT_DIR = pathlib.Path(__file__).resolve().parent.parent
+BENCHMARKS_DIR = PROJECT_DIR / "benchmarks"
+
+for path in (PROJECT_DIR, BENCHMARKS_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import bench_utils  # noqa: E402
+
+# Les APIs résolvent leurs fichiers depuis le dossier courant
+bench_utils.use_project_dir()
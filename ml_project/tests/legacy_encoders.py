@@ -0,0 +1,147 @@
+"""Pré-traitements d'avant feature_spec, figés comme référence.
+
+tests/test_feature_spec.py vérifie que les encodeurs compilés donnent les mêmes
+matrices et les mêmes erreurs ; benchmarks/bench_feature_spec.py mesure l'écart
+de temps. Ne pas les faire évoluer avec feature_spec.
+"""
+import numpy as np
+import pandas as pd
+
+from feature_spec import (
+    All_Data, Variable_Standardisee, ORDINAL_CATEGORIES, Qualite_Isolation_Mapping, Periode_Construction_Mapping,
+    Nombre_App_Mapping, Energie_Prefixes
+)
+
+
+def legacy_dpe_batch(records, feature_columns):
+    """Ancien encode_dpe_batch (DataFrame + get_dummies + reindex)"""
+    df_processed = pd.DataFrame.from_records(records)
+    for col, categories in ORDINAL_CATEGORIES.items():
+        mapping = {category: i for i, category in enumerate(categories)}
+        df_processed[col] = df_processed[col].map(mapping).fillna(-1)
+    df_processed = pd.get_dummies(df_processed, drop_first=False)
+    return df_processed.reindex(columns=feature_columns, fill_value=0).fillna(0).to_numpy(dtype=np.float64)
+
+
+def legacy_conso(data_brute):
+    """Ancien encode_conso (dictionnaire All_Data, clés d'énergie construites à la main)"""
+    data_dico = {feature: 0 for feature in All_Data}
+    data_dico['hauteur_sous_plafond'] = data_brute.get('hauteur_sous_plafond', 0)
+    data_dico['surface_habitable_logement'] = data_brute.get('surface_habitable_logement', 0)
+    data_dico['qualite_isolation_murs'] = Qualite_Isolation_Mapping[data_brute['qualite_isolation_murs']]
+    data_dico['periode_construction'] = Periode_Construction_Mapping[data_brute['periode_construction']]
+    data_dico['nombre_appartement_cat'] = Nombre_App_Mapping[data_brute['nombre_appartement_cat']]
+    data_dico['etiquette_dpe'] = data_brute['etiquette_dpe']
+    if data_brute.get('logement') == 'Neuf':
+        data_dico['logement_neuf'] = 1
+    for prefix in Energie_Prefixes:
+        energie = data_brute.get(prefix, '').strip()
+        if energie:
+            key = f'{prefix}_{energie}'.replace(' ', '_')
+            if key in data_dico:
+                data_dico[key] = 1
+    X = np.array([[data_dico[feature] for feature in All_Data]], dtype=np.float64)
+    # L'ancien chemin refusait ces valeurs à la prédiction (sklearn / scoreur fusionné)
+    if not np.isfinite(X[:, 2:]).all() or np.isinf(X).any():
+        raise ValueError("Input X contains NaN or infinity.")
+    return X
+
+
+COLUMN_INDEX = {feature: i for i, feature in enumerate(All_Data)}
+
+
+def _numeric_column(values):
+    """Conversion en float de toute une colonne ; NaN pour None et pour les valeurs non numeriques"""
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _category_codes(values, categories):
+    """Indice de chaque valeur dans `categories` (-1 si absente ou non textuelle)"""
+    values = [value if isinstance(value, str) else None for value in values]
+    return pd.Categorical(values, categories=categories).codes
+
+
+def _energie_lookup(prefix):
+    """Valeur recue -> colonne OHE, avec la meme cle que predict_conso
+
+    La cle f'{prefix}_{energie}'.replace(' ', '_') ne correspond qu'aux colonnes
+    sans espace (Charbon, Fioul, Électricité) : les autres energies restent a 0.
+    """
+    lookup = {}
+    for feature in All_Data:
+        if feature.startswith(f'{prefix}_') and ' ' not in feature:
+            lookup[feature[len(prefix) + 1:]] = COLUMN_INDEX[feature]
+    return lookup
+
+
+ORDINAL_MAPPINGS = {
+    'qualite_isolation_murs': Qualite_Isolation_Mapping,
+    'periode_construction': Periode_Construction_Mapping,
+    'nombre_appartement_cat': Nombre_App_Mapping
+}
+
+ENERGIE_LOOKUPS = {prefix: _energie_lookup(prefix) for prefix in Energie_Prefixes}
+
+
+def legacy_conso_batch(records):
+    """Ancien encode_conso_batch (colonnes pandas), matrice dans l'ordre All_Data.
+
+    Renvoie la matrice et les erreurs par ligne {indice: message} ; une ligne en
+    erreur n'interrompt pas le lot.
+    """
+    n = len(records)
+    X = np.zeros((n, len(All_Data)), dtype=np.float64)
+    errors = {}
+    rows = []
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors[i] = "Chaque logement doit etre un objet JSON."
+            record = {}
+        rows.append(record)
+
+    def fail(mask, message):
+        for i in np.flatnonzero(mask):
+            errors.setdefault(int(i), message(rows[i]))
+
+    # 1. Valeurs numeriques/brutes (None -> NaN, impute par le modele)
+    for feature in Variable_Standardisee:
+        raw = [row.get(feature, 0) for row in rows]
+        X[:, COLUMN_INDEX[feature]] = _numeric_column(raw)
+
+    # 2. Ordinaux : une table de correspondance par champ, appliquee a toute la colonne
+    for field, mapping in ORDINAL_MAPPINGS.items():
+        codes = _category_codes([row.get(field) for row in rows], list(mapping))
+        X[:, COLUMN_INDEX[field]] = np.asarray(list(mapping.values()), dtype=np.float64)[codes]
+        fail(codes < 0, lambda row, field=field: f"Cle manquante dans les donnees: {row.get(field, field)!r}")
+
+    # 3. Etiquette DPE predite (API 5001)
+    present = np.fromiter(('etiquette_dpe' in row for row in rows), dtype=bool, count=n)
+    X[:, COLUMN_INDEX['etiquette_dpe']] = _numeric_column([row.get('etiquette_dpe') for row in rows])
+    fail(~present, lambda row: "Cle manquante dans les donnees: 'etiquette_dpe'")
+
+    # 4. OHE : logement neuf, puis les deux blocs d'energie en une seule affectation
+    X[:, COLUMN_INDEX['logement_neuf']] = np.fromiter(
+        (row.get('logement') == 'Neuf' for row in rows), dtype=np.float64, count=n)
+
+    scatter_rows, scatter_cols = [], []
+    for prefix, lookup in ENERGIE_LOOKUPS.items():
+        raw = pd.Series([row.get(prefix, '') for row in rows], dtype=object)
+        invalid = ~raw.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+        fail(invalid, lambda row, prefix=prefix: f"Valeur invalide pour {prefix}: {row.get(prefix)!r}")
+
+        keys = raw.where(~invalid, '').str.strip().str.replace(' ', '_')
+        codes = _category_codes(keys.tolist(), list(lookup))
+        matched = np.flatnonzero(codes >= 0)
+        scatter_rows.append(matched)
+        scatter_cols.append(np.asarray(list(lookup.values()), dtype=np.intp)[codes[matched]])
+    X[np.concatenate(scatter_rows), np.concatenate(scatter_cols)] = 1
+
+    # 5. Valeurs non exploitables : NaN hors variables imputees, infinis, texte non numerique
+    n_standard = len(Variable_Standardisee)
+    invalid = ~np.isfinite(X[:, n_standard:]).all(axis=1) | np.isinf(X[:, :n_standard]).any(axis=1)
+    for feature in Variable_Standardisee:
+        raw = pd.Series([row.get(feature) for row in rows], dtype=object)
+        invalid |= raw.notna().to_numpy() & np.isnan(X[:, COLUMN_INDEX[feature]])
+    fail(invalid, lambda row: "Valeur manquante ou non numerique dans les donnees.")
+
+    return X, errors
@@ -0,0 +1,165 @@
+"""Encodeurs compilés depuis feature_spec face aux pré-traitements historiques des deux APIs.
+
+Logements du formulaire et variantes hors domaine :
+- DPE : requête unitaire contre pandas (get_dummies), lot contre l'ancien lot pandas ;
+- consommation : requête unitaire contre l'ancien dictionnaire (mêmes erreurs), lot
+  contre l'ancien lot (mêmes valeurs et mêmes messages) ;
+- lot contre requêtes unitaires, ligne à ligne, pour les deux modèles.
+"""
+import warnings
+
+import numpy as np
+import pytest
+
+import bench_utils
+from feature_encoders import error_message
+from tests.legacy_encoders import legacy_conso, legacy_conso_batch, legacy_dpe_batch
+
+N_PAYLOADS = 300
+
+
+@pytest.fixture(scope="module")
+def dpe_encoder():
+    import API_Random_Forest
+    # Le modèle (et ses colonnes) se charge en arrière-plan depuis l'import
+    API_Random_Forest.dpe_loader.wait()
+    if not API_Random_Forest.dpe_loader.ready:
+        pytest.skip(f"Modèle DPE indisponible : {API_Random_Forest.dpe_loader.error}")
+    return API_Random_Forest.dpe_artifacts.encoder
+
+
+@pytest.fixture(scope="module")
+def conso_encoder():
+    import API_Lineaire_Reg
+    return API_Lineaire_Reg.conso_encoder
+
+
+@pytest.fixture(autouse=True)
+def _ignore_pandas_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        yield
+
+
+def dpe_edge_payloads(payloads):
+    """Variantes qui activent les indicatrices du modèle DPE et les valeurs hors domaine"""
+    variants = []
+    for payload in payloads[:100]:
+        variant = dict(payload)
+        for field in ("type_energie_n1", "type_energie_principale_chauffage", "logement"):
+            variant[field] = variant[field].lower()
+        variant["type_batiment"] = "maison"
+        variant["qualite_isolation_murs"] = "tres bonne"
+        variants.append(variant)
+        partial = dict(payload)
+        partial.pop("hauteur_sous_plafond")
+        partial["surface_habitable_logement"] = None
+        partial["logement_neuf"] = True
+        variants.append(partial)
+    return variants
+
+
+def conso_edge_payloads(payloads):
+    """Variantes valides et invalides pour le modèle de consommation"""
+    edits = [
+        lambda p: p.pop("hauteur_sous_plafond"),
+        lambda p: p.update(hauteur_sous_plafond=None),
+        lambda p: p.update(surface_habitable_logement="85.5"),
+        lambda p: p.update(etiquette_dpe="3"),
+        lambda p: p.update(type_energie_n1=" Fioul "),
+        lambda p: p.update(type_energie_principale_chauffage="Électricité", champ_inconnu=1),
+        lambda p: p.update(logement_neuf=1, logement="neuf"),
+        lambda p: p.update(qualite_isolation_murs="tres bonne"),
+        lambda p: p.pop("periode_construction"),
+        lambda p: p.pop("etiquette_dpe"),
+        lambda p: p.update(etiquette_dpe=None),
+        lambda p: p.update(type_energie_n1=None),
+        lambda p: p.update(surface_habitable_logement="abc"),
+        lambda p: p.update(hauteur_sous_plafond=float("inf")),
+    ]
+    variants = []
+    for i, payload in enumerate(payloads[:len(edits) * 20]):
+        variant = dict(payload)
+        edits[i % len(edits)](variant)
+        variants.append(variant)
+    return variants
+
+
+@pytest.fixture(scope="module")
+def dpe_payloads():
+    payloads = bench_utils.sample_payloads(N_PAYLOADS)
+    return payloads, dpe_edge_payloads(payloads)
+
+
+@pytest.fixture(scope="module")
+def conso_payloads():
+    payloads = bench_utils.sample_conso_payloads(N_PAYLOADS)
+    # Lignes qui ne sont pas des objets JSON : refusées une à une dans les lots
+    return payloads, conso_edge_payloads(payloads) + [5, "logement", None]
+
+
+def assert_batch_matches_single(encoder, payloads):
+    X, errors = encoder.encode_batch(payloads)
+    for i, payload in enumerate(payloads):
+        if not isinstance(payload, dict):
+            assert i in errors, f"ligne {i} ({payload!r}) acceptée dans le lot"
+            continue
+        try:
+            single = encoder.encode(payload)[0].copy()
+        except (KeyError, ValueError) as e:
+            assert i in errors and type(errors[i]) is type(e), f"erreur unitaire {e!r} absente du lot pour {payload}"
+            continue
+        assert i not in errors, f"ligne {i} refusée dans le lot ({errors[i]!r}) mais pas seule"
+        np.testing.assert_array_equal(X[i], single, err_msg=f"ligne {i} du lot différente ({payload})")
+
+
+def test_dpe_single_matches_pandas(dpe_encoder, dpe_payloads):
+    payloads, edge = dpe_payloads
+    for payload in payloads + edge:
+        try:
+            reference = legacy_dpe_batch([payload], dpe_encoder.feature_columns)
+        except KeyError:
+            with pytest.raises(KeyError):
+                dpe_encoder.encode(payload)
+            continue
+        np.testing.assert_array_equal(dpe_encoder.encode(payload), reference, err_msg=str(payload))
+
+
+def test_dpe_batch_matches_pandas(dpe_encoder, dpe_payloads):
+    payloads, _ = dpe_payloads
+    X, errors = dpe_encoder.encode_batch(payloads)
+    assert errors == {}
+    np.testing.assert_array_equal(X, legacy_dpe_batch(payloads, dpe_encoder.feature_columns))
+
+
+def test_dpe_batch_matches_single(dpe_encoder, dpe_payloads):
+    payloads, edge = dpe_payloads
+    assert_batch_matches_single(dpe_encoder, payloads + edge + [5, "logement", None])
+
+
+def test_conso_single_matches_legacy(conso_encoder, conso_payloads):
+    payloads, edge = conso_payloads
+    for payload in payloads + edge:
+        if not isinstance(payload, dict):
+            continue
+        try:
+            reference = legacy_conso(payload)
+        except (KeyError, ValueError, AttributeError, TypeError):
+            with pytest.raises((KeyError, ValueError)):
+                conso_encoder.encode(payload)
+            continue
+        np.testing.assert_array_equal(conso_encoder.encode(payload), reference, err_msg=str(payload))
+
+
+def test_conso_batch_matches_single(conso_encoder, conso_payloads):
+    payloads, edge = conso_payloads
+    assert_batch_matches_single(conso_encoder, payloads + edge)
+
+
+def test_conso_batch_matches_legacy(conso_encoder, conso_payloads):
+    payloads, edge = conso_payloads
+    X, errors = conso_encoder.encode_batch(payloads + edge)
+    X_legacy, legacy_errors = legacy_conso_batch(payloads + edge)
+    assert {i: error_message(error) for i, error in errors.items()} == legacy_errors
+    valid = [i for i in range(len(X)) if i not in errors]
+    np.testing.assert_array_equal(X[valid], X_legacy[valid])
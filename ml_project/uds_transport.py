@@ -0,0 +1,115 @@
+"""Transport HTTP sur sockets Unix entre le tableau de bord, APIManager et les APIs.
+
+Chaque API écoute sur son port TCP et, si APIManager lui fournit un chemin
+(API_UNIX_SOCKET, cf. api_configs), sur un socket Unix : les appels locaux
+évitent la pile TCP de la boucle locale. Les clients passent par session(), qui
+sait ouvrir les URL http+unix://<chemin encodé>/route, et par api_url(), qui
+choisit le socket Unix s'il existe et revient au TCP sinon (docker-compose,
+API lancée à la main, Windows).
+"""
+import os
+import socket
+import tempfile
+from urllib.parse import quote, unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+
+UNIX_SCHEME = 'http+unix'
+
+# Sockets Unix disponibles (absents sous Windows)
+UDS_AVAILABLE = hasattr(socket, 'AF_UNIX')
+
+SOCKET_DIR = os.environ.get('API_SOCKET_DIR', os.path.join(tempfile.gettempdir(), 'ml_project'))
+
+# Variable d'environnement par laquelle APIManager transmet son socket à une API
+SOCKET_ENV = 'API_UNIX_SOCKET'
+
+
+def socket_path(name):
+    """Chemin du socket Unix d'une API (API_<NAME>_SOCKET pour le remplacer), None sans AF_UNIX"""
+    if not UDS_AVAILABLE:
+        return None
+    return os.environ.get(f"{name.upper()}_SOCKET", os.path.join(SOCKET_DIR, f"{name}.sock"))
+
+
+CONSO_SOCKET = socket_path('api_conso')
+DPE_SOCKET = socket_path('api_dpe')
+
+
+def unix_url(path, route):
+    return f"{UNIX_SCHEME}://{quote(path, safe='')}{route}"
+
+
+def api_url(unix_socket, port, route, host='127.0.0.1'):
+    """URL d'une route : socket Unix s'il est en place, sinon TCP sur `port`"""
+    if unix_socket and os.path.exists(unix_socket):
+        return unix_url(unix_socket, route)
+    return f"http://{host}:{port}{route}"
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, *args, socket_path=None, **kwargs):
+        self.socket_path = socket_path
+        super().__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Délai de connexion de la requête (absent : valeur par défaut de urllib3, bloquante)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+
+class UnixHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = UnixHTTPConnection
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """Adaptateur requests pour http+unix:// : un pool de connexions persistantes par socket"""
+
+    def __init__(self, pool_maxsize=10, **kwargs):
+        self._unix_pools = {}
+        self._unix_pool_maxsize = pool_maxsize
+        super().__init__(pool_maxsize=pool_maxsize, **kwargs)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._unix_pool(request.url)
+
+    def get_connection(self, url, proxies=None):
+        return self._unix_pool(url)
+
+    def _unix_pool(self, url):
+        path = unquote(urlparse(url).netloc)
+        pool = self._unix_pools.get(path)
+        if pool is None:
+            pool = self._unix_pools[path] = UnixHTTPConnectionPool(
+                'localhost', maxsize=self._unix_pool_maxsize, socket_path=path)
+        return pool
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+    def close(self):
+        super().close()
+        for pool in self._unix_pools.values():
+            pool.close()
+        self._unix_pools.clear()
+
+
+def session(pool_maxsize=10) -> requests.Session:
+    """Session requests qui accepte aussi les URL http+unix:// (cf. api_url).
+
+    `pool_maxsize` : connexions persistantes conservées par API, en TCP comme sur socket Unix.
+    """
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(pool_maxsize=pool_maxsize))
+    http.mount(f"{UNIX_SCHEME}://", UnixSocketAdapter(pool_maxsize=pool_maxsize))
+    return http
@@ -4,15 +4,15 @@ import numpy as np
 import os
 import base64
 import plotly.graph_objects as go
-import requests
 import json
 import time
 
+from prediction_client import PredictionClient, PredictionError
+
 # --- CONFIGURATION DES APIs ---
-API_URL_DPE = "http://127.0.0.1:5001/predict_dpe"
-API_URL_CONSO = "http://127.0.0.1:5000/predict_conso"
-API_HEALTH_DPE = "http://127.0.0.1:5001/health"
-API_HEALTH_CONSO = "http://127.0.0.1:5000/health"
+# Sockets Unix déclarés dans APIManager.api_configs, TCP (ports 5000/5001) s'ils sont absents.
+# Connexions persistantes partagées par les sessions Streamlit
+api_client = PredictionClient(timeout=30)
 
 # Mappings DPE
 CLASSES_DPE_MAPPING = ["G", "F", "E", "D", "C", "B", "A"]
@@ -23,22 +23,14 @@ def check_api_health():
     """Vérifie si les APIs sont disponibles"""
     status = {'dpe': False, 'conso': False}
     
-    try:
-        response = requests.get(API_HEALTH_DPE, timeout=5)
-        if response.status_code == 200:
-            status_data = response.json()
-            status['dpe'] = status_data.get('model_loaded', False)
-    except:
-        status['dpe'] = False
-        
-    try:
-        response = requests.get(API_HEALTH_CONSO, timeout=5)
-        if response.status_code == 200:
-            status_data = response.json()
-            status['conso'] = status_data.get('model_loaded', False)
-    except:
-        status['conso'] = False
-        
+    for api in status:
+        try:
+            status_data = api_client.health(api, timeout=5)
+            if status_data["http_status"] == 200:
+                status[api] = status_data.get('model_loaded', False)
+        except Exception:
+            status[api] = False
+
     return status
 
 def create_dpe_gauge(index):
@@ -213,72 +205,40 @@ def show_page():
         # Container pour les résultats
         results_container = st.container()
         
-        # 1. PRÉDICTION DPE
+        # 1. PRÉDICTION DPE + CONSOMMATION (un seul appel, l'étiquette DPE est chaînée côté API)
         dpe_prediction = None
         classe_dpe = None
+        conso_pred = None
         
         try:
-            with st.spinner("🔮 Étape 1/2 : Calcul de la classe DPE..."):
-                response_dpe = requests.post(API_URL_DPE, json=data_initial, timeout=30)
-                
-                if response_dpe.status_code == 200:
-                    dpe_result = response_dpe.json()
-                    dpe_prediction = dpe_result.get("prediction_DPE_index")
-                    
-                    if dpe_prediction is not None:
-                        classe_dpe = CLASSES_DPE_MAPPING[dpe_prediction]
-                        st.success(f"✅ Classe DPE déterminée : **{classe_dpe}**")
-                    else:
-                        st.error("❌ Erreur : Clé 'prediction_DPE_index' manquante dans la réponse")
-                        return
-                else:
-                    st.error(f"❌ Erreur API DPE ({response_dpe.status_code}): {response_dpe.text}")
+            with st.spinner("🔮 Calcul de la classe DPE et de la consommation énergétique..."):
+                full_result = api_client.predict_full(data_initial)
+                dpe_prediction = full_result.get("prediction_DPE_index")
+                conso_pred = full_result.get("conso_predite_kwh")
+
+                if dpe_prediction is None:
+                    st.error("❌ Erreur : Clé 'prediction_DPE_index' manquante dans la réponse")
+                    return
+                if conso_pred is None:
+                    st.error("❌ Erreur : Clé 'conso_predite_kwh' manquante dans la réponse")
                     return
-                    
-        except requests.exceptions.ConnectionError:
-            st.error("❌ Impossible de se connecter à l'API DPE sur le port 5001")
-            return
-        except requests.exceptions.Timeout:
-            st.error("⏰ Timeout de l'API DPE")
-            return
-        except Exception as e:
-            st.error(f"❌ Erreur inattendue API DPE: {e}")
-            return
 
-        # 2. PRÉDICTION CONSOMMATION (avec étiquette DPE)
-        data_for_conso = data_initial.copy()
-        data_for_conso['etiquette_dpe'] = dpe_prediction
+                classe_dpe = CLASSES_DPE_MAPPING[dpe_prediction]
+                st.success(f"✅ Classe DPE déterminée : **{classe_dpe}**")
+                st.success("✅ Consommation énergétique estimée avec succès!")
 
-        conso_pred = None
-        
-        try:
-            with st.spinner("💡 Étape 2/2 : Estimation de la consommation énergétique..."):
-                response_conso = requests.post(API_URL_CONSO, json=data_for_conso, timeout=30)
-                
-                if response_conso.status_code == 200:
-                    conso_result = response_conso.json()
-                    conso_pred = conso_result.get("conso_predite_kwh")
-                    
-                    if conso_pred is not None:
-                        st.success("✅ Consommation énergétique estimée avec succès!")
-                    else:
-                        st.error("❌ Erreur : Clé 'conso_predite_kwh' manquante dans la réponse")
-                        return
-                else:
-                    st.error(f"❌ Erreur API Consommation ({response_conso.status_code}): {response_conso.text}")
-                    return
-                    
-        except requests.exceptions.ConnectionError:
-            st.error("❌ Impossible de se connecter à l'API Consommation sur le port 5000")
-            return
-        except requests.exceptions.Timeout:
-            st.error("⏰ Timeout de l'API Consommation")
+        except PredictionError as e:
+            if e.status is None:
+                # Aucune réponse dans le délai, nouvelles tentatives comprises
+                st.error(f"❌ Impossible de joindre l'API DPE (port 5001) : {e}")
+            else:
+                st.error(f"❌ Erreur API DPE ({e.status}): {e}")
             return
         except Exception as e:
-            st.error(f"❌ Erreur inattendue API Consommation: {e}")
+            st.error(f"❌ Erreur inattendue API DPE: {e}")
             return
 
-        # 3. AFFICHAGE DES RÉSULTATS COMPLETS
+        # 2. AFFICHAGE DES RÉSULTATS COMPLETS
         if dpe_prediction is not None and conso_pred is not None:
             conso_pred = max(50, round(conso_pred, 1))
             co2_pred = round(conso_pred * CO2_FACTOR, 1)